@@ -0,0 +1,138 @@
+# backend/app/agregaty_sprzedazy.py
+"""
+Przyrostowo utrzymywana sprzedaż dzienna (tabela Sprzedaz_Dzienna, UC-DB7).
+
+Raport dzienny czyta gotowe sumy zamiast liczyć je z Rezerwacja_Miejsca
+przy każdym odświeżeniu. Sumy zmieniamy w tej samej transakcji co status
+rezerwacji:
+
+- rezerwacja staje się 'Potwierdzona'            -> zmien_sprzedaz(db, ids, +1)
+- anulowanie potwierdzonej / usunięcie seansu     -> zmien_sprzedaz(db, ids, -1)
+- zmiana daty / filmu / sali seansu               -> -1 przed zmianą, +1 po flush()
+
+Wywołanie musi być przed usunięciem wierszy Rezerwacja_Miejsca, bo z nich
+liczymy różnicę. Sprzątanie minionych seansów sum nie zmienia – sprzedaż
+się odbyła, a raport za miniony dzień ma zostać.
+
+Przeliczenie od zera (np. po imporcie danych):
+    python -m app.agregaty_sprzedazy [--od YYYY-MM-DD] [--do YYYY-MM-DD]
+"""
+import argparse
+from typing import Iterable, Optional
+
+from sqlalchemy import func, literal, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from . import models
+
+_sd = models.SprzedazDzienna.__table__
+_KOLUMNY = ["data", "id_filmu", "id_sali", "typ_biletu", "liczba_biletow", "przychod"]
+
+
+def _sprzedaz_z_rezerwacji(znak: int):
+    """SELECT sum biletów / przychodu rezerwacji pogrupowanych jak Sprzedaz_Dzienna."""
+    rm = models.RezerwacjaMiejsca
+    return (
+        select(
+            models.Seans.data,
+            models.Seans.id_filmu,
+            models.Seans.id_sali,
+            func.coalesce(rm.typ_biletu, literal("")),
+            func.count() * znak,
+            func.coalesce(func.sum(rm.cena_biletu), 0.0) * znak,
+        )
+        .join(models.Rezerwacja, rm.id_rezerwacji == models.Rezerwacja.id_rezerwacji)
+        .join(models.Seans, models.Rezerwacja.id_seansu == models.Seans.id_seansu)
+        .group_by(
+            models.Seans.data,
+            models.Seans.id_filmu,
+            models.Seans.id_sali,
+            func.coalesce(rm.typ_biletu, literal("")),
+        )
+    )
+
+
+def zmien_sprzedaz(db: Session, id_rezerwacji: Iterable[int], znak: int) -> None:
+    """
+    Dodaje (znak=+1) albo odejmuje (znak=-1) bilety podanych rezerwacji
+    od sum w Sprzedaz_Dzienna. Commit robi wołający.
+    """
+    ids = list(id_rezerwacji)
+    if not ids:
+        return
+    roznice = _sprzedaz_z_rezerwacji(znak).where(
+        models.RezerwacjaMiejsca.id_rezerwacji.in_(ids)
+    )
+    zapytanie = sqlite_insert(_sd).from_select(_KOLUMNY, roznice)
+    zapytanie = zapytanie.on_conflict_do_update(
+        index_elements=["data", "id_filmu", "id_sali", "typ_biletu"],
+        set_={
+            "liczba_biletow": _sd.c.liczba_biletow + zapytanie.excluded.liczba_biletow,
+            "przychod": _sd.c.przychod + zapytanie.excluded.przychod,
+        },
+    )
+    db.execute(zapytanie)
+
+    if znak < 0:
+        # wyzerowane wiersze niczego nie wnoszą do raportu
+        dni = (
+            select(models.Seans.data)
+            .join(models.Rezerwacja, models.Rezerwacja.id_seansu == models.Seans.id_seansu)
+            .where(models.Rezerwacja.id_rezerwacji.in_(ids))
+        )
+        db.execute(_sd.delete().where(_sd.c.data.in_(dni), _sd.c.liczba_biletow <= 0))
+
+
+def potwierdzone_rezerwacje_seansu(db: Session, id_seansu: int) -> list:
+    return list(
+        db.scalars(
+            select(models.Rezerwacja.id_rezerwacji).where(
+                models.Rezerwacja.id_seansu == id_seansu,
+                models.Rezerwacja.status_rezerwacji == "Potwierdzona",
+            )
+        )
+    )
+
+
+def przebuduj(db: Session, od: Optional[str] = None, do: Optional[str] = None) -> int:
+    """
+    Liczy sumy od zera dla dni [od, do] (domyślnie wszystkie dni, dla
+    których są seanse w bazie). Dni bez seansów (już posprzątane) zostają
+    nietknięte. Zwraca liczbę zapisanych wierszy.
+    """
+    dni = select(models.Seans.data).distinct()
+    if od:
+        dni = dni.where(models.Seans.data >= od)
+    if do:
+        dni = dni.where(models.Seans.data <= do)
+
+    db.execute(_sd.delete().where(_sd.c.data.in_(dni)))
+    sprzedaz = _sprzedaz_z_rezerwacji(1).where(
+        models.Rezerwacja.status_rezerwacji == "Potwierdzona",
+        models.Seans.data.in_(dni),
+    )
+    wynik = db.execute(sqlite_insert(_sd).from_select(_KOLUMNY, sprzedaz))
+    db.commit()
+    return wynik.rowcount
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Przeliczenie tabeli Sprzedaz_Dzienna od zera.")
+    parser.add_argument("--od", help="pierwszy dzień (YYYY-MM-DD)")
+    parser.add_argument("--do", help="ostatni dzień (YYYY-MM-DD)")
+    args = parser.parse_args(argv)
+
+    from .db import Base, SessionLocal, engine
+    Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        wiersze = przebuduj(db, args.od, args.do)
+    finally:
+        db.close()
+    print(f"Przeliczono sprzedaż dzienną: {wiersze} wierszy.")
+
+
+if __name__ == "__main__":
+    main()
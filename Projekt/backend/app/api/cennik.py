@@ -1,6 +1,11 @@
-from fastapi import APIRouter
+from typing import Dict, List, Optional
 
-from ..config_cennik import CENNIK_BILETOW
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+
+from ..db import get_db, get_db_odczyt
+from .. import models, schemas
+from ..silnik_cen import bufor_cennika, ceny_seansu
 
 router = APIRouter(
     prefix="/cennik",
@@ -8,10 +13,14 @@ router = APIRouter(
 )
 
 
-@router.get("/")
-def pobierz_cennik():
+@router.get("/", response_model=Dict[str, float])
+def pobierz_cennik(
+    id_seansu: Optional[int] = Query(None, description="Ceny dla konkretnego seansu"),
+    db: Session = Depends(get_db_odczyt),
+):
     """
-    Zwraca aktualny cennik biletów.
+    Zwraca aktualny cennik biletów (reguły bez dodatkowych kryteriów),
+    a z ?id_seansu=... – ceny obowiązujące na ten seans.
 
     Przykład odpowiedzi:
     {
@@ -19,4 +28,80 @@ def pobierz_cennik():
       "ulgowy": 18.0
     }
     """
-    return CENNIK_BILETOW
+    if id_seansu is None:
+        return bufor_cennika.aktualny(db).podstawowy
+    ceny = ceny_seansu(db, id_seansu)
+    if ceny is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Seans o podanym id nie istnieje.",
+        )
+    return ceny
+
+
+# ---------- reguły cennika ----------
+
+@router.get("/reguly", response_model=List[schemas.RegulaCenyOut])
+def lista_regul(db: Session = Depends(get_db_odczyt)):
+    return db.query(models.RegulaCeny).order_by(models.RegulaCeny.id_reguly).all()
+
+
+def _sprawdz_sale(db: Session, id_sali: Optional[int]) -> None:
+    if id_sali is not None and db.get(models.Sala, id_sali) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Sala o podanym id nie istnieje.",
+        )
+
+
+def _pobierz_regule(db: Session, id_reguly: int) -> models.RegulaCeny:
+    regula = db.get(models.RegulaCeny, id_reguly)
+    if regula is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Reguła cennika o podanym id nie istnieje.",
+        )
+    return regula
+
+
+@router.post("/reguly", response_model=schemas.RegulaCenyOut, status_code=status.HTTP_201_CREATED)
+def dodaj_regule(dane: schemas.RegulaCenyCreate, db: Session = Depends(get_db)):
+    """
+    Dodaje regułę cennika. Puste kryterium = dowolna wartość; dla seansu
+    wygrywa pasująca reguła z największą liczbą kryteriów (przy remisie
+    nowsza). Zmiana działa bez restartu (app/silnik_cen.py).
+    """
+    _sprawdz_sale(db, dane.id_sali)
+    regula = models.RegulaCeny(**dane.model_dump())
+    db.add(regula)
+    db.commit()
+    db.refresh(regula)
+    bufor_cennika.uniewaznij()
+    return regula
+
+
+@router.patch("/reguly/{id_reguly}", response_model=schemas.RegulaCenyOut)
+def edytuj_regule(id_reguly: int, dane: schemas.RegulaCenyUpdate, db: Session = Depends(get_db)):
+    regula = _pobierz_regule(db, id_reguly)
+    zmiany = dane.model_dump(exclude_unset=True)
+    if any(zmiany.get(pole, "") is None for pole in ("typ_biletu", "cena")):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Reguła musi mieć typ biletu i cenę.",
+        )
+    _sprawdz_sale(db, zmiany.get("id_sali"))
+    for pole, wartosc in zmiany.items():
+        setattr(regula, pole, wartosc)
+    db.commit()
+    db.refresh(regula)
+    bufor_cennika.uniewaznij()
+    return regula
+
+
+@router.delete("/reguly/{id_reguly}")
+def usun_regule(id_reguly: int, db: Session = Depends(get_db)):
+    regula = _pobierz_regule(db, id_reguly)
+    db.delete(regula)
+    db.commit()
+    bufor_cennika.uniewaznij()
+    return {"detail": "Reguła cennika została usunięta."}
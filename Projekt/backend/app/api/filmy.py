@@ -1,10 +1,14 @@
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
 
-from ..db import get_db
+from ..db import get_db, get_db_odczyt
 from .. import models, schemas
+from ..listy import Strona, kolumny_schematu
+from ..bufor_repertuaru import bufor_repertuaru
+from ..kolizje_seansow import przelicz_konce_filmu
+from ..wyszukiwarka import fts_dostepne, indeksuj_film, trafienia, usun_z_indeksu
 
 router = APIRouter(
     prefix="/filmy",
@@ -43,6 +47,8 @@ def dodaj_film(
     )
 
     db.add(nowy_film)
+    db.flush()
+    indeksuj_film(db, nowy_film)
     db.commit()
     db.refresh(nowy_film)
 
@@ -54,10 +60,14 @@ def dodaj_film(
 # =======================
 @router.get("/", response_model=List[schemas.FilmOut])
 def lista_filmow(
-    db: Session = Depends(get_db),
+    response: Response,
+    strona: Strona = Depends(),
+    db: Session = Depends(get_db_odczyt),
 ):
-    filmy = db.query(models.Film).all()
-    return filmy
+    """Lista filmów stronami po id_filmu (app/listy.py)."""
+    zapytanie = db.query(*kolumny_schematu(models.Film, schemas.FilmOut))
+    zapytanie = strona.zastosuj(zapytanie, models.Film.id_filmu)
+    return strona.utnij(zapytanie.all(), response, "id_filmu")
 
 
 # =======================
@@ -99,14 +109,19 @@ def edytuj_film(
 
     if film_update.tytul is not None:
         film.tytul = film_update.tytul
+        indeksuj_film(db, film)
     if film_update.typ is not None:
         film.typ = film_update.typ
     if film_update.czas_trwania is not None:
         film.czas_trwania = film_update.czas_trwania
+        przelicz_konce_filmu(db, film.id_filmu, film.czas_trwania)
 
     db.commit()
     db.refresh(film)
 
+    # tytuł / typ / czas trwania są częścią odpowiedzi repertuaru
+    bufor_repertuaru.uniewaznij()
+
     return film
 
 
@@ -153,27 +168,46 @@ def usun_film(
         )
 
     db.delete(film)
+    usun_z_indeksu(db, id_filmu)
     db.commit()
 
     return {"detail": "Film został usunięty."}
 
 @router.get("/szukaj", response_model=List[schemas.FilmOut])
 def szukaj_filmow(
-    q: str = Query(..., min_length=1, description="Fragment tytułu filmu"),
-    db: Session = Depends(get_db),
+    q: str = Query(..., min_length=1, description="Początek słów z tytułu filmu"),
+    limit: int = Query(20, ge=1, le=100, description="Maksymalna liczba wyników"),
+    db: Session = Depends(get_db_odczyt),
 ):
     """
-    Wyszukiwanie filmów po fragmencie tytułu.
+    Wyszukiwanie filmów po tytule (app/wyszukiwarka.py).
+
+    Każde słowo zapytania to początek słowa z tytułu, bez względu na
+    wielkość liter i polskie znaki; wyniki od najlepiej pasujących.
 
     Przykłady:
     - /filmy/szukaj?q=avatar
-    - /filmy/szukaj?q=man
+    - /filmy/szukaj?q=zolw
+    - /filmy/szukaj?q=gwiezdne woj
     """
 
-    # SQLite jest z natury case-insensitive dla LIKE, ilike też zadziała
+    if not fts_dostepne():
+        return (
+            db.query(models.Film)
+            .filter(models.Film.tytul.ilike(f"%{q}%"))
+            .limit(limit)
+            .all()
+        )
+
+    pasujace = trafienia(q)
+    if pasujace is None:
+        return []
+
     filmy = (
         db.query(models.Film)
-        .filter(models.Film.tytul.ilike(f"%{q}%"))
+        .join(pasujace, pasujace.c.id_filmu == models.Film.id_filmu)
+        .order_by(pasujace.c.trafnosc)
+        .limit(limit)
         .all()
     )
 
@@ -0,0 +1,19 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from ..metryki import metryki
+
+router = APIRouter(tags=["metryki"])
+
+
+class OdpowiedzPrometheus(PlainTextResponse):
+    media_type = "text/plain; version=0.0.4"
+
+
+@router.get("/metrics", response_class=OdpowiedzPrometheus)
+def pobierz_metryki():
+    """
+    Metryki w formacie tekstowym Prometheusa (app/metryki.py): żądania HTTP,
+    zapytania SQL i sprzątanie.
+    """
+    return metryki.tekst()
@@ -2,16 +2,22 @@ from __future__ import annotations
 
 from uuid import uuid4
 from datetime import datetime
-from typing import Optional, Dict, Any
+from collections import defaultdict
+from typing import Optional, Dict, Any, List
 
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from ..db import get_db
+from ..db import get_db, get_async_db
 from .. import models
 from .. import schemas
 
-from ..config_cennik import CENNIK_BILETOW
+from ..agregaty_sprzedazy import zmien_sprzedaz
+from ..silnik_cen import ceny_seansu
+from ..stan_miejsc import stan_miejsc, OPLACONE
 
 
 router = APIRouter(
@@ -20,58 +26,39 @@ router = APIRouter(
 )
 
 
-def _parse_iso_datetime(dt_str: str) -> Optional[datetime]:
-    """
-    Bezpieczne parsowanie datetime z tekstu (ISO).
-    Zwraca None jeśli nie da się sparsować.
-    """
-    if not dt_str:
-        return None
-    try:
-        # obsługa np. "2025-01-01T12:30:00" (najczęściej u Was)
-        return datetime.fromisoformat(dt_str)
-    except Exception:
-        return None
-
-
 def _czy_rezerwacja_wygasla(rez: models.Rezerwacja) -> bool:
     """
     Zwraca True jeśli rezerwacja ma ustawioną datę wygaśnięcia i już wygasła.
     """
-    if not rez.data_wygasniecia:
+    if rez.data_wygasniecia is None:
         return False
-    dt = _parse_iso_datetime(rez.data_wygasniecia)
-    if dt is None:
-        # jeśli format jest błędny, zachowujemy się konserwatywnie: nie blokujemy potwierdzenia,
-        # ale można to zmienić na błąd 400.
-        return False
-    return dt < datetime.now()
+    return rez.data_wygasniecia < datetime.now()
 
 
 def _policz_kwote_rezerwacji(db: Session, id_rezerwacji: int) -> float:
     """
-    Liczy kwotę rezerwacji. Priorytet:
-    1) jeśli w RezerwacjaMiejsca jest kolumna cena_biletu -> sumujemy
-    2) w przeciwnym razie liczymy z typ_biletu na podstawie CENNIK_BILETOW
+    Kwota rezerwacji zapisanej bez Rezerwacja.kwota (sprzed tej kolumny).
+    Priorytet:
+    1) cena_biletu zapisana przy miejscu
+    2) w przeciwnym razie cena typu biletu według cennika seansu (app/silnik_cen.py)
     """
-    pozycje = (
-        db.query(models.RezerwacjaMiejsca)
-        .filter(models.RezerwacjaMiejsca.id_rezerwacji == id_rezerwacji)
-        .all()
-    )
+    pozycje = db.execute(
+        select(
+            models.RezerwacjaMiejsca.typ_biletu,
+            models.RezerwacjaMiejsca.cena_biletu,
+            models.RezerwacjaMiejsca.id_seansu,
+        ).where(models.RezerwacjaMiejsca.id_rezerwacji == id_rezerwacji)
+    ).all()
 
     suma = 0.0
-    for p in pozycje:
-        # 1) jeśli masz już kolumnę cena_biletu w modelu:
-        if hasattr(p, "cena_biletu") and p.cena_biletu is not None:
-            suma += float(p.cena_biletu)
-        else:
-            # 2) fallback: z cennika wg typ_biletu
-            cena = CENNIK_BILETOW.get(p.typ_biletu or "", None)
-            if cena is None:
-                # jeśli typ biletu nieznany – licz 0 (albo rzuć błąd)
-                cena = 0.0
-            suma += float(cena)
+    ceny = None  # cennik seansu – liczony tylko, jeśli któreś miejsce nie ma ceny
+    for typ_biletu, cena_biletu, id_seansu in pozycje:
+        if cena_biletu is None:
+            if ceny is None:
+                ceny = ceny_seansu(db, id_seansu) or {}
+            # typ biletu nieznany – 0
+            cena_biletu = ceny.get(typ_biletu or "", 0.0)
+        suma += float(cena_biletu)
 
     return float(suma)
 
@@ -92,16 +79,16 @@ def start_platnosci(
         "id_rezerwacji": 123,
         "kwota": 50.0
       }
+
+    Sesja płatności jest zapisywana w tabeli Platnosc z kwotą rezerwacji
+    (Rezerwacja.kwota, liczona przy rezerwacji). Ponowny start dla tej
+    samej rezerwacji zwraca otwartą sesję zamiast tworzyć nową.
     """
     id_rezerwacji = payload.id_rezerwacji
     if not isinstance(id_rezerwacji, int):
         raise HTTPException(status_code=400, detail="Brak lub niepoprawne id_rezerwacji (int).")
 
-    rez = (
-        db.query(models.Rezerwacja)
-        .filter(models.Rezerwacja.id_rezerwacji == id_rezerwacji)
-        .first()
-    )
+    rez = db.get(models.Rezerwacja, id_rezerwacji)
     if not rez:
         raise HTTPException(status_code=404, detail="Rezerwacja nie została znaleziona.")
 
@@ -117,43 +104,87 @@ def start_platnosci(
             detail="Nie można rozpocząć płatności – rezerwacja wygasła (data_wygasniecia).",
         )
 
-    kwota = _policz_kwote_rezerwacji(db, id_rezerwacji)
+    if rez.kwota is None:
+        # rezerwacja sprzed kolumny kwota – liczymy raz i zapamiętujemy
+        rez.kwota = _policz_kwote_rezerwacji(db, id_rezerwacji)
+
+    platnosc = db.scalar(
+        select(models.Platnosc)
+        .where(
+            models.Platnosc.id_rezerwacji == id_rezerwacji,
+            models.Platnosc.status == "Rozpoczęta",
+            models.Platnosc.kwota == rez.kwota,
+        )
+        .limit(1)
+    )
+    if platnosc is None:
+        platnosc = models.Platnosc(
+            id_platnosci=str(uuid4()),
+            id_rezerwacji=id_rezerwacji,
+            kwota=rez.kwota,
+            status="Rozpoczęta",
+            data_utworzenia=datetime.now(),
+        )
+        db.add(platnosc)
+    if db.new or db.dirty:
+        db.commit()
 
     return {
-        "payment_id": str(uuid4()),
+        "payment_id": platnosc.id_platnosci,
         "id_rezerwacji": id_rezerwacji,
-        "kwota": kwota,
+        "kwota": platnosc.kwota,
     }
 
 
 @router.post("/confirm",response_model=schemas.PlatnoscConfirmOut)
-def confirm_platnosci(
-    payload: schemas.PlatnoscConfirmIn, db: Session = Depends(get_db)
+async def confirm_platnosci(
+    payload: schemas.PlatnoscConfirmIn, db: AsyncSession = Depends(get_async_db)
 ):
     """
     Potwierdzenie płatności (symulacja webhooka).
 
     Wejście:
-      { "id_rezerwacji": 123 }
+      { "id_rezerwacji": 123, "payment_id": "...uuid z /start..." }
+
+    payment_id jest opcjonalne; jeśli jest, sprawdzamy, że sesja płatności
+    dotyczy tej rezerwacji i ma jej kwotę (bez ponownego liczenia cen).
 
     Efekt:
-      Rezerwacja Oczekująca -> Potwierdzona (czyli zapłacona)
+      Rezerwacja Oczekująca -> Potwierdzona (czyli zapłacona),
+      sesja płatności -> Zakończona
 
     Wyjście:
       { "detail": "Platnosc potwierdzona", "id_rezerwacji": 123 }
+
+    Powtórzony webhook dla rezerwacji już potwierdzonej nic nie zmienia
+    i też kończy się sukcesem.
     """
     id_rezerwacji = payload.id_rezerwacji
     if not isinstance(id_rezerwacji, int):
         raise HTTPException(status_code=400, detail="Brak lub niepoprawne id_rezerwacji (int).")
 
-    rez = (
-        db.query(models.Rezerwacja)
-        .filter(models.Rezerwacja.id_rezerwacji == id_rezerwacji)
-        .first()
-    )
+    rez = await db.get(models.Rezerwacja, id_rezerwacji)
     if not rez:
         raise HTTPException(status_code=404, detail="Rezerwacja nie została znaleziona.")
 
+    if payload.payment_id is not None:
+        platnosc = await db.get(models.Platnosc, payload.payment_id)
+        if platnosc is None:
+            raise HTTPException(status_code=404, detail="Płatność nie została znaleziona.")
+        if platnosc.id_rezerwacji != id_rezerwacji:
+            raise HTTPException(status_code=400, detail="Płatność dotyczy innej rezerwacji.")
+        if rez.kwota is not None and round(platnosc.kwota, 2) != round(rez.kwota, 2):
+            raise HTTPException(
+                status_code=400,
+                detail="Kwota płatności nie zgadza się z kwotą rezerwacji.",
+            )
+
+    if rez.status_rezerwacji == "Potwierdzona":
+        return {
+            "detail": "Platnosc byla juz potwierdzona",
+            "id_rezerwacji": id_rezerwacji,
+        }
+
     if rez.status_rezerwacji != "Oczekująca":
         raise HTTPException(
             status_code=400,
@@ -166,10 +197,228 @@ def confirm_platnosci(
             detail="Nie można potwierdzić płatności – rezerwacja wygasła (data_wygasniecia).",
         )
 
-    rez.status_rezerwacji = "Potwierdzona"
-    db.commit()
+    # warunkowy UPDATE – przy równoległym potwierdzeniu sprzedaż liczymy raz
+    zmiana = await db.execute(
+        update(models.Rezerwacja)
+        .where(
+            models.Rezerwacja.id_rezerwacji == id_rezerwacji,
+            models.Rezerwacja.status_rezerwacji == "Oczekująca",
+        )
+        .values(status_rezerwacji="Potwierdzona")
+    )
+    if zmiana.rowcount != 1:
+        await db.rollback()
+        raise HTTPException(
+            status_code=400,
+            detail="Nie można potwierdzić płatności. Status rezerwacji zmienił się w międzyczasie.",
+        )
+    await db.run_sync(zmien_sprzedaz, [id_rezerwacji], +1)
+    await db.execute(_zakoncz_platnosci([id_rezerwacji], payload.payment_id))
+    await db.commit()
+
+    id_miejsc = (
+        await db.scalars(
+            select(models.RezerwacjaMiejsca.id_miejsca).where(
+                models.RezerwacjaMiejsca.id_rezerwacji == id_rezerwacji
+            )
+        )
+    ).all()
+    stan_miejsc.oznacz(rez.id_seansu, id_miejsc, OPLACONE)
 
     return {
         "detail": "Platnosc potwierdzona",
         "id_rezerwacji": id_rezerwacji,
     }
+
+
+def _zakoncz_platnosci(id_rezerwacji: List[int], id_platnosci: Optional[str] = None):
+    """UPDATE otwartych sesji płatności potwierdzonych rezerwacji -> Zakończona."""
+    zapytanie = (
+        update(models.Platnosc)
+        .where(
+            models.Platnosc.id_rezerwacji.in_(id_rezerwacji),
+            models.Platnosc.status == "Rozpoczęta",
+        )
+        .values(status="Zakończona", data_zakonczenia=datetime.now())
+        .execution_options(synchronize_session=False)
+    )
+    if id_platnosci is not None:
+        zapytanie = zapytanie.where(models.Platnosc.id_platnosci == id_platnosci)
+    return zapytanie
+
+
+# ---------- paczka zdarzeń płatności ----------
+
+# wynik -> detail (jak w pojedynczym /confirm)
+OPISY_WYNIKOW = {
+    "potwierdzona": "Platnosc potwierdzona",
+    "juz_potwierdzona": "Platnosc byla juz potwierdzona",
+    "nie_znaleziono": "Rezerwacja nie została znaleziona.",
+    "zly_status": "Nie można potwierdzić płatności – rezerwacja nie jest w statusie 'Oczekująca'.",
+    "wygasla": "Nie można potwierdzić płatności – rezerwacja wygasła (data_wygasniecia).",
+    "konflikt_klucza": "Klucz idempotencji był już użyty dla innej rezerwacji.",
+}
+
+
+def _wynik(klucz: str, id_rezerwacji: int, wynik: str, powtorzenie: bool = False) -> dict:
+    return {
+        "klucz_idempotencji": klucz,
+        "id_rezerwacji": id_rezerwacji,
+        "wynik": wynik,
+        "detail": OPISY_WYNIKOW[wynik],
+        "powtorzenie": powtorzenie,
+    }
+
+
+def _potwierdz_paczke(
+    db: Session, zdarzenia: List[schemas.ZdarzeniePlatnosci]
+) -> tuple[List[dict], Dict[int, List[int]]]:
+    """
+    Przetwarza paczkę zdarzeń w jednej transakcji (commit robi wołający).
+    Zwraca wyniki w kolejności zdarzeń oraz id_seansu -> id_miejsc
+    potwierdzonych rezerwacji (do aktualizacji stan_miejsc po commicie).
+    """
+    # --- 1. Powtórzenia: klucze z Log_Platnosci i powtórzone w paczce ---
+    klucze = list({z.klucz_idempotencji for z in zdarzenia})
+    zapisane = {
+        w.klucz_idempotencji: w
+        for w in db.execute(
+            select(
+                models.LogPlatnosci.klucz_idempotencji,
+                models.LogPlatnosci.id_rezerwacji,
+                models.LogPlatnosci.wynik,
+            ).where(models.LogPlatnosci.klucz_idempotencji.in_(klucze))
+        )
+    }
+    nowe: Dict[str, int] = {}  # klucz -> id_rezerwacji, pierwsze wystąpienie w paczce
+    for z in zdarzenia:
+        if z.klucz_idempotencji not in zapisane:
+            nowe.setdefault(z.klucz_idempotencji, z.id_rezerwacji)
+
+    # --- 2. Stan rezerwacji z nowych zdarzeń – jedno zapytanie ---
+    rezerwacje = {
+        r.id_rezerwacji: r
+        for r in db.execute(
+            select(
+                models.Rezerwacja.id_rezerwacji,
+                models.Rezerwacja.status_rezerwacji,
+                models.Rezerwacja.data_wygasniecia,
+            ).where(models.Rezerwacja.id_rezerwacji.in_(set(nowe.values())))
+        )
+    }
+    teraz = datetime.now()
+    wyniki_nowych: Dict[str, str] = {}
+    do_potwierdzenia: Dict[int, List[str]] = defaultdict(list)
+    for klucz, id_rezerwacji in nowe.items():
+        r = rezerwacje.get(id_rezerwacji)
+        if r is None:
+            wyniki_nowych[klucz] = "nie_znaleziono"
+        elif r.status_rezerwacji == "Potwierdzona":
+            wyniki_nowych[klucz] = "juz_potwierdzona"
+        elif r.status_rezerwacji != "Oczekująca":
+            wyniki_nowych[klucz] = "zly_status"
+        elif r.data_wygasniecia is not None and r.data_wygasniecia < teraz:
+            wyniki_nowych[klucz] = "wygasla"
+        else:
+            do_potwierdzenia[id_rezerwacji].append(klucz)
+
+    # --- 3. Jeden warunkowy UPDATE dla wszystkich poprawnych przejść ---
+    potwierdzone = set()
+    if do_potwierdzenia:
+        potwierdzone = set(
+            db.scalars(
+                update(models.Rezerwacja)
+                .where(
+                    models.Rezerwacja.id_rezerwacji.in_(list(do_potwierdzenia)),
+                    models.Rezerwacja.status_rezerwacji == "Oczekująca",
+                )
+                .values(status_rezerwacji="Potwierdzona")
+                .returning(models.Rezerwacja.id_rezerwacji)
+                .execution_options(synchronize_session=False)
+            )
+        )
+        zmien_sprzedaz(db, potwierdzone, +1)
+        db.execute(_zakoncz_platnosci(list(potwierdzone)))
+    for id_rezerwacji, klucze_rez in do_potwierdzenia.items():
+        # kilka kluczy dla tej samej rezerwacji: potwierdza pierwszy;
+        # nie zwrócona przez UPDATE – status zmienił się w międzyczasie
+        if id_rezerwacji in potwierdzone:
+            pierwszy, pozostale = "potwierdzona", "juz_potwierdzona"
+        else:
+            pierwszy = pozostale = "zly_status"
+        wyniki_nowych[klucze_rez[0]] = pierwszy
+        for klucz in klucze_rez[1:]:
+            wyniki_nowych[klucz] = pozostale
+
+    # --- 4. Zapis do Log_Platnosci (równoległa paczka z tym samym kluczem wygrywa) ---
+    if wyniki_nowych:
+        db.execute(
+            sqlite_insert(models.LogPlatnosci).on_conflict_do_nothing(),
+            [
+                {
+                    "klucz_idempotencji": klucz,
+                    "id_rezerwacji": nowe[klucz],
+                    "wynik": wynik,
+                    "szczegoly": OPISY_WYNIKOW[wynik],
+                    "data_przetworzenia": teraz,
+                }
+                for klucz, wynik in wyniki_nowych.items()
+            ],
+        )
+
+    # --- 5. Wyniki w kolejności zdarzeń ---
+    wyniki = []
+    przetworzone = set()
+    for z in zdarzenia:
+        klucz = z.klucz_idempotencji
+        wpis = zapisane.get(klucz)
+        if wpis is not None:
+            id_zapisane, wynik = wpis.id_rezerwacji, wpis.wynik
+            powtorzenie = True
+        else:
+            id_zapisane, wynik = nowe[klucz], wyniki_nowych[klucz]
+            powtorzenie = klucz in przetworzone
+            przetworzone.add(klucz)
+        if id_zapisane != z.id_rezerwacji:
+            wyniki.append(_wynik(klucz, z.id_rezerwacji, "konflikt_klucza"))
+        else:
+            wyniki.append(_wynik(klucz, z.id_rezerwacji, wynik, powtorzenie))
+
+    # --- 6. Miejsca potwierdzonych rezerwacji (dla stan_miejsc) ---
+    miejsca: Dict[int, List[int]] = defaultdict(list)
+    if potwierdzone:
+        for id_seansu, id_miejsca in db.execute(
+            select(models.RezerwacjaMiejsca.id_seansu, models.RezerwacjaMiejsca.id_miejsca)
+            .where(models.RezerwacjaMiejsca.id_rezerwacji.in_(potwierdzone))
+        ):
+            miejsca[id_seansu].append(id_miejsca)
+    return wyniki, miejsca
+
+
+@router.post("/confirm/paczka", response_model=schemas.PaczkaPlatnosciOut)
+async def confirm_platnosci_paczka(
+    payload: schemas.PaczkaPlatnosciIn, db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Potwierdzenie paczki płatności (webhook dostarczający zdarzenia seriami).
+
+    Wejście:
+      { "zdarzenia": [ { "klucz_idempotencji": "evt_1", "id_rezerwacji": 123 }, ... ] }
+
+    - zdarzenie z kluczem już zapisanym w Log_Platnosci nie jest
+      przetwarzane ponownie – dostaje zapisany wynik (powtorzenie = true)
+    - wszystkie poprawne przejścia Oczekująca -> Potwierdzona idą jednym
+      UPDATE w jednej transakcji, razem z sumami sprzedaży i logiem
+    - błąd jednego zdarzenia nie blokuje pozostałych – wynik jest osobno
+      dla każdego zdarzenia, w kolejności z wejścia
+    """
+    wyniki, miejsca = await db.run_sync(_potwierdz_paczke, payload.zdarzenia)
+    await db.commit()
+
+    for id_seansu, id_miejsc in miejsca.items():
+        stan_miejsc.oznacz(id_seansu, id_miejsc, OPLACONE)
+
+    return {
+        "potwierdzone": sum(1 for w in wyniki if w["wynik"] == "potwierdzona" and not w["powtorzenie"]),
+        "wyniki": wyniki,
+    }
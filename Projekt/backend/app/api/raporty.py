@@ -1,9 +1,15 @@
-# backend/app/api/raporty.py
-from fastapi import APIRouter, Depends, Query
+import csv
+import io
+import json
+from datetime import date
+from typing import Iterator, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, select
 
-from ..db import get_db
+from ..db import SessionOdczyt, get_db_odczyt
 from .. import models, schemas
 
 router = APIRouter(
@@ -11,44 +17,189 @@ router = APIRouter(
     tags=["raporty"],
 )
 
+_sd = models.SprzedazDzienna
+
+# ?grupuj=... -> kolumna Sprzedaz_Dzienna
+WYMIARY = {
+    "dzien": _sd.data,
+    "film": _sd.id_filmu,
+    "sala": _sd.id_sali,
+    "typ_biletu": _sd.typ_biletu,
+}
+POLA_WIERSZA = list(schemas.RaportSprzedazyWiersz.model_fields)
+
+# Eksport czyta z bazy i wysyła paczkami po tyle wierszy
+ROZMIAR_PACZKI = 1000
+
 
 @router.get("/sprzedaz-dzienna", response_model=schemas.RaportSprzedazyDzienny)
 def raport_sprzedaz_dzienna(
     data: str = Query(..., description="Dzień w formacie YYYY-MM-DD"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_odczyt),
 ):
     """
     UC-DB7: Raport sprzedaży dziennej
 
-    - bierzemy tylko rezerwacje 'Potwierdzona'
-    - łączymy z seansami po id_seansu
-    - filtrujemy po dacie seansu
-    - liczymy liczbę sprzedanych biletów (miejsc)
-    - sumujemy przychód na podstawie cena_biletu
+    Sumy biletów i przychodu z rezerwacji 'Potwierdzona' dla seansów
+    z danego dnia są utrzymywane na bieżąco w tabeli Sprzedaz_Dzienna
+    (app/agregaty_sprzedazy.py) – tu tylko odczyt po kluczu (dzień).
     """
 
     liczba_biletow, przychod = (
         db.query(
-            func.count(models.RezerwacjaMiejsca.id_miejsca),
-            func.coalesce(func.sum(models.RezerwacjaMiejsca.cena_biletu), 0.0),
-        )
-        .join(
-            models.Rezerwacja,
-            models.RezerwacjaMiejsca.id_rezerwacji == models.Rezerwacja.id_rezerwacji,
-        )
-        .join(
-            models.Seans,
-            models.Rezerwacja.id_seansu == models.Seans.id_seansu,
-        )
-        .filter(
-            models.Rezerwacja.status_rezerwacji == "Potwierdzona",
-            models.Seans.data == data,
+            func.coalesce(func.sum(models.SprzedazDzienna.liczba_biletow), 0),
+            func.coalesce(func.sum(models.SprzedazDzienna.przychod), 0.0),
         )
+        .filter(models.SprzedazDzienna.data == data)
         .one()
     )
 
     return schemas.RaportSprzedazyDzienny(
         data=data,
         liczba_biletow=liczba_biletow,
-        przychod=float(przychod),
+        # sumy float po wielu +/- mogą mieć ogon w stylu 43.00000000001
+        przychod=round(float(przychod), 2),
+    )
+
+
+# ---------- raport za okres ----------
+
+class ParametryRaportu:
+    """Dependency: ?od=...&do=...&grupuj=dzien&grupuj=film..."""
+
+    def __init__(
+        self,
+        od: str = Query(..., description="Pierwszy dzień (YYYY-MM-DD)"),
+        do: str = Query(..., description="Ostatni dzień (YYYY-MM-DD), włącznie"),
+        grupuj: List[str] = Query(
+            ["dzien"],
+            description="Wymiary grupowania (można podać kilka razy): "
+            + ", ".join(WYMIARY),
+        ),
+    ):
+        try:
+            poczatek, koniec = date.fromisoformat(od), date.fromisoformat(do)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Niepoprawny format daty. Oczekiwano YYYY-MM-DD.",
+            )
+        if poczatek > koniec:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Data początkowa jest późniejsza niż końcowa.",
+            )
+        # ?grupuj= (puste) – jeden wiersz z sumą za cały okres
+        grupuj = [w for w in grupuj if w]
+        nieznane = [w for w in grupuj if w not in WYMIARY]
+        if nieznane:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Nieznane wymiary grupowania: {nieznane}. Dostępne: {list(WYMIARY)}",
+            )
+        self.od = poczatek.isoformat()
+        self.do = koniec.isoformat()
+        # kolejność z WYMIARY, bez powtórzeń
+        self.grupuj = [w for w in WYMIARY if w in grupuj]
+
+    def zapytanie(self):
+        """Jedno zapytanie grupujące po wybranych wymiarach, posortowane po nich."""
+        wymiary = [WYMIARY[w] for w in self.grupuj]
+        kolumny = list(wymiary)
+        if "film" in self.grupuj:
+            # film mógł zostać usunięty – wtedy tytul = None
+            kolumny.append(models.Film.tytul)
+        zapytanie = (
+            select(
+                *kolumny,
+                func.coalesce(func.sum(_sd.liczba_biletow), 0).label("liczba_biletow"),
+                func.coalesce(func.sum(_sd.przychod), 0.0).label("przychod"),
+            )
+            .where(_sd.data >= self.od, _sd.data <= self.do)
+            .group_by(*wymiary)
+            .order_by(*wymiary)
+        )
+        if "film" in self.grupuj:
+            zapytanie = zapytanie.outerjoin(
+                models.Film, models.Film.id_filmu == _sd.id_filmu
+            ).group_by(models.Film.tytul)
+        return zapytanie
+
+
+def _wiersz_raportu(wiersz) -> dict:
+    dane = dict(wiersz._mapping)
+    if dane.get("typ_biletu") == "":
+        # w Sprzedaz_Dzienna brak typu zapisujemy jako ''
+        dane["typ_biletu"] = None
+    dane["przychod"] = round(float(dane["przychod"]), 2)
+    return {pole: dane.get(pole) for pole in POLA_WIERSZA}
+
+
+@router.get("/sprzedaz", response_model=List[schemas.RaportSprzedazyWiersz])
+def raport_sprzedaz(
+    parametry: ParametryRaportu = Depends(),
+    db: Session = Depends(get_db_odczyt),
+):
+    """
+    Raport sprzedaży za okres [od, do], pogrupowany po wybranych wymiarach
+    (dzień, film, sala, typ biletu). Wymiary spoza ?grupuj=... są null.
+    Dla dużych okresów – /raport/sprzedaz/eksport (strumieniowo).
+    """
+    return [_wiersz_raportu(w) for w in db.execute(parametry.zapytanie())]
+
+
+def _strumien(zapytanie, naglowek: Optional[str], formatuj_paczke) -> Iterator[str]:
+    """
+    Czyta wynik paczkami po ROZMIAR_PACZKI wierszy i od razu je oddaje,
+    więc pamięć nie zależy od długości okresu. Własna sesja, bo generator
+    działa jeszcze po zakończeniu funkcji endpointu.
+    """
+    if naglowek is not None:
+        yield naglowek
+    db = SessionOdczyt()
+    try:
+        wynik = db.execute(zapytanie.execution_options(yield_per=ROZMIAR_PACZKI))
+        for paczka in wynik.partitions():
+            yield formatuj_paczke([_wiersz_raportu(w) for w in paczka])
+    finally:
+        db.close()
+
+
+def _csv(wiersze: List[list]) -> str:
+    bufor = io.StringIO()
+    csv.writer(bufor).writerows(wiersze)
+    return bufor.getvalue()
+
+
+def _paczka_csv(wiersze: List[dict]) -> str:
+    return _csv([[w[pole] for pole in POLA_WIERSZA] for w in wiersze])
+
+
+def _paczka_ndjson(wiersze: List[dict]) -> str:
+    return "".join(json.dumps(w, ensure_ascii=False) + "\n" for w in wiersze)
+
+
+@router.get("/sprzedaz/eksport")
+def eksport_sprzedazy(
+    parametry: ParametryRaportu = Depends(),
+    format: str = Query("csv", pattern="^(csv|ndjson)$", description="csv albo ndjson"),
+):
+    """
+    Ten sam raport co /raport/sprzedaz, wysyłany strumieniowo jako CSV
+    albo NDJSON (jeden obiekt JSON na linię).
+    """
+    if format == "csv":
+        naglowek = _csv([POLA_WIERSZA])
+        formatuj = _paczka_csv
+        media_type = "text/csv; charset=utf-8"
+    else:
+        naglowek = None
+        formatuj = _paczka_ndjson
+        media_type = "application/x-ndjson"
+
+    nazwa = f"sprzedaz_{parametry.od}_{parametry.do}.{format}"
+    return StreamingResponse(
+        _strumien(parametry.zapytanie(), naglowek, formatuj),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{nazwa}"'},
     )
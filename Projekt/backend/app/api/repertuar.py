@@ -1,10 +1,15 @@
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Header, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, joinedload
 
-from ..db import get_db
+from ..db import get_db_odczyt, get_async_db_odczyt
 from .. import models, schemas
+from ..bufor_repertuaru import bufor_repertuaru, pasuje_etag
+from ..listy import Strona
+from ..wyszukiwarka import fts_dostepne, trafienia
 
 router = APIRouter(
     prefix="/repertuar",
@@ -13,7 +18,7 @@ router = APIRouter(
 
 
 @router.get("/", response_model=List[schemas.SeansRepertuarOut])
-def pobierz_repertuar(
+async def pobierz_repertuar(
     data: Optional[str] = Query(
         None,
         description="Data w formacie YYYY-MM-DD. Jeśli pusta – zwracane są wszystkie seanse.",
@@ -22,7 +27,9 @@ def pobierz_repertuar(
         None,
         description="Opcjonalny filtr po id_filmu.",
     ),
-    db: Session = Depends(get_db),
+    strona: Strona = Depends(),
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db_odczyt),
 ):
     """
     UC-DB1: Pobranie repertuaru i seansów
@@ -30,81 +37,113 @@ def pobierz_repertuar(
     - Jeśli podana jest data -> filtrujemy po dacie.
     - Jeśli podany jest id_filmu -> filtrujemy po filmie.
     - Można podać oba naraz.
+    - Wyniki stronami po id_seansu (limit / po, app/listy.py).
+
+    Odpowiedź pochodzi z bufora (app/bufor_repertuaru.py) i ma ETag;
+    zapytanie z If-None-Match zgodnym z aktualnym ETagiem dostaje 304.
     """
 
-    # Ładujemy seanse razem z powiązanym filmem i salą
+    klucz = (data or None, id_filmu or None, strona.limit, strona.po)
+    wpis = bufor_repertuaru.pobierz(klucz)
+    if wpis is None:
+        wersja = bufor_repertuaru.wersja
+        wynik, kursor = await _zbuduj_repertuar(db, data, id_filmu, strona)
+        wpis = bufor_repertuaru.zapisz(klucz, wersja, wynik, kursor)
+
+    naglowki = {"ETag": wpis.etag, "Cache-Control": "no-cache", **strona.naglowki(wpis.kursor)}
+    if pasuje_etag(if_none_match, wpis.etag):
+        return Response(status_code=304, headers=naglowki)
+    return Response(content=wpis.tresc, media_type="application/json", headers=naglowki)
+
+
+async def _zbuduj_repertuar(
+    db: AsyncSession, data: Optional[str], id_filmu: Optional[int], strona: Strona
+) -> Tuple[List[dict], Optional[str]]:
+    # Tylko kolumny potrzebne w SeansRepertuarOut (JOIN zamiast całych obiektów)
     query = (
-        db.query(models.Seans)
-        .options(
-            joinedload(models.Seans.film),
-            joinedload(models.Seans.sala),
+        select(
+            models.Seans.id_seansu,
+            models.Seans.data,
+            models.Seans.godzina,
+            models.Sala.numer_sali,
+            models.Film.id_filmu,
+            models.Film.tytul,
+            models.Film.typ,
+            models.Film.czas_trwania,
         )
+        .join(models.Film, models.Seans.id_filmu == models.Film.id_filmu)
+        .join(models.Sala, models.Seans.id_sali == models.Sala.id_sali)
     )
 
     if data:
-        query = query.filter(models.Seans.data == data)
+        query = query.where(models.Seans.data == data)
 
     if id_filmu:
-        query = query.filter(models.Seans.id_filmu == id_filmu)
+        query = query.where(models.Seans.id_filmu == id_filmu)
 
-    seanse = query.all()
+    query = strona.zastosuj(query, models.Seans.id_seansu)
+    seanse, kursor = strona.podziel((await db.execute(query)).all(), "id_seansu")
 
     # Budujemy listę słowników pasującą do SeansRepertuarOut
-    wynik: List[dict] = []
-    for seans in seanse:
-        if not seans.film or not seans.sala:
-            # Teoretycznie nie powinno się zdarzyć, ale dla bezpieczeństwa
-            continue
-
-        wynik.append(
-            {
-                "id_seansu": seans.id_seansu,
-                "data": seans.data,
-                "godzina": seans.godzina,
-                "numer_sali": seans.sala.numer_sali,
-                "film": {
-                    "id_filmu": seans.film.id_filmu,
-                    "tytul": seans.film.tytul,
-                    "typ": seans.film.typ,
-                    "czas_trwania": seans.film.czas_trwania,
-                },
-            }
-        )
-
-    return wynik
+    wynik = [
+        {
+            "id_seansu": s.id_seansu,
+            "data": s.data,
+            "godzina": s.godzina,
+            "numer_sali": s.numer_sali,
+            "film": {
+                "id_filmu": s.id_filmu,
+                "tytul": s.tytul,
+                "typ": s.typ,
+                "czas_trwania": s.czas_trwania,
+            },
+        }
+        for s in seanse
+    ]
+
+    return wynik, kursor
 
 
 @router.get("/szukaj", response_model=List[schemas.SeansRepertuarOut])
 def szukaj_w_repertuarze(
-    q: str = Query(..., min_length=1, description="Fragment tytułu filmu"),
+    q: str = Query(..., min_length=1, description="Początek słów z tytułu filmu"),
     data: Optional[str] = Query(
         None,
         description="Opcjonalna data w formacie YYYY-MM-DD – ogranicza wyniki do tego dnia.",
     ),
-    db: Session = Depends(get_db),
+    limit: int = Query(100, ge=1, le=500, description="Maksymalna liczba seansów"),
+    db: Session = Depends(get_db_odczyt),
 ):
     """
-    Wyszukiwanie seansów w repertuarze po fragmencie tytułu filmu.
+    Wyszukiwanie seansów w repertuarze po tytule filmu (jak /filmy/szukaj).
+    Seanse najlepiej pasujących filmów są pierwsze, dalej po dacie i godzinie.
 
     Przykłady:
     - /repertuar/szukaj?q=avatar
-    - /repertuar/szukaj?q=man&data=2025-01-20
+    - /repertuar/szukaj?q=zolw&data=2025-01-20
     """
 
-    query = (
-        db.query(models.Seans)
-        .join(models.Film, models.Seans.id_filmu == models.Film.id_filmu)
-        .options(
-            joinedload(models.Seans.film),
-            joinedload(models.Seans.sala),
-        )
-        .filter(models.Film.tytul.ilike(f"%{q}%"))
+    query = db.query(models.Seans).options(
+        joinedload(models.Seans.film),
+        joinedload(models.Seans.sala),
     )
 
+    if fts_dostepne():
+        pasujace = trafienia(q)
+        if pasujace is None:
+            return []
+        query = query.join(pasujace, pasujace.c.id_filmu == models.Seans.id_filmu).order_by(
+            pasujace.c.trafnosc, models.Seans.data, models.Seans.godzina
+        )
+    else:
+        query = query.join(
+            models.Film, models.Seans.id_filmu == models.Film.id_filmu
+        ).filter(models.Film.tytul.ilike(f"%{q}%"))
+
     if data:
         query = query.filter(models.Seans.data == data)
 
-    seanse = query.all()
+    seanse = query.limit(limit).all()
 
     wynik: List[dict] = []
     for seans in seanse:
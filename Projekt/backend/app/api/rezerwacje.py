@@ -1,13 +1,26 @@
 # backend/app/api/rezerwacje.py
-from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
+from typing import Dict, List
 
-from ..db import get_db
+from ..db import get_db, get_async_db
 from .. import models, schemas
-from ..config_cennik import CENNIK_BILETOW
+from ..agregaty_sprzedazy import zmien_sprzedaz
+from ..silnik_cen import ceny_seansu_async
+from ..silnik_rezerwacji import (
+    KonfliktMiejsc,
+    kwota_rezerwacji,
+    sale_miejsc_async,
+    zajmij_miejsca_async,
+    zajmij_miejsca_wielu_async,
+)
+from ..stan_miejsc import stan_miejsc, ZAREZERWOWANE, OPLACONE, WOLNE
+from ..sprzatanie import sprzataj_rezerwacje
+from ..wygasanie import harmonogram_wygasania
 
 router = APIRouter(
     prefix="/rezerwacje",
@@ -15,90 +28,83 @@ router = APIRouter(
 )
 
 
+def _sprawdz_miejsca(
+    miejsca: List[int], id_sali: int, sale_miejsc: Dict[int, int], seans_opis: str = ""
+) -> None:
+    """sale_miejsc: id_miejsca -> id_sali z sale_miejsc_async (tylko żądane miejsca)."""
+    for m in miejsca:
+        if sale_miejsc.get(m) != id_sali:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Miejsce {m} nie należy do sali tego seansu{seans_opis}."
+            )
+
+    if len(set(miejsca)) != len(miejsca):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Lista miejsc zawiera powtórzenia{seans_opis}."
+        )
+
+
 @router.post("/", response_model=schemas.RezerwacjaOut, status_code=status.HTTP_201_CREATED)
-def utworz_rezerwacje(
+async def utworz_rezerwacje(
     dane: schemas.RezerwacjaCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     UC-DB3: Utworzenie rezerwacji
 
     - sprawdzamy seans
     - sprawdzamy, czy miejsca należą do sali seansu
-    - sprawdzamy dostępność miejsc
     - tworzymy rezerwację ze statusem 'Oczekująca'
+    - zajmujemy miejsca w tej samej transakcji (konflikt = miejsca zajęte)
     - wyliczamy data_wygasniecia = teraz + 15 min
-    - nadajemy cenę biletu na podstawie typu (CENNIK_BILETOW)
+    - nadajemy cenę biletu z cennika seansu (app/silnik_cen.py)
     """
 
     # --- 1. Czy seans istnieje? ---
-    seans = db.query(models.Seans).filter(models.Seans.id_seansu == dane.id_seansu).first()
+    seans = await db.get(models.Seans, dane.id_seansu)
     if not seans:
         raise HTTPException(status_code=404, detail="Seans nie istnieje.")
 
     # --- 2. Czy miejsca istnieją i należą do sali tego seansu? ---
-    miejsca_w_sali = (
-        db.query(models.Miejsce)
-        .filter(models.Miejsce.id_sali == seans.id_sali)
-        .all()
-    )
-    id_miejsc_w_sali = {m.id_miejsca for m in miejsca_w_sali}
-
-    for m in dane.miejsca:
-        if m not in id_miejsc_w_sali:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Miejsce {m} nie należy do sali tego seansu."
-            )
-
-    # --- 3. Czy miejsca są wolne? ---
-    zajete = (
-        db.query(models.RezerwacjaMiejsca.id_miejsca)
-        .join(models.Rezerwacja)
-        .filter(
-            models.Rezerwacja.id_seansu == dane.id_seansu,
-            models.RezerwacjaMiejsca.id_miejsca.in_(dane.miejsca),
-            models.Rezerwacja.status_rezerwacji.in_(["Oczekująca", "Potwierdzona"])
-        )
-        .all()
-    )
-    zajete_ids = {z[0] for z in zajete}
+    _sprawdz_miejsca(dane.miejsca, seans.id_sali, await sale_miejsc_async(db, dane.miejsca))
 
-    if zajete_ids:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Miejsca zajęte: {sorted(list(zajete_ids))}"
-        )
-
-    # --- 4. Tworzymy rekord rezerwacji ---
+    # --- 3. Tworzymy rekord rezerwacji ---
+    ceny = await ceny_seansu_async(db, seans)
     teraz = datetime.now()
-    data_wygasniecia = (teraz + timedelta(minutes=15)).isoformat()
+    wygasa = teraz + timedelta(minutes=15)
 
     nowa_rez = models.Rezerwacja(
         id_uzytkownika=dane.id_uzytkownika,
         id_seansu=dane.id_seansu,
         id_sali=seans.id_sali,
         status_rezerwacji="Oczekująca",  # przetwarzana
-        data_wygasniecia=data_wygasniecia,
+        data_wygasniecia=wygasa,
+        kwota=kwota_rezerwacji(dane.miejsca, dane.typ_biletu, ceny),
     )
 
     db.add(nowa_rez)
-    db.commit()
-    db.refresh(nowa_rez)
-
-    # --- 5. Dodajemy miejsca rezerwacji + cena biletu ---
-
-    for id_miejsca, typ in zip(dane.miejsca, dane.typ_biletu):
-        cena_jednego = CENNIK_BILETOW.get(typ, 0.0)
-        rm = models.RezerwacjaMiejsca(
-            id_rezerwacji=nowa_rez.id_rezerwacji,
-            id_miejsca=id_miejsca,
-            typ_biletu=typ,
-            cena_biletu=cena_jednego,
+    await db.flush()  # potrzebujemy id_rezerwacji, ale bez commita
+
+    # --- 4. Zajmujemy miejsca (warunkowy INSERT) + cena biletu ---
+    # Dostępność sprawdza unikalny indeks (id_seansu, id_miejsca),
+    # więc dwóch klientów nie może dostać tego samego miejsca.
+    try:
+        zajete = await zajmij_miejsca_async(db, nowa_rez, dane.miejsca, dane.typ_biletu, ceny)
+    except KonfliktMiejsc as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=400,
+            detail=f"Miejsca zajęte: {e.zajete}"
         )
-        db.add(rm)
 
-    db.commit()
+    # --- 5. Jeden commit na całą rezerwację ---
+    await db.commit()
+
+    # w pamięci tylko miejsca, które naprawdę trafiły do bazy
+    stan_miejsc.oznacz(dane.id_seansu, zajete, ZAREZERWOWANE)
+    harmonogram_wygasania.dodaj(nowa_rez.id_rezerwacji, wygasa)
 
     return schemas.RezerwacjaOut(
         id_rezerwacji=nowa_rez.id_rezerwacji,
@@ -106,6 +112,207 @@ def utworz_rezerwacje(
         id_seansu=nowa_rez.id_seansu,
         status_rezerwacji=nowa_rez.status_rezerwacji,
         miejsca=dane.miejsca,
+        kwota=nowa_rez.kwota,
+    )
+
+
+@router.post("/pakiet", response_model=schemas.RezerwacjaPakietOut, status_code=status.HTTP_201_CREATED)
+async def utworz_rezerwacje_pakiet(
+    dane: schemas.RezerwacjaPakietCreate,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Rezerwacja miejsc na kilka seansów naraz (szkoły, firmy) – wszystko
+    albo nic.
+
+    - jedna rezerwacja 'Oczekująca' na każdy seans pakietu
+    - seanse i miejsca sprawdzamy zbiorczo (po jednym zapytaniu na
+      wszystkie seanse i wszystkie miejsca)
+    - wszystkie miejsca zajmujemy jednym warunkowym INSERT w jednej
+      transakcji; jeśli choć jedno jest zajęte – rollback i 400 z listą
+      zajętych miejsc w każdym seansie
+    """
+
+    # --- 1. Seanse pakietu – jedno zapytanie ---
+    id_seansow = [p.id_seansu for p in dane.pozycje]
+    powtorzone = sorted({i for i in id_seansow if id_seansow.count(i) > 1})
+    if powtorzone:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Seanse występują w pakiecie więcej niż raz: {powtorzone}"
+        )
+    seanse = {
+        s.id_seansu: s
+        for s in (
+            await db.scalars(select(models.Seans).where(models.Seans.id_seansu.in_(id_seansow)))
+        ).all()
+    }
+    brakujace = [i for i in id_seansow if i not in seanse]
+    if brakujace:
+        raise HTTPException(status_code=404, detail=f"Seanse nie istnieją: {brakujace}")
+
+    # --- 2. Miejsca wszystkich seansów – jedno zapytanie ---
+    sale_miejsc = await sale_miejsc_async(db, (m for p in dane.pozycje for m in p.miejsca))
+    for p in dane.pozycje:
+        _sprawdz_miejsca(
+            p.miejsca, seanse[p.id_seansu].id_sali, sale_miejsc, f" (seans {p.id_seansu})"
+        )
+
+    # --- 3. Rezerwacje (jeden flush) ---
+    wygasa = datetime.now() + timedelta(minutes=15)
+    pozycje = []
+    for p in dane.pozycje:
+        seans = seanse[p.id_seansu]
+        ceny = await ceny_seansu_async(db, seans)
+        rez = models.Rezerwacja(
+            id_uzytkownika=dane.id_uzytkownika,
+            id_seansu=p.id_seansu,
+            id_sali=seans.id_sali,
+            status_rezerwacji="Oczekująca",
+            data_wygasniecia=wygasa,
+            kwota=kwota_rezerwacji(p.miejsca, p.typ_biletu, ceny),
+        )
+        db.add(rez)
+        pozycje.append((rez, p.miejsca, p.typ_biletu, ceny))
+    await db.flush()
+
+    # --- 4. Wszystkie miejsca jednym warunkowym INSERT ---
+    try:
+        zajete = await zajmij_miejsca_wielu_async(db, pozycje)
+    except KonfliktMiejsc as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "komunikat": "Miejsca zajęte – pakiet nie został zarezerwowany.",
+                "zajete": [
+                    {"id_seansu": id_seansu, "miejsca": miejsca}
+                    for id_seansu, miejsca in e.w_seansach.items()
+                ],
+            },
+        )
+
+    # --- 5. Jeden commit na cały pakiet ---
+    await db.commit()
+
+    rezerwacje = []
+    for rez, miejsca, _, _ in pozycje:
+        # w pamięci tylko miejsca, które naprawdę trafiły do bazy
+        stan_miejsc.oznacz(rez.id_seansu, zajete.get(rez.id_seansu, []), ZAREZERWOWANE)
+        harmonogram_wygasania.dodaj(rez.id_rezerwacji, wygasa)
+        rezerwacje.append(
+            schemas.RezerwacjaOut(
+                id_rezerwacji=rez.id_rezerwacji,
+                id_uzytkownika=rez.id_uzytkownika,
+                id_seansu=rez.id_seansu,
+                status_rezerwacji=rez.status_rezerwacji,
+                miejsca=miejsca,
+                kwota=rez.kwota,
+            )
+        )
+
+    return schemas.RezerwacjaPakietOut(
+        rezerwacje=rezerwacje,
+        kwota=sum(r.kwota for r in rezerwacje),
+    )
+
+
+# Ile razy szukamy nowego bloku, gdy baza odrzuci wybrany (ten sam blok
+# wybrała równoległa grupa albo stan w pamięci był nieaktualny)
+PROBY_NAJLEPSZYCH = 5
+
+
+@router.post("/najlepsze", response_model=schemas.RezerwacjaOut, status_code=status.HTTP_201_CREATED)
+async def utworz_rezerwacje_najlepsze(
+    dane: schemas.RezerwacjaGrupowaCreate,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Rezerwacja grupowa: serwer wybiera najlepsze `liczba_miejsc` wolnych
+    miejsc obok siebie w jednym rzędzie (opcjonalnie w zakresie rzędów,
+    domyślnie jak najbliżej środka sali).
+
+    - blok wyszukuje stan_miejsc (indeks wolnych odcinków w rzędach, bez
+      zapytań do bazy); miejsca oznaczamy w pamięci dopiero po commicie
+    - dalej jak UC-DB3: rezerwacja 'Oczekująca' + warunkowy INSERT miejsc
+    - jeśli baza odrzuci blok, stan seansu czytamy od nowa z bazy i szukamy
+      jeszcze raz (stan_miejsc jest per proces – przy kilku workerach może
+      nie znać rezerwacji z innych procesów)
+    """
+
+    # --- 1. Czy seans istnieje? ---
+    seans = await db.get(models.Seans, dane.id_seansu)
+    if not seans:
+        raise HTTPException(status_code=404, detail="Seans nie istnieje.")
+
+    if dane.rzad_od is not None and dane.rzad_do is not None and dane.rzad_od > dane.rzad_do:
+        raise HTTPException(
+            status_code=400,
+            detail="Niepoprawny zakres rzędów (rzad_od > rzad_do)."
+        )
+    # rollback po konflikcie wygasza obiekty sesji – id sali zapamiętujemy
+    id_sali = seans.id_sali
+    ceny = await ceny_seansu_async(db, seans)
+
+    for _ in range(PROBY_NAJLEPSZYCH):
+        # --- 2. Wybór bloku w pamięci ---
+        miejsca = stan_miejsc.najlepsze_miejsca(
+            dane.id_seansu, dane.liczba_miejsc, dane.rzad_od, dane.rzad_do, dane.srodek
+        )
+        if miejsca is None:
+            # zimny start – stan seansu budujemy z bazy i szukamy jeszcze raz
+            await db.run_sync(stan_miejsc.mapa_miejsc, dane.id_seansu)
+            miejsca = stan_miejsc.najlepsze_miejsca(
+                dane.id_seansu, dane.liczba_miejsc, dane.rzad_od, dane.rzad_do, dane.srodek
+            )
+        if not miejsca:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Brak {dane.liczba_miejsc} wolnych miejsc obok siebie.",
+            )
+
+        # --- 3. Rekord rezerwacji + warunkowy INSERT miejsc ---
+        teraz = datetime.now()
+        wygasa = teraz + timedelta(minutes=15)
+        typy_biletow = [dane.typ_biletu] * len(miejsca)
+
+        nowa_rez = models.Rezerwacja(
+            id_uzytkownika=dane.id_uzytkownika,
+            id_seansu=dane.id_seansu,
+            id_sali=id_sali,
+            status_rezerwacji="Oczekująca",
+            data_wygasniecia=wygasa,
+            kwota=kwota_rezerwacji(miejsca, typy_biletow, ceny),
+        )
+        try:
+            db.add(nowa_rez)
+            await db.flush()
+            await zajmij_miejsca_async(
+                db, nowa_rez, miejsca, typy_biletow, ceny
+            )
+            await db.commit()
+        except KonfliktMiejsc:
+            await db.rollback()
+            # stan w pamięci rozminął się z bazą – w następnej próbie
+            # budujemy go od nowa z bazy
+            stan_miejsc.zapomnij_seans(dane.id_seansu)
+            continue
+
+        stan_miejsc.oznacz(dane.id_seansu, miejsca, ZAREZERWOWANE)
+        harmonogram_wygasania.dodaj(nowa_rez.id_rezerwacji, wygasa)
+
+        return schemas.RezerwacjaOut(
+            id_rezerwacji=nowa_rez.id_rezerwacji,
+            id_uzytkownika=nowa_rez.id_uzytkownika,
+            id_seansu=nowa_rez.id_seansu,
+            status_rezerwacji=nowa_rez.status_rezerwacji,
+            miejsca=miejsca,
+            kwota=nowa_rez.kwota,
+        )
+
+    raise HTTPException(
+        status_code=409,
+        detail="Nie udało się zarezerwować bloku miejsc – spróbuj ponownie.",
     )
 
 
@@ -135,7 +342,11 @@ def potwierdz_rezerwacje(
             detail=f"Rezerwacja nie jest w statusie 'Oczekująca' (aktualny status: {rez.status_rezerwacji}).",
         )
 
-    rez.status_rezerwacji = "Potwierdzona"
+    # Warunkowy UPDATE: z dwóch równoległych potwierdzeń status zmieni
+    # tylko jedno i tylko ono doliczy bilety do sprzedaży dziennej.
+    if not _zmien_status(db, id_rezerwacji, "Oczekująca", "Potwierdzona"):
+        raise _status_zmieniony(db, rez)
+    zmien_sprzedaz(db, [id_rezerwacji], +1)
     db.commit()
     db.refresh(rez)
 
@@ -146,12 +357,15 @@ def potwierdz_rezerwacje(
     )
     id_miejsc = [rm.id_miejsca for rm in miejsca_rez]
 
+    stan_miejsc.oznacz(rez.id_seansu, id_miejsc, OPLACONE)
+
     return schemas.RezerwacjaOut(
         id_rezerwacji=rez.id_rezerwacji,
         id_uzytkownika=rez.id_uzytkownika,
         id_seansu=rez.id_seansu,
         status_rezerwacji=rez.status_rezerwacji,
         miejsca=id_miejsc,
+        kwota=rez.kwota,
     )
 
 
@@ -191,68 +405,66 @@ def anuluj_rezerwacje(
     )
     id_miejsc = [rm.id_miejsca for rm in miejsca_rez]
 
+    if not _zmien_status(db, id_rezerwacji, rez.status_rezerwacji, "Anulowana"):
+        raise _status_zmieniony(db, rez)
+    if rez.status_rezerwacji == "Potwierdzona":
+        # odejmujemy sprzedaż, póki są jeszcze wiersze Rezerwacja_Miejsca
+        zmien_sprzedaz(db, [id_rezerwacji], -1)
+
     db.query(models.RezerwacjaMiejsca).filter(
         models.RezerwacjaMiejsca.id_rezerwacji == id_rezerwacji
     ).delete(synchronize_session=False)
 
-    rez.status_rezerwacji = "Anulowana"
     db.commit()
     db.refresh(rez)
 
+    stan_miejsc.oznacz(rez.id_seansu, id_miejsc, WOLNE)
+
     return schemas.RezerwacjaOut(
         id_rezerwacji=rez.id_rezerwacji,
         id_uzytkownika=rez.id_uzytkownika,
         id_seansu=rez.id_seansu,
         status_rezerwacji=rez.status_rezerwacji,
         miejsca=id_miejsc,
+        kwota=rez.kwota,
     )
 
 
-@router.post("/sprzataj_wygasle")
-def sprzataj_wygasle_rezerwacje(
-    db: Session = Depends(get_db),
-):
-    """
-    UC-DB8: Sprzątanie rezerwacji wygasłych
-    """
-
-    teraz = datetime.now()
-    wygasle_ids: List[int] = []
-    bledne_formaty: List[int] = []
-
-    rezerwacje_kandydaci = (
+def _zmien_status(db: Session, id_rezerwacji: int, z_statusu: str, na_status: str) -> bool:
+    """UPDATE ... WHERE status = z_statusu; False, jeśli ktoś zmienił status wcześniej."""
+    zmienione = (
         db.query(models.Rezerwacja)
         .filter(
-            models.Rezerwacja.status_rezerwacji == "Oczekująca",
-            models.Rezerwacja.data_wygasniecia.isnot(None),
+            models.Rezerwacja.id_rezerwacji == id_rezerwacji,
+            models.Rezerwacja.status_rezerwacji == z_statusu,
         )
-        .all()
+        .update({models.Rezerwacja.status_rezerwacji: na_status}, synchronize_session=False)
     )
+    return zmienione == 1
 
-    for rez in rezerwacje_kandydaci:
-        if not rez.data_wygasniecia:
-            continue
 
-        try:
-            data_wyg = datetime.fromisoformat(rez.data_wygasniecia)
-        except ValueError:
-            bledne_formaty.append(rez.id_rezerwacji)
-            continue
-
-        if data_wyg < teraz:
-            wygasle_ids.append(rez.id_rezerwacji)
-
-            db.query(models.RezerwacjaMiejsca).filter(
-                models.RezerwacjaMiejsca.id_rezerwacji == rez.id_rezerwacji
-            ).delete(synchronize_session=False)
-
-            rez.status_rezerwacji = "Expired"
+def _status_zmieniony(db: Session, rez: models.Rezerwacja) -> HTTPException:
+    db.rollback()
+    db.refresh(rez)
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"Status rezerwacji zmienił się w międzyczasie (aktualny status: {rez.status_rezerwacji}).",
+    )
 
-    db.commit()
 
-    return {
-        "liczba_wygaslcych": len(wygasle_ids),
-        "id_wygaslcych": wygasle_ids,
-        "bledny_format_data_wygasniecia": bledne_formaty,
-    }
+@router.post("/sprzataj_wygasle")
+def sprzataj_wygasle_rezerwacje(
+    rozmiar_partii: int | None = Query(
+        None, gt=0, description="Ile rezerwacji zwalniać w jednej transakcji (domyślnie z ustawień)."
+    ),
+    db: Session = Depends(get_db),
+):
+    """
+    UC-DB8: Sprzątanie rezerwacji wygasłych
 
+    Na co dzień robi to harmonogram (app/wygasanie.py) – endpoint zostaje
+    do ręcznego uruchomienia. Zwraca jak dawniej liczbę i id zwolnionych
+    rezerwacji oraz bledny_format_data_wygasniecia (oczekujące bez
+    czytelnego terminu), a do tego liczbę partii i czas.
+    """
+    return sprzataj_rezerwacje(db, rozmiar_partii)
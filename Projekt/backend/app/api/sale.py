@@ -1,10 +1,21 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
-from ..db import get_db
+from ..db import get_db, get_db_odczyt
 from .. import models, schemas
+from ..listy import Strona, kolumny_schematu
+from ..stan_miejsc import stan_miejsc
+from ..uklad_sali import (
+    NiepoprawnyUklad,
+    sprawdz_uklad,
+    uklad_prostokatny,
+    uklad_szablonu,
+    usun_miejsca,
+    wstaw_miejsca,
+)
 
 router = APIRouter(
     prefix="/sale",
@@ -55,14 +66,79 @@ def dodaj_sale(
 # =======================
 @router.get("/", response_model=List[schemas.SalaOut])
 def lista_sal(
-    db: Session = Depends(get_db),
+    response: Response,
+    strona: Strona = Depends(),
+    db: Session = Depends(get_db_odczyt),
 ):
     """
-    Lista wszystkich sal w systemie.
+    Lista sal w systemie, stronami po id_sali (app/listy.py).
     Przydatne przy konfiguracji i wyborze sali przy tworzeniu seansu.
     """
-    sale = db.query(models.Sala).all()
-    return sale
+    zapytanie = db.query(*kolumny_schematu(models.Sala, schemas.SalaOut))
+    zapytanie = strona.zastosuj(zapytanie, models.Sala.id_sali)
+    return strona.utnij(zapytanie.all(), response, "id_sali")
+
+
+# =======================
+# Szablony układu sali
+# =======================
+@router.post(
+    "/szablony", response_model=schemas.SzablonSaliOut, status_code=status.HTTP_201_CREATED
+)
+def dodaj_szablon(
+    szablon_in: schemas.SzablonSaliCreate,
+    db: Session = Depends(get_db),
+):
+    """
+    Zapisuje nazwany układ miejsc (liczba miejsc w kolejnych rzędach),
+    używany potem przez generuj_miejsca?szablon=... i /sale/multipleks.
+    """
+    try:
+        uklad = sprawdz_uklad(szablon_in.miejsca_w_rzedach)
+    except NiepoprawnyUklad as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    if uklad_szablonu(db, szablon_in.nazwa) is not None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Szablon o podanej nazwie już istnieje.",
+        )
+
+    szablon = models.SzablonSali(nazwa=szablon_in.nazwa, miejsca_w_rzedach=uklad)
+    db.add(szablon)
+    db.commit()
+    db.refresh(szablon)
+    return szablon
+
+
+@router.get("/szablony", response_model=List[schemas.SzablonSaliOut])
+def lista_szablonow(db: Session = Depends(get_db_odczyt)):
+    return db.query(models.SzablonSali).order_by(models.SzablonSali.nazwa).all()
+
+
+def _wybierz_uklad(
+    db: Session,
+    szablon: Optional[str],
+    miejsca_w_rzedach: Optional[List[int]],
+) -> List[int]:
+    """Układ z szablonu albo podany wprost – dokładnie jedno z dwóch."""
+    if (szablon is None) == (miejsca_w_rzedach is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Podaj albo nazwę szablonu, albo układ miejsc (nie oba naraz).",
+        )
+    if szablon is not None:
+        uklad = uklad_szablonu(db, szablon)
+        if uklad is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Szablon o podanej nazwie nie istnieje.",
+            )
+        return uklad
+    try:
+        return sprawdz_uklad(miejsca_w_rzedach)
+    except NiepoprawnyUklad as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
 # =======================
@@ -71,8 +147,11 @@ def lista_sal(
 @router.post("/{id_sali}/generuj_miejsca")
 def generuj_miejsca_w_sali(
     id_sali: int,
-    rzedy: int = Query(..., gt=0, description="Liczba rzędów w sali"),
-    na_rzad: int = Query(..., gt=0, description="Liczba miejsc w jednym rzędzie"),
+    rzedy: Optional[int] = Query(None, gt=0, description="Liczba rzędów w sali"),
+    na_rzad: Optional[int] = Query(None, gt=0, description="Liczba miejsc w jednym rzędzie"),
+    szablon: Optional[str] = Query(
+        None, description="Nazwa szablonu układu (zamiast rzedy + na_rzad)"
+    ),
     nadpisz: bool = Query(
         False,
         description=(
@@ -86,11 +165,13 @@ def generuj_miejsca_w_sali(
     Generuje układ miejsc dla danej sali.
 
     - Sprawdza, czy sala istnieje.
+    - Układ: prostokąt rzedy x na_rzad albo zapisany szablon (?szablon=...).
     - Jeśli sala ma już miejsca i nadpisz=False -> błąd.
-    - Jeśli nadpisz=True -> usuwa stare miejsca i tworzy nowe.
-    - Tworzy miejsca w tabeli Miejsce:
-        rząd:    1 .. rzedy
-        numer:   1 .. na_rzad
+    - Jeśli nadpisz=True -> usuwa stare miejsca i tworzy nowe
+      (w jednej transakcji – błąd nie zostawia pustej sali).
+    - Tworzy miejsca w tabeli Miejsce (jeden executemany, app/uklad_sali.py):
+        rząd:    1 .. liczba rzędów
+        numer:   1 .. liczba miejsc w danym rzędzie
         status:  'Wolne'
     """
 
@@ -106,7 +187,19 @@ def generuj_miejsca_w_sali(
             detail="Sala o podanym id nie istnieje.",
         )
 
-    # 2. Sprawdzenie, czy sala ma już miejsca
+    # 2. Układ miejsc
+    if szablon is None and (rzedy is None or na_rzad is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Podaj rzedy i na_rzad albo nazwę szablonu.",
+        )
+    uklad = _wybierz_uklad(
+        db,
+        szablon,
+        uklad_prostokatny(rzedy, na_rzad) if szablon is None else None,
+    )
+
+    # 3. Sprawdzenie, czy sala ma już miejsca
     istniejące_miejsca_count = (
         db.query(models.Miejsce)
         .filter(models.Miejsce.id_sali == id_sali)
@@ -122,33 +215,73 @@ def generuj_miejsca_w_sali(
             ),
         )
 
-    # 3. Jeśli nadpisz=True – usuwamy stare miejsca
+    # 4. Jeśli nadpisz=True – usuwamy stare miejsca (commit dopiero po wstawieniu nowych)
     if istniejące_miejsca_count > 0 and nadpisz:
-        db.query(models.Miejsce).filter(
-            models.Miejsce.id_sali == id_sali
-        ).delete(synchronize_session=False)
-        db.commit()
-
-    # 4. Generowanie nowych miejsc
-    nowe_miejsca = []
-    for rzad in range(1, rzedy + 1):
-        for numer in range(1, na_rzad + 1):
-            nowe_miejsca.append(
-                models.Miejsce(
-                    id_sali=id_sali,
-                    rzad=rzad,
-                    numer=numer,
-                    status="Wolne",
-                )
-            )
+        usun_miejsca(db, id_sali)
 
-    db.add_all(nowe_miejsca)
+    # 5. Generowanie nowych miejsc
+    liczba_miejsc = wstaw_miejsca(db, [id_sali], uklad)
     db.commit()
 
+    stan_miejsc.zapomnij_sale(id_sali)
+
     return {
         "id_sali": id_sali,
-        "rzedy": rzedy,
-        "miejsca_w_rzedzie": na_rzad,
-        "liczba_wygenerowanych_miejsc": len(nowe_miejsca),
+        "rzedy": len(uklad),
+        # przy nierównych rzędach – największa liczba miejsc w rzędzie
+        "miejsca_w_rzedzie": max(uklad),
+        "liczba_wygenerowanych_miejsc": liczba_miejsc,
         "nadpisano_poprzednie": istniejące_miejsca_count > 0 and nadpisz,
     }
+
+
+# =======================
+# Multipleks: wiele sal naraz
+# =======================
+@router.post(
+    "/multipleks",
+    response_model=List[schemas.SalaZMiejscamiOut],
+    status_code=status.HTTP_201_CREATED,
+)
+def dodaj_multipleks(
+    multipleks_in: schemas.MultipleksCreate,
+    db: Session = Depends(get_db),
+):
+    """
+    Tworzy wiele sal o tym samym układzie miejsc w jednej transakcji:
+    albo powstają wszystkie sale z miejscami, albo żadna.
+    """
+
+    # 1. Układ miejsc
+    uklad = _wybierz_uklad(db, multipleks_in.szablon, multipleks_in.miejsca_w_rzedach)
+
+    # 2. Numery sal: bez powtórzeń i jeszcze niezajęte
+    numery = multipleks_in.numery_sal
+    if len(set(numery)) != len(numery) or min(numery) <= 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Numery sal muszą być dodatnie i nie mogą się powtarzać.",
+        )
+    zajete = sorted(
+        db.scalars(
+            select(models.Sala.numer_sali).where(models.Sala.numer_sali.in_(numery))
+        )
+    )
+    if zajete:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Sale o numerach {zajete} już istnieją.",
+        )
+
+    # 3. Sale, potem miejsca wszystkich sal jednym executemany
+    sale = [models.Sala(numer_sali=numer) for numer in numery]
+    db.add_all(sale)
+    db.flush()
+    wstaw_miejsca(db, [s.id_sali for s in sale], uklad)
+    db.commit()
+
+    liczba_miejsc = sum(uklad)
+    return [
+        {"id_sali": s.id_sali, "numer_sali": s.numer_sali, "liczba_miejsc": liczba_miejsc}
+        for s in sale
+    ]
@@ -1,11 +1,30 @@
-from typing import List, Dict
+from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException, Response, WebSocket, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import datetime
 
-from ..db import get_db
+from ..db import get_db, get_db_odczyt, get_async_db_odczyt
 from .. import models, schemas
+from ..agregaty_sprzedazy import potwierdzone_rezerwacje_seansu, zmien_sprzedaz
+from ..config import ustawienia
+from ..kolizje_seansow import (
+    Przedzial,
+    kolidujace_seanse,
+    kolizje_planu,
+    koniec_seansu,
+    opis_konfliktu,
+)
+from ..listy import Strona, kolumny_schematu
+from ..na_zywo import ZaDuzoSubskrypcji, koncentrator_miejsc
+from ..sprzatanie import sprzataj_seanse
+from ..stan_miejsc import stan_miejsc
+from ..bufor_repertuaru import bufor_repertuaru
 
 router = APIRouter(
     prefix="/seanse",
@@ -13,34 +32,46 @@ router = APIRouter(
 )
 
 
-def _map_status_rezerwacji_na_status_miejsca(status_rezerwacji: str) -> str | None:
+# Godzina jak dawniej przyjmowana przez API: "18:00", "8:00", "18:00:00"
+FORMATY_GODZINY = ("%H:%M", "%H:%M:%S")
+
+
+def _poczatek_seansu(data: str, godzina: str) -> datetime:
     """
-    Zamienia status rezerwacji (z tabeli Rezerwacja.status_rezerwacji)
-    na status miejsca zgodny z UC-DB2.
+    Składa data (YYYY-MM-DD) + godzina (H:MM / HH:MM[:SS]) w znacznik czasu
+    Seans.poczatek.
     """
-    if status_rezerwacji == "Oczekująca":
-        return "Zarezerwowane"
-    if status_rezerwacji == "Potwierdzona":
-        return "Opłacone"
-    return None
+    for format_godziny in FORMATY_GODZINY:
+        try:
+            return datetime.strptime(f"{data} {godzina.strip()}", f"%Y-%m-%d {format_godziny}")
+        except ValueError:
+            continue
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Niepoprawny format daty (YYYY-MM-DD) lub godziny (HH:MM).",
+    )
+
 
 from fastapi import Query
 
 @router.get("/", response_model=List[schemas.SeansOut])
 def lista_seansow(
+    response: Response,
     data: str | None = Query(None, description="Filtruj po dacie (YYYY-MM-DD)"),
     id_filmu: int | None = Query(None, description="Filtruj po ID filmu"),
-    db: Session = Depends(get_db),
+    strona: Strona = Depends(),
+    db: Session = Depends(get_db_odczyt),
 ):
     """
-    Lista seansów z opcjonalnym filtrowaniem:
-    - /seanse -> wszystkie seanse
+    Lista seansów z opcjonalnym filtrowaniem, stronami po id_seansu:
+    - /seanse -> pierwsza strona wszystkich seansów
     - /seanse?data=2025-01-20
     - /seanse?id_filmu=3
     - /seanse?data=2025-01-20&id_filmu=3
+    - /seanse?po=120 -> następna strona (kursor z nagłówka X-Nastepny-Kursor)
     """
 
-    zapytanie = db.query(models.Seans)
+    zapytanie = db.query(*kolumny_schematu(models.Seans, schemas.SeansOut))
 
     if data:
         zapytanie = zapytanie.filter(models.Seans.data == data)
@@ -48,75 +79,116 @@ def lista_seansow(
     if id_filmu:
         zapytanie = zapytanie.filter(models.Seans.id_filmu == id_filmu)
 
-    return zapytanie.all()
+    zapytanie = strona.zastosuj(zapytanie, models.Seans.id_seansu)
+    return strona.utnij(zapytanie.all(), response, "id_seansu")
 
 
 # =======================
 # UC-DB2: mapa miejsc
 # =======================
 @router.get("/{id_seansu}/miejsca", response_model=List[schemas.MiejsceSeansuOut])
-def pobierz_miejsca_dla_seansu(
+async def pobierz_miejsca_dla_seansu(
     id_seansu: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db_odczyt),
 ):
     """
     UC-DB2: Mapa dostępności miejsc dla seansu.
+
+    Odczyt idzie z pamięci (app/stan_miejsc.py) – baza jest czytana
+    tylko przy pierwszym odczycie danego seansu.
     """
 
-    seans = (
-        db.query(models.Seans)
-        .filter(models.Seans.id_seansu == id_seansu)
-        .first()
-    )
-    if not seans:
+    mapa = stan_miejsc.mapa_z_pamieci(id_seansu)
+    if mapa is None:
+        mapa = await db.run_sync(stan_miejsc.mapa_miejsc, id_seansu)
+    if mapa is None:
         raise HTTPException(status_code=404, detail="Seans nie został znaleziony")
 
-    miejsca = (
-        db.query(models.Miejsce)
-        .filter(models.Miejsce.id_sali == seans.id_sali)
-        .all()
-    )
+    return mapa
 
-    if not miejsca:
-        return []
 
-    rezerwacje_miejsca = (
-        db.query(
-            models.RezerwacjaMiejsca.id_miejsca,
-            models.Rezerwacja.status_rezerwacji,
-        )
-        .join(
-            models.Rezerwacja,
-            models.RezerwacjaMiejsca.id_rezerwacji == models.Rezerwacja.id_rezerwacji,
+# =======================
+# UC-DB2: mapa miejsc na żywo
+# =======================
+@router.websocket("/{id_seansu}/miejsca/ws")
+async def miejsca_na_zywo_ws(websocket: WebSocket, id_seansu: int):
+    """
+    Mapa miejsc, a potem zmiany statusów (app/na_zywo.py).
+    Klient nic nie wysyła; zamknięcie połączenia kończy subskrypcję.
+    """
+    if await koncentrator_miejsc.zdarzenie_mapy(id_seansu) is None:
+        await websocket.close(code=1008, reason="Seans nie został znaleziony")
+        return
+
+    try:
+        with koncentrator_miejsc.subskrypcja(id_seansu) as kolejka:
+            await websocket.accept()
+            # mapa dopiero po zapisaniu się: zmiana z międzyczasu przyjdzie najwyżej
+            # dwa razy, a ten sam status ustawiony drugi raz niczego nie psuje
+            mapa = await koncentrator_miejsc.zdarzenie_mapy(id_seansu)
+            if mapa is None:
+                await websocket.close(code=1008, reason="Seans nie został znaleziony")
+                return
+            await websocket.send_text(mapa)
+
+            async def wysylaj():
+                while (tresc := await kolejka.get()) is not None:
+                    await websocket.send_text(tresc)
+
+            async def odbieraj():
+                while (await websocket.receive())["type"] != "websocket.disconnect":
+                    pass
+
+            zadania = [asyncio.create_task(wysylaj()), asyncio.create_task(odbieraj())]
+            try:
+                await asyncio.wait(zadania, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                for zadanie in zadania:
+                    zadanie.cancel()
+    except ZaDuzoSubskrypcji:
+        await websocket.close(code=1013, reason="Za dużo subskrypcji, spróbuj później")
+
+
+@router.get("/{id_seansu}/miejsca/strumien")
+async def miejsca_na_zywo_sse(id_seansu: int):
+    """
+    To samo co /miejsca/ws jako Server-Sent Events (EventSource w przeglądarce).
+    """
+    if await koncentrator_miejsc.zdarzenie_mapy(id_seansu) is None:
+        raise HTTPException(status_code=404, detail="Seans nie został znaleziony")
+    if koncentrator_miejsc.liczba_subskrypcji >= ustawienia.na_zywo_maks_subskrypcji:
+        raise HTTPException(
+            status_code=503,
+            detail="Za dużo subskrypcji, spróbuj później.",
+            headers={"Retry-After": "5"},
         )
-        .filter(models.Rezerwacja.id_seansu == id_seansu)
-        .all()
-    )
-
-    statusy_miejsc: Dict[int, str] = {m.id_miejsca: "Wolne" for m in miejsca}
-    priorytet = {"Wolne": 0, "Zarezerwowane": 1, "Opłacone": 2}
-
-    for id_miejsca, status_rezerwacji in rezerwacje_miejsca:
-        status_miejsca = _map_status_rezerwacji_na_status_miejsca(status_rezerwacji)
-        if status_miejsca is None:
-            continue
-
-        obecny_status = statusy_miejsc.get(id_miejsca, "Wolne")
-
-        if priorytet[status_miejsca] > priorytet[obecny_status]:
-            statusy_miejsc[id_miejsca] = status_miejsca
 
-    wynik = [
-        {
-            "id_miejsca": m.id_miejsca,
-            "rzad": m.rzad,
-            "numer": m.numer,
-            "status": statusy_miejsc.get(m.id_miejsca, "Wolne"),
-        }
-        for m in miejsca
-    ]
-
-    return wynik
+    async def zdarzenia():
+        try:
+            with koncentrator_miejsc.subskrypcja(id_seansu) as kolejka:
+                mapa = await koncentrator_miejsc.zdarzenie_mapy(id_seansu)
+                if mapa is None:
+                    return
+                yield f"data: {mapa}\n\n"
+                while True:
+                    try:
+                        tresc = await asyncio.wait_for(
+                            kolejka.get(), timeout=ustawienia.na_zywo_ping_s
+                        )
+                    except asyncio.TimeoutError:
+                        yield ": ping\n\n"
+                        continue
+                    if tresc is None:
+                        return
+                    yield f"data: {tresc}\n\n"
+        except ZaDuzoSubskrypcji:
+            return
+
+    return StreamingResponse(
+        zdarzenia(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 # =======================
@@ -147,35 +219,139 @@ def dodaj_seans(
     if not sala:
         raise HTTPException(status_code=404, detail="Sala o podanym id nie istnieje")
 
-    konflikt = (
-        db.query(models.Seans)
-        .filter(
-            models.Seans.id_sali == seans_in.id_sali,
-            models.Seans.data == seans_in.data,
-            models.Seans.godzina == seans_in.godzina,
-        )
-        .first()
-    )
-    if konflikt:
-        raise HTTPException(
-            status_code=400,
-            detail="W tej sali jest już seans o podanej dacie i godzinie.",
-        )
+    poczatek = _poczatek_seansu(seans_in.data, seans_in.godzina)
+    koniec = koniec_seansu(poczatek, film.czas_trwania)
+
+    # Czy w sali nie ma seansu w tym czasie (z przerwą techniczną)?
+    kolizje = kolidujace_seanse(db, seans_in.id_sali, poczatek, koniec)
+    if kolizje:
+        raise HTTPException(status_code=400, detail=opis_konfliktu(kolizje))
 
     nowy_seans = models.Seans(
         id_filmu=seans_in.id_filmu,
         id_sali=seans_in.id_sali,
         data=seans_in.data,
         godzina=seans_in.godzina,
+        poczatek=poczatek,
+        koniec=koniec,
     )
 
     db.add(nowy_seans)
     db.commit()
     db.refresh(nowy_seans)
+    bufor_repertuaru.uniewaznij()
 
     return nowy_seans
 
 
+# =======================
+# Import planu seansów
+# =======================
+@router.post("/import", response_model=schemas.WynikImportuSeansow)
+def importuj_seanse(
+    plan: schemas.ImportSeansow,
+    czesciowo: bool = Query(
+        False,
+        description=(
+            "False – przy jakimkolwiek błędzie nic nie jest dodawane (400 z listą błędów). "
+            "True – dodawane są poprawne pozycje, błędne wracają w 'bledy'."
+        ),
+    ),
+    db: Session = Depends(get_db),
+):
+    """
+    UC-DB6: dodanie wielu seansów naraz (np. program na tydzień dla wszystkich sal).
+
+    1. Filmy i sale sprawdzamy dwoma zapytaniami (zbiory id).
+    2. Kolizje – z istniejącymi seansami i między pozycjami planu –
+       jednym przejściem (app/kolizje_seansow.py, kolizje_planu).
+    3. Poprawne pozycje wstawiamy jednym INSERT w jednej transakcji.
+    """
+    pozycje = plan.seanse
+    bledy = {}
+
+    # --- 1. Filmy i sale ---
+    czasy_filmow = dict(
+        db.execute(
+            select(models.Film.id_filmu, models.Film.czas_trwania).where(
+                models.Film.id_filmu.in_({p.id_filmu for p in pozycje})
+            )
+        ).all()
+    )
+    sale = set(
+        db.scalars(
+            select(models.Sala.id_sali).where(
+                models.Sala.id_sali.in_({p.id_sali for p in pozycje})
+            )
+        )
+    )
+
+    przedzialy = []
+    for i, p in enumerate(pozycje):
+        if p.id_filmu not in czasy_filmow:
+            bledy[i] = schemas.BladPozycjiImportu(pozycja=i, powod="Film o podanym id nie istnieje")
+            continue
+        if p.id_sali not in sale:
+            bledy[i] = schemas.BladPozycjiImportu(pozycja=i, powod="Sala o podanym id nie istnieje")
+            continue
+        try:
+            poczatek = _poczatek_seansu(p.data, p.godzina)
+        except HTTPException as e:
+            bledy[i] = schemas.BladPozycjiImportu(pozycja=i, powod=e.detail)
+            continue
+        koniec = koniec_seansu(poczatek, czasy_filmow[p.id_filmu])
+        przedzialy.append(Przedzial(p.id_sali, poczatek, koniec, pozycja=i))
+
+    # --- 2. Kolizje ---
+    for i, kolizje in kolizje_planu(db, przedzialy).items():
+        bledy[i] = schemas.BladPozycjiImportu(
+            pozycja=i,
+            powod="Seans nakłada się na inne seanse w tej sali "
+            f"(z przerwą techniczną {ustawienia.przerwa_techniczna_min} min).",
+            kolizje_z_seansami=sorted(k.id_seansu for k in kolizje if k.id_seansu is not None),
+            kolizje_z_pozycjami=sorted(k.pozycja for k in kolizje if k.pozycja is not None),
+        )
+
+    lista_bledow = [bledy[i] for i in sorted(bledy)]
+    if lista_bledow and not czesciowo:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "komunikat": "Plan zawiera błędne pozycje – nie dodano żadnego seansu.",
+                "bledy": [b.model_dump() for b in lista_bledow],
+            },
+        )
+
+    # --- 3. Zapis poprawnych pozycji ---
+    wiersze = [
+        {
+            "id_filmu": pozycje[p.pozycja].id_filmu,
+            "id_sali": p.id_sali,
+            "data": pozycje[p.pozycja].data,
+            "godzina": pozycje[p.pozycja].godzina,
+            "poczatek": p.poczatek,
+            "koniec": p.koniec,
+        }
+        for p in przedzialy
+        if p.pozycja not in bledy
+    ]
+    dodane = []
+    if wiersze:
+        id_nowych = db.scalars(
+            insert(models.Seans).returning(
+                models.Seans.id_seansu, sort_by_parameter_order=True
+            ),
+            wiersze,
+        ).all()
+        db.commit()
+        bufor_repertuaru.uniewaznij()
+        dodane = [
+            schemas.SeansOut(id_seansu=id_seansu, **w) for id_seansu, w in zip(id_nowych, wiersze)
+        ]
+
+    return schemas.WynikImportuSeansow(dodane=dodane, bledy=lista_bledow)
+
+
 # =======================
 # Edycja seansu
 # =======================
@@ -205,19 +381,20 @@ def edytuj_seans(
     new_id_sali = seans_update.id_sali if seans_update.id_sali is not None else seans.id_sali
     new_data = seans_update.data if seans_update.data is not None else seans.data
     new_godzina = seans_update.godzina if seans_update.godzina is not None else seans.godzina
+    new_poczatek = _poczatek_seansu(new_data, new_godzina)
 
-    # Jeśli zmieniamy film -> sprawdź, czy istnieje
-    if seans_update.id_filmu is not None:
-        film = (
-            db.query(models.Film)
-            .filter(models.Film.id_filmu == new_id_filmu)
-            .first()
+    # Film (nowy albo dotychczasowy) – sprawdzamy, czy istnieje, i bierzemy czas trwania
+    film = (
+        db.query(models.Film)
+        .filter(models.Film.id_filmu == new_id_filmu)
+        .first()
+    )
+    if not film:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Nowy film o podanym id nie istnieje.",
         )
-        if not film:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Nowy film o podanym id nie istnieje.",
-            )
+    new_koniec = koniec_seansu(new_poczatek, film.czas_trwania)
 
     # Jeśli zmieniamy salę -> sprawdź, czy istnieje
     if seans_update.id_sali is not None:
@@ -232,33 +409,38 @@ def edytuj_seans(
                 detail="Nowa sala o podanym id nie istnieje.",
             )
 
-    # Sprawdzenie konfliktu (inna projekcja w tej samej sali, o tej samej porze)
-    konflikt = (
-        db.query(models.Seans)
-        .filter(
-            models.Seans.id_sali == new_id_sali,
-            models.Seans.data == new_data,
-            models.Seans.godzina == new_godzina,
-            models.Seans.id_seansu != id_seansu,  # pomijamy aktualny seans
-        )
-        .first()
+    # Sprawdzenie konfliktu (inna projekcja w tej samej sali nakładająca się w czasie)
+    kolizje = kolidujace_seanse(
+        db, new_id_sali, new_poczatek, new_koniec, pomin_id=id_seansu  # pomijamy aktualny seans
     )
-
-    if konflikt:
+    if kolizje:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="W tej sali jest już inny seans o podanej dacie i godzinie.",
+            detail=opis_konfliktu(kolizje),
         )
 
+    # Sprzedaż dzienna jest po (dzień, film, sala) – przenosimy ją:
+    # odejmujemy przy starych wartościach seansu, doliczamy przy nowych
+    potwierdzone = potwierdzone_rezerwacje_seansu(db, id_seansu)
+    zmien_sprzedaz(db, potwierdzone, -1)
+
     # Aktualizacja pól
     seans.id_filmu = new_id_filmu
     seans.id_sali = new_id_sali
     seans.data = new_data
     seans.godzina = new_godzina
+    seans.poczatek = new_poczatek
+    seans.koniec = new_koniec
 
+    db.flush()
+    zmien_sprzedaz(db, potwierdzone, +1)
     db.commit()
     db.refresh(seans)
 
+    # zmiana sali = inny układ miejsc, stan zbudujemy od nowa przy odczycie
+    stan_miejsc.zapomnij_seans(id_seansu)
+    bufor_repertuaru.uniewaznij()
+
     return seans
 
 
@@ -288,40 +470,26 @@ def usun_seans(
             detail="Seans o podanym id nie istnieje.",
         )
 
+    # odwołany seans = bilety nie zostały sprzedane
+    zmien_sprzedaz(db, potwierdzone_rezerwacje_seansu(db, id_seansu), -1)
+
     db.delete(seans)
     db.commit()
+    stan_miejsc.zapomnij_seans(id_seansu)
+    bufor_repertuaru.uniewaznij()
 
     return {"detail": "Seans został usunięty."}
 
 
 @router.post("/sprzataj_wygasle")
-def sprzataj_wygasle_seanse(db: Session = Depends(get_db)):
+def sprzataj_wygasle_seanse(
+    rozmiar_partii: int | None = Query(
+        None, gt=0, description="Ile seansów usuwać w jednej transakcji (domyślnie z ustawień)."
+    ),
+    db: Session = Depends(get_db),
+):
     """
     Usuwa seanse, których data i godzina są wcześniejsze niż aktualny czas.
-    Rezerwacje i miejsca powiązane usuwane są kaskadowo.
+    Rezerwacje i miejsca powiązane usuwane są w tych samych partiach.
     """
-
-    teraz = datetime.now()
-
-    seanse = db.query(models.Seans).all()
-    usuniete = 0
-
-    for seans in seanse:
-        try:
-            data_seansu = datetime.fromisoformat(
-                f"{seans.data} {seans.godzina}"
-            )
-        except ValueError:
-            # jeśli format daty/godziny jest błędny – pomijamy
-            continue
-
-        if data_seansu < teraz:
-            db.delete(seans)
-            usuniete += 1
-
-    db.commit()
-
-    return {
-        "detail": "Sprzątanie wygasłych seansów zakończone",
-        "usuniete_seanse": usuniete,
-    }
\ No newline at end of file
+    return sprzataj_seanse(db, rozmiar_partii)
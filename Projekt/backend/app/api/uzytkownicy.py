@@ -1,46 +1,54 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status, Body
-from sqlalchemy.orm import Session
-from passlib.context import CryptContext
+from fastapi import APIRouter, Depends, HTTPException, status, Body, Query, Response
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, selectinload
 
-from ..db import get_db
+from ..db import get_db, get_async_db, get_async_db_odczyt, AsyncSessionLocal
 from .. import models, schemas
+from ..hasla import PrzeciazenieHaszowania, pula_haszujaca
+from ..listy import NAGLOWEK_KURSORA, Strona, kolumny_schematu
 
 router = APIRouter(
     prefix="/uzytkownicy",
     tags=["uzytkownicy"],
 )
 
-# --- konfiguracja hashowania haseł ---
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
-
-
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+def _przeciazenie() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Zbyt wiele logowań naraz, spróbuj ponownie za chwilę.",
+        headers={"Retry-After": "1"},
+    )
 
 
 # ======================================
 #   REJESTRACJA / DODANIE UŻYTKOWNIKA
 # ======================================
 @router.post("/", response_model=schemas.UzytkownikOut, status_code=status.HTTP_201_CREATED)
-def utworz_uzytkownika(
+async def utworz_uzytkownika(
     dane: schemas.UzytkownikCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     UC-DB9: Dodanie nowego użytkownika
 
-    1. Sprawdzamy, czy email jest unikalny.
-    2. Hashujemy hasło.
+    1. Hashujemy hasło (pula procesów, app/hasla.py) – jeszcze przed
+       transakcją, żeby nie trzymać połączenia zapisującego w tym czasie.
+    2. Sprawdzamy, czy email jest unikalny.
     3. Tworzymy rekord w tabeli Uzytkownik.
     """
 
-    # 1. Czy email jest już zajęty?
-    istnieje = (
-        db.query(models.Uzytkownik)
-        .filter(models.Uzytkownik.email == dane.email)
-        .first()
+    # 1. Hash hasła
+    try:
+        hash_hasla = await pula_haszujaca.hashuj(dane.haslo)
+    except PrzeciazenieHaszowania:
+        raise _przeciazenie()
+
+    # 2. Czy email jest już zajęty?
+    istnieje = await db.scalar(
+        select(models.Uzytkownik.id_uzytkownika).where(models.Uzytkownik.email == dane.email)
     )
     if istnieje:
         raise HTTPException(
@@ -48,18 +56,17 @@ def utworz_uzytkownika(
             detail="Użytkownik o podanym adresie email już istnieje.",
         )
 
-    # 2. Tworzymy użytkownika z HASHOWANYM hasłem
+    # 3. Tworzymy użytkownika z HASHOWANYM hasłem
     nowy = models.Uzytkownik(
         email=dane.email,
-        haslo=hash_password(dane.haslo),
+        haslo=hash_hasla,
         imie=dane.imie,
         nazwisko=dane.nazwisko,
         typ=dane.typ,
     )
 
     db.add(nowy)
-    db.commit()
-    db.refresh(nowy)
+    await db.commit()
 
     return nowy
 
@@ -69,10 +76,17 @@ def utworz_uzytkownika(
 # ======================================
 @router.get("/", response_model=List[schemas.UzytkownikOut])
 def lista_uzytkownikow(
+    response: Response,
+    strona: Strona = Depends(),
     db: Session = Depends(get_db),
 ):
-    uzytkownicy = db.query(models.Uzytkownik).all()
-    return uzytkownicy
+    """
+    Lista użytkowników stronami po id_uzytkownika (app/listy.py).
+    Czytamy tylko kolumny z UzytkownikOut – bez hashy haseł.
+    """
+    zapytanie = db.query(*kolumny_schematu(models.Uzytkownik, schemas.UzytkownikOut))
+    zapytanie = strona.zastosuj(zapytanie, models.Uzytkownik.id_uzytkownika)
+    return strona.utnij(zapytanie.all(), response, "id_uzytkownika")
 
 
 # ======================================
@@ -100,23 +114,33 @@ def pobierz_uzytkownika(
 #   LOGOWANIE
 # ======================================
 @router.post("/login")
-def login(
+async def login(
     email: str = Body(...),
     haslo: str = Body(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db_odczyt),
 ):
     """
     Proste logowanie użytkownika:
     - sprawdza, czy istnieje email
-    - weryfikuje hasło (pbkdf2_sha256)
+    - weryfikuje hasło (pbkdf2_sha256, w puli procesów)
+    - jeśli hash ma nieaktualną liczbę rund, zapisuje nowy
     - zwraca komunikat + dane użytkownika
     """
 
     uzytkownik = (
-        db.query(models.Uzytkownik)
-        .filter(models.Uzytkownik.email == email)
-        .first()
-    )
+        await db.execute(
+            select(
+                models.Uzytkownik.id_uzytkownika,
+                models.Uzytkownik.email,
+                models.Uzytkownik.haslo,
+                models.Uzytkownik.imie,
+                models.Uzytkownik.nazwisko,
+                models.Uzytkownik.typ,
+            ).where(models.Uzytkownik.email == email)
+        )
+    ).first()
+    # oddajemy połączenie do puli na czas liczenia hasha
+    await db.rollback()
 
     if not uzytkownik:
         raise HTTPException(
@@ -124,11 +148,11 @@ def login(
             detail="Nieprawidłowy email lub hasło.",
         )
 
-    # jeśli hasło w bazie nie jest hashem pbkdf2_sha256 -> verify wywali błąd
+    # niepoprawny hash w bazie (nie pbkdf2_sha256) = złe hasło
     try:
-        ok = pwd_context.verify(haslo, uzytkownik.haslo)
-    except Exception:
-        ok = False
+        ok, nowy_hash = await pula_haszujaca.weryfikuj(haslo, uzytkownik.haslo)
+    except PrzeciazenieHaszowania:
+        raise _przeciazenie()
 
     if not ok:
         raise HTTPException(
@@ -136,6 +160,19 @@ def login(
             detail="Nieprawidłowy email lub hasło.",
         )
 
+    if nowy_hash is not None:
+        # tylko jeśli hash w bazie się nie zmienił w międzyczasie
+        async with AsyncSessionLocal() as zapis:
+            await zapis.execute(
+                update(models.Uzytkownik)
+                .where(
+                    models.Uzytkownik.id_uzytkownika == uzytkownik.id_uzytkownika,
+                    models.Uzytkownik.haslo == uzytkownik.haslo,
+                )
+                .values(haslo=nowy_hash)
+            )
+            await zapis.commit()
+
     return {
         "message": "Logowanie poprawne",
         "uzytkownik": {
@@ -147,21 +184,31 @@ def login(
         },
     }
 @router.get("/{id_uzytkownika}/rezerwacje", response_model=List[schemas.RezerwacjaUzytkownikaOut])
-def lista_rezerwacji_uzytkownika(
+async def lista_rezerwacji_uzytkownika(
     id_uzytkownika: int,
-    db: Session = Depends(get_db),
+    response: Response,
+    status_rezerwacji: Optional[List[str]] = Query(
+        None, description="Filtr po statusie (można podać kilka razy), np. Oczekująca."
+    ),
+    limit: Optional[int] = Query(
+        None, ge=1, le=500, description="Rozmiar strony; bez limitu – wszystkie rezerwacje."
+    ),
+    po: Optional[int] = Query(
+        None, description=f"Kursor: wartość nagłówka {NAGLOWEK_KURSORA} z poprzedniej strony."
+    ),
+    db: AsyncSession = Depends(get_async_db_odczyt),
 ):
     """
-    Zwraca wszystkie rezerwacje danego użytkownika wraz z:
+    Zwraca rezerwacje danego użytkownika (rosnąco po id_rezerwacji) wraz z:
     - informacjami o seansie (film, sala, data, godzina)
     - listą miejsc (id, typ biletu, cena biletu)
+
+    Stała liczba zapytań niezależnie od liczby rezerwacji: użytkownik,
+    rezerwacje z seansem (JOIN) i miejsca wszystkich rezerwacji (IN).
+    Jeśli jest kolejna strona, jej kursor jest w nagłówku X-Nastepny-Kursor.
     """
 
-    uzytkownik = (
-        db.query(models.Uzytkownik)
-        .filter(models.Uzytkownik.id_uzytkownika == id_uzytkownika)
-        .first()
-    )
+    uzytkownik = await db.get(models.Uzytkownik, id_uzytkownika)
 
     if not uzytkownik:
         raise HTTPException(
@@ -169,30 +216,43 @@ def lista_rezerwacji_uzytkownika(
             detail="Użytkownik nie istnieje."
         )
 
-    rezerwacje = (
-        db.query(models.Rezerwacja)
-        .filter(models.Rezerwacja.id_uzytkownika == id_uzytkownika)
-        .all()
+    # seans i miejsca ładujemy od razu – w sesji async nie ma leniwego
+    # ładowania relacji, a osobne zapytanie na rezerwację to N+1
+    query = (
+        select(models.Rezerwacja)
+        .options(
+            joinedload(models.Rezerwacja.seans),
+            selectinload(models.Rezerwacja.miejsca),
+        )
+        .where(models.Rezerwacja.id_uzytkownika == id_uzytkownika)
+        .order_by(models.Rezerwacja.id_rezerwacji)
     )
+    if status_rezerwacji:
+        query = query.where(models.Rezerwacja.status_rezerwacji.in_(status_rezerwacji))
+    if po is not None:
+        query = query.where(models.Rezerwacja.id_rezerwacji > po)
+    if limit is not None:
+        # jeden wiersz więcej mówi, czy jest następna strona
+        query = query.limit(limit + 1)
+
+    rezerwacje = (await db.scalars(query)).all()
+
+    if limit is not None and len(rezerwacje) > limit:
+        rezerwacje = rezerwacje[:limit]
+        response.headers[NAGLOWEK_KURSORA] = str(rezerwacje[-1].id_rezerwacji)
 
     wynik = []
 
     for rez in rezerwacje:
-        # pobranie seansu wraz z filmem i salą
         seans = rez.seans
 
-        # pobranie miejsc z typem biletu i ceną
-        miejsca_rez = db.query(models.RezerwacjaMiejsca).filter(
-            models.RezerwacjaMiejsca.id_rezerwacji == rez.id_rezerwacji
-        ).all()
-
         miejsca_out = [
             schemas.MiejsceRezerwacjiOut(
                 id_miejsca=m.id_miejsca,
                 typ_biletu=m.typ_biletu,
                 cena_biletu=m.cena_biletu,
             )
-            for m in miejsca_rez
+            for m in rez.miejsca
         ]
 
         wynik.append(
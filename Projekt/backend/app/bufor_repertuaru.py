@@ -0,0 +1,99 @@
+# backend/app/bufor_repertuaru.py
+"""
+Bufor gotowych odpowiedzi repertuaru (UC-DB1).
+
+Repertuar zmienia się tylko przy zmianach seansów / filmów, a frontend
+pobiera go przy każdym wejściu na stronę. Trzymamy więc gotowe bajty JSON
+razem z ETagiem, osobno dla każdej pary (data, id_filmu).
+
+Każda zmiana repertuaru podbija globalną wersję (uniewaznij()). Wpis
+zapisany przy starszej wersji jest ignorowany, więc odpowiedź zbudowana
+z bazy w trakcie zmiany nie zostanie podana jako aktualna.
+"""
+import hashlib
+import json
+import threading
+from typing import Dict, Hashable, NamedTuple, Optional
+
+
+class WpisRepertuaru(NamedTuple):
+    wersja: int
+    tresc: bytes
+    etag: str
+    # kursor następnej strony (nagłówek X-Nastepny-Kursor) albo None
+    kursor: Optional[str] = None
+
+
+def serializuj(dane) -> bytes:
+    # te same ustawienia co JSONResponse w FastAPI
+    return json.dumps(
+        dane, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def etag_dla(tresc: bytes) -> str:
+    """Silny ETag – skrót treści odpowiedzi."""
+    return '"' + hashlib.blake2b(tresc, digest_size=16).hexdigest() + '"'
+
+
+def pasuje_etag(if_none_match: Optional[str], etag: str) -> bool:
+    """Czy nagłówek If-None-Match obejmuje podany ETag (RFC 9110, porównanie słabe)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for kandydat in if_none_match.split(","):
+        kandydat = kandydat.strip()
+        if kandydat.startswith("W/"):
+            kandydat = kandydat[2:]
+        if kandydat == etag:
+            return True
+    return False
+
+
+class BuforRepertuaru:
+    MAKS_WPISOW = 1024
+
+    def __init__(self):
+        self._zamek = threading.Lock()
+        self._wersja = 0
+        self._wpisy: Dict[Hashable, WpisRepertuaru] = {}
+
+    @property
+    def wersja(self) -> int:
+        return self._wersja
+
+    def pobierz(self, klucz: Hashable) -> Optional[WpisRepertuaru]:
+        with self._zamek:
+            wpis = self._wpisy.get(klucz)
+            if wpis is None or wpis.wersja != self._wersja:
+                return None
+            return wpis
+
+    def zapisz(
+        self, klucz: Hashable, wersja: int, dane, kursor: Optional[str] = None
+    ) -> WpisRepertuaru:
+        """
+        Zapisuje odpowiedź zbudowaną dla wersji `wersja` (odczytanej przed
+        zapytaniem do bazy). Zwraca wpis także wtedy, gdy wersja jest już
+        nieaktualna – wtedy tylko go nie zapamiętujemy.
+        """
+        tresc = serializuj(dane)
+        wpis = WpisRepertuaru(wersja, tresc, etag_dla(tresc), kursor)
+        with self._zamek:
+            if wersja == self._wersja:
+                if len(self._wpisy) >= self.MAKS_WPISOW and klucz not in self._wpisy:
+                    # najstarszy wpis (dict trzyma kolejność wstawiania)
+                    del self._wpisy[next(iter(self._wpisy))]
+                self._wpisy[klucz] = wpis
+        return wpis
+
+    def uniewaznij(self) -> None:
+        """Wołane po każdej zatwierdzonej zmianie seansów / filmów."""
+        with self._zamek:
+            self._wersja += 1
+            self._wpisy.clear()
+
+
+# Jeden bufor na proces aplikacji
+bufor_repertuaru = BuforRepertuaru()
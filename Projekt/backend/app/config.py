@@ -0,0 +1,61 @@
+# backend/app/config.py
+"""
+Ustawienia aplikacji czytane ze zmiennych środowiskowych (prefiks KINO_)
+albo z pliku .env w katalogu backend, np.:
+
+    KINO_ROZMIAR_PARTII_SPRZATANIA=5000
+    KINO_SQLITE_PROFIL=domyslny
+"""
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Ustawienia(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix="KINO_", env_file=".env", extra="ignore")
+
+    # Baza danych
+    database_url: str = "sqlite:///./kino.db"
+
+    # Osobna pula tylko do odczytu (endpointy GET). Bez adresu: ten sam plik
+    # SQLite otwarty w trybie mode=ro; można też podać adres repliki.
+    database_url_odczyt: str | None = None
+    pula_odczyt_rozmiar: int = 10
+    pula_odczyt_nadmiar: int = 20
+    # Połączenia zapisujące dla endpointów async (app/db.py)
+    pula_zapis_async_rozmiar: int = 1
+
+    # Profil SQLite (app/db.py): "domyslny" – ustawienia SQLite bez zmian
+    # (poza busy_timeout), "wydajny" – WAL + poniższe PRAGMA na każdym
+    # połączeniu z puli
+    sqlite_profil: str = "wydajny"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_mmap_size: int = 256 * 1024 * 1024   # bajty
+    sqlite_cache_size: int = -64 * 1024         # ujemne = KiB (tu 64 MiB)
+
+    # Hashowanie haseł w puli procesów (app/hasla.py)
+    hasla_procesy: int = 0               # 0 = liczba rdzeni
+    hasla_kolejka: int = 32              # ile zadań może czekać ponad liczbę procesów
+    hasla_czas_oczekiwania_s: float = 2.0
+    hasla_budzet_ms: float = 50.0        # docelowy czas jednego hasha
+    hasla_rundy: int | None = None       # stała liczba rund zamiast kalibracji
+
+    # Stronicowanie endpointów list (app/listy.py)
+    limit_listy_domyslny: int = 100
+    limit_listy_maks: int = 1000
+
+    # Mapa miejsc na żywo (app/na_zywo.py)
+    na_zywo_maks_subskrypcji: int = 20000
+    na_zywo_kolejka: int = 64            # zdarzeń czekających na jednego klienta
+    na_zywo_ping_s: float = 15.0         # komentarz SSE, żeby proxy nie zamykały połączenia
+
+    # Przerwa na sprzątanie sali między seansami (app/kolizje_seansow.py)
+    przerwa_techniczna_min: int = 15
+
+    # Jak często bufor cennika sprawdza wersję reguł w bazie (app/silnik_cen.py)
+    cennik_sprawdzanie_s: float = 2.0
+
+    # Sprzątanie wygasłych rezerwacji / seansów (UC-DB8)
+    rozmiar_partii_sprzatania: int = 1000
+
+
+ustawienia = Ustawienia()
@@ -1,7 +1,8 @@
 # backend/app/config_cennik.py
 
-# Prosty cennik na sztywno w kodzie.
-# Możesz go później przenieść do bazy, jeśli będziesz chciał.
+# Cennik startowy: przy pierwszym uruchomieniu migracja (app/migracje.py)
+# zapisuje go jako reguły w tabeli Regula_Ceny. Później ceny zmienia się
+# w bazie (/cennik/reguly), bez restartu – zob. app/silnik_cen.py.
 CENNIK_BILETOW = {
     "normalny": 25.0,
     "ulgowy": 18.0,
@@ -1,16 +1,144 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
-# SQLite w pliku kino.db w folderze backend
-SQLALCHEMY_DATABASE_URL = "sqlite:///./kino.db"
+from .config import ustawienia
+
+# SQLite w pliku kino.db w folderze backend (KINO_DATABASE_URL zmienia bazę)
+SQLALCHEMY_DATABASE_URL = ustawienia.database_url
 
 # connect_args jest wymagane dla SQLite przy pracy wielowątkowej (FastAPI)
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
 
+
+def pragmy_profilu(profil: str, tylko_odczyt: bool = False) -> list[str]:
+    """
+    PRAGMA ustawiane na każdym nowym połączeniu dla danego profilu SQLite.
+
+    - domyslny: ustawienia SQLite (journal_mode=DELETE, synchronous=FULL),
+                tylko busy_timeout
+    - wydajny:  WAL (czytelnicy nie czekają na zapis), synchronous=NORMAL
+                (fsync tylko przy checkpoincie), busy_timeout, mmap
+                i większy cache
+
+    busy_timeout jest w obu profilach: do pliku piszą naraz pula sync, pula
+    async i wątek wygasania – bez niego drugi piszący dostaje od razu
+    "database is locked" zamiast poczekać na zwolnienie blokady.
+
+    Połączenia tylko do odczytu nie zmieniają journal_mode (to zapis do pliku),
+    za to dostają query_only=ON.
+    """
+    if profil == "domyslny":
+        pragmy = [f"PRAGMA busy_timeout={ustawienia.sqlite_busy_timeout_ms}"]
+        return ["PRAGMA query_only=ON", *pragmy] if tylko_odczyt else pragmy
+    if profil == "wydajny":
+        if tylko_odczyt:
+            return [
+                "PRAGMA query_only=ON",
+                f"PRAGMA busy_timeout={ustawienia.sqlite_busy_timeout_ms}",
+                f"PRAGMA mmap_size={ustawienia.sqlite_mmap_size}",
+                f"PRAGMA cache_size={ustawienia.sqlite_cache_size}",
+                "PRAGMA temp_store=MEMORY",
+            ]
+        return [
+            "PRAGMA journal_mode=WAL",
+            f"PRAGMA synchronous={ustawienia.sqlite_synchronous}",
+            f"PRAGMA busy_timeout={ustawienia.sqlite_busy_timeout_ms}",
+            f"PRAGMA mmap_size={ustawienia.sqlite_mmap_size}",
+            f"PRAGMA cache_size={ustawienia.sqlite_cache_size}",
+            "PRAGMA temp_store=MEMORY",
+        ]
+    raise ValueError(f"Nieznany profil SQLite: {profil!r} (dostępne: domyslny, wydajny)")
+
+
+def wlacz_profil_sqlite(silnik, profil: str, tylko_odczyt: bool = False) -> None:
+    pragmy = pragmy_profilu(profil, tylko_odczyt)
+    if silnik.dialect.name != "sqlite" or not pragmy:
+        return
+
+    @event.listens_for(silnik, "connect")
+    def _ustaw_pragmy(dbapi_connection, connection_record):
+        kursor = dbapi_connection.cursor()
+        for pragma in pragmy:
+            kursor.execute(pragma)
+        kursor.close()
+
+
+wlacz_profil_sqlite(engine, ustawienia.sqlite_profil)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def url_tylko_do_odczytu() -> str:
+    """
+    Adres bazy dla puli tylko do odczytu:
+    - KINO_DATABASE_URL_ODCZYT, jeśli ustawiony (np. replika),
+    - dla pliku SQLite: ten sam plik otwarty jako file:...?mode=ro,
+    - w pozostałych przypadkach: baza główna.
+    """
+    if ustawienia.database_url_odczyt:
+        return ustawienia.database_url_odczyt
+    url = make_url(SQLALCHEMY_DATABASE_URL)
+    if url.get_backend_name() == "sqlite" and url.database and url.database != ":memory:":
+        return f"sqlite:///file:{url.database}?mode=ro&uri=true"
+    return SQLALCHEMY_DATABASE_URL
+
+
+def connect_args_dla(url: str) -> dict:
+    """check_same_thread tylko dla SQLite – inne sterowniki go nie znają."""
+    if make_url(url).get_backend_name() == "sqlite":
+        return {"check_same_thread": False}
+    return {}
+
+
+# Druga pula tylko dla endpointów odczytu (repertuar, mapa miejsc, filmy, raporty),
+# żeby nie konkurowały o połączenia z zapisem rezerwacji.
+URL_ODCZYT = url_tylko_do_odczytu()
+engine_odczyt = create_engine(
+    URL_ODCZYT,
+    connect_args=connect_args_dla(URL_ODCZYT),
+    pool_size=ustawienia.pula_odczyt_rozmiar,
+    max_overflow=ustawienia.pula_odczyt_nadmiar,
+)
+wlacz_profil_sqlite(engine_odczyt, ustawienia.sqlite_profil, tylko_odczyt=True)
+
+SessionOdczyt = sessionmaker(autocommit=False, autoflush=False, bind=engine_odczyt)
+
+
+def url_async(url: str) -> str:
+    """sqlite:///... -> sqlite+aiosqlite:///... (inne sterowniki bez zmian)."""
+    u = make_url(url)
+    if u.drivername in ("sqlite", "sqlite+pysqlite"):
+        u = u.set(drivername="sqlite+aiosqlite")
+    return u.render_as_string(hide_password=False)
+
+
+# Warstwa async (SQLAlchemy asyncio + aiosqlite) dla najczęściej wołanych endpointów.
+# Te same PRAGMA co w wersji synchronicznej ustawiamy na silniku "sync" pod spodem.
+# SQLite i tak wpuszcza jednego piszącego naraz – z małą pulą zapisujące
+# korutyny czekają w kolejce puli (bez blokowania pętli), a nie w busy_timeout.
+async_engine = create_async_engine(
+    url_async(SQLALCHEMY_DATABASE_URL),
+    pool_size=ustawienia.pula_zapis_async_rozmiar,
+    max_overflow=0,
+)
+wlacz_profil_sqlite(async_engine.sync_engine, ustawienia.sqlite_profil)
+
+async_engine_odczyt = create_async_engine(
+    url_async(URL_ODCZYT),
+    pool_size=ustawienia.pula_odczyt_rozmiar,
+    max_overflow=ustawienia.pula_odczyt_nadmiar,
+)
+wlacz_profil_sqlite(async_engine_odczyt.sync_engine, ustawienia.sqlite_profil, tylko_odczyt=True)
+
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+AsyncSessionOdczyt = async_sessionmaker(
+    async_engine_odczyt, autoflush=False, expire_on_commit=False
+)
+
 Base = declarative_base()
 
 Base.metadata.create_all(bind=engine)
@@ -21,3 +149,23 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Dependency dla endpointów tylko do odczytu
+def get_db_odczyt():
+    db = SessionOdczyt()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# Wersje async powyższych
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_async_db_odczyt():
+    async with AsyncSessionOdczyt() as db:
+        yield db
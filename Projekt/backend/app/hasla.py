@@ -0,0 +1,129 @@
+# backend/app/hasla.py
+"""
+Hashowanie i weryfikacja haseł (pbkdf2_sha256) w osobnej puli procesów.
+
+pbkdf2 to kilkadziesiąt ms czystego CPU – liczone w wątku żądania
+zajmowało pulę wątków Starlette i przez GIL spowalniało pozostałe
+endpointy (mapa miejsc, rezerwacje). Teraz:
+
+- liczymy w ProcessPoolExecutor (domyślnie tyle procesów, ile rdzeni),
+- liczba zadań w puli (liczone + czekające) jest ograniczona; kto nie
+  zmieści się w kolejce w czasie hasla_czas_oczekiwania_s, dostaje
+  PrzeciazenieHaszowania (endpoint zwraca 503 + Retry-After),
+- liczbę rund dobieramy przy starcie tak, żeby jeden hash trwał około
+  hasla_budzet_ms (nie mniej niż domyślne rundy passlib),
+- przy logowaniu hash z rundami spoza [0.75 * rundy, 2 * rundy] jest
+  przeliczany od nowa (verify_and_update).
+"""
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from multiprocessing import get_context
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+from passlib.hash import pbkdf2_sha256
+
+from .config import ustawienia
+
+log = logging.getLogger(__name__)
+
+MIN_RUNDY = pbkdf2_sha256.default_rounds
+
+
+class PrzeciazenieHaszowania(Exception):
+    """Kolejka puli haszującej jest pełna."""
+
+
+@lru_cache(maxsize=4)
+def _kontekst(rundy: int) -> CryptContext:
+    return CryptContext(
+        schemes=["pbkdf2_sha256"],
+        deprecated="auto",
+        pbkdf2_sha256__default_rounds=rundy,
+        # margines, żeby drobne różnice kalibracji między startami
+        # nie wymuszały ponownego hashowania przy każdym logowaniu
+        pbkdf2_sha256__min_rounds=rundy * 3 // 4,
+        pbkdf2_sha256__max_rounds=2 * rundy,
+    )
+
+
+# --- funkcje wykonywane w procesach puli (muszą być na poziomie modułu) ---
+
+def _hashuj(haslo: str, rundy: int) -> str:
+    return _kontekst(rundy).hash(haslo)
+
+
+def _weryfikuj(haslo: str, hash_hasla: str, rundy: int) -> Tuple[bool, Optional[str]]:
+    try:
+        return _kontekst(rundy).verify_and_update(haslo, hash_hasla)
+    except (ValueError, TypeError):
+        # w bazie nie ma poprawnego hasha pbkdf2_sha256
+        return False, None
+
+
+def kalibruj_rundy(budzet_ms: float, proby: int = 3) -> int:
+    """Liczba rund, przy której jeden hash trwa mniej więcej budzet_ms."""
+    rundy_proby = 20_000
+    czasy = []
+    for _ in range(proby):
+        start = time.perf_counter()
+        pbkdf2_sha256.using(rounds=rundy_proby).hash("kalibracja")
+        czasy.append(time.perf_counter() - start)
+    na_runde_ms = min(czasy) * 1000 / rundy_proby
+    rundy = int(budzet_ms / na_runde_ms)
+    # zaokrąglamy do 1000, żeby kolejne starty nie zmieniały wyniku o drobne
+    return max(MIN_RUNDY, round(rundy, -3))
+
+
+class PulaHaszujaca:
+    def __init__(self):
+        self._pula: Optional[ProcessPoolExecutor] = None
+        self._miejsca: Optional[asyncio.Semaphore] = None
+        self.rundy = MIN_RUNDY
+
+    def start(self) -> None:
+        if self._pula is not None:
+            return
+        self.rundy = ustawienia.hasla_rundy or kalibruj_rundy(ustawienia.hasla_budzet_ms)
+        procesy = ustawienia.hasla_procesy or os.cpu_count() or 1
+        # "spawn": proces aplikacji ma już wątki (harmonogram, aiosqlite),
+        # a fork procesu z wątkami potrafi się zakleszczyć
+        self._pula = ProcessPoolExecutor(max_workers=procesy, mp_context=get_context("spawn"))
+        self._miejsca = asyncio.Semaphore(procesy + ustawienia.hasla_kolejka)
+        log.info("Pula haszująca: %d procesów, %d rund pbkdf2_sha256", procesy, self.rundy)
+
+    def zatrzymaj(self) -> None:
+        if self._pula is not None:
+            self._pula.shutdown(wait=False, cancel_futures=True)
+            self._pula = None
+
+    async def _wykonaj(self, funkcja, *argumenty):
+        if self._pula is None:
+            self.start()
+        try:
+            await asyncio.wait_for(
+                self._miejsca.acquire(), timeout=ustawienia.hasla_czas_oczekiwania_s
+            )
+        except asyncio.TimeoutError:
+            raise PrzeciazenieHaszowania() from None
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._pula, funkcja, *argumenty
+            )
+        finally:
+            self._miejsca.release()
+
+    async def hashuj(self, haslo: str) -> str:
+        return await self._wykonaj(_hashuj, haslo, self.rundy)
+
+    async def weryfikuj(self, haslo: str, hash_hasla: str) -> Tuple[bool, Optional[str]]:
+        """(czy hasło poprawne, nowy hash albo None, jeśli stary jest aktualny)."""
+        return await self._wykonaj(_weryfikuj, haslo, hash_hasla, self.rundy)
+
+
+# Jedna pula na proces aplikacji
+pula_haszujaca = PulaHaszujaca()
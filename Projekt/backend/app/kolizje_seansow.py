@@ -0,0 +1,157 @@
+# backend/app/kolizje_seansow.py
+"""
+Wykrywanie nakładających się seansów w sali.
+
+Seans zajmuje salę od Seans.poczatek do Seans.koniec (początek + czas
+trwania filmu), a po nim potrzebna jest przerwa techniczna
+(ustawienia.przerwa_techniczna_min, sprzątanie sali). Dwa seanse w tej
+samej sali kolidują, gdy ich przedziały [poczatek, koniec + przerwa)
+mają część wspólną.
+
+Zapytanie idzie po indeksie (id_sali, koniec, poczatek): zakres
+"koniec > nowy_poczatek - przerwa" w danej sali, warunek na poczatek
+sprawdzany z samego indeksu.
+
+Dla całego planu (import wielu seansów) kolizje_planu() czyta istniejące
+seanse z okna czasowego planu jednym zapytaniem, a potem w jednym
+przejściu po posortowanych przedziałach każdej sali znajduje kolizje
+nowych seansów – między sobą i z istniejącymi.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from . import models
+from .config import ustawienia
+
+# Format, w jakim SQLAlchemy zapisuje DateTime w SQLite (jak w migracje.py)
+_FORMAT_SQLITE = "%Y-%m-%d %H:%M:%S.000000"
+
+
+def koniec_seansu(poczatek: datetime, czas_trwania: int) -> datetime:
+    return poczatek + timedelta(minutes=czas_trwania)
+
+
+def kolidujace_seanse(
+    db: Session,
+    id_sali: int,
+    poczatek: datetime,
+    koniec: datetime,
+    pomin_id: Optional[int] = None,
+) -> List:
+    """
+    Seanse w sali id_sali, które nakładają się na [poczatek, koniec)
+    razem z przerwą techniczną. pomin_id – edytowany seans.
+    """
+    przerwa = timedelta(minutes=ustawienia.przerwa_techniczna_min)
+    zapytanie = (
+        select(
+            models.Seans.id_seansu,
+            models.Seans.id_filmu,
+            models.Film.tytul,
+            models.Seans.data,
+            models.Seans.godzina,
+            models.Seans.poczatek,
+            models.Seans.koniec,
+        )
+        .join(models.Film, models.Film.id_filmu == models.Seans.id_filmu)
+        .where(
+            models.Seans.id_sali == id_sali,
+            models.Seans.koniec > poczatek - przerwa,
+            models.Seans.poczatek < koniec + przerwa,
+        )
+        .order_by(models.Seans.poczatek)
+    )
+    if pomin_id is not None:
+        zapytanie = zapytanie.where(models.Seans.id_seansu != pomin_id)
+    return db.execute(zapytanie).all()
+
+
+class Przedzial(NamedTuple):
+    id_sali: int
+    poczatek: datetime
+    koniec: datetime
+    id_seansu: Optional[int] = None   # seans zapisany w bazie
+    pozycja: Optional[int] = None     # pozycja w importowanym planie
+
+
+def kolizje_planu(db: Session, plan: List[Przedzial]) -> Dict[int, List[Przedzial]]:
+    """
+    Dla każdej pozycji planu, która z czymś koliduje: pozycja -> lista
+    kolidujących przedziałów (istniejące seanse i inne pozycje planu).
+    """
+    if not plan:
+        return {}
+    przerwa = timedelta(minutes=ustawienia.przerwa_techniczna_min)
+
+    przedzialy = defaultdict(list)
+    for p in plan:
+        przedzialy[p.id_sali].append(p)
+
+    # istniejące seanse z okna czasowego planu, jednym zapytaniem
+    istniejace = db.execute(
+        select(
+            models.Seans.id_sali,
+            models.Seans.poczatek,
+            models.Seans.koniec,
+            models.Seans.id_seansu,
+        ).where(
+            models.Seans.id_sali.in_(list(przedzialy)),
+            models.Seans.koniec > min(p.poczatek for p in plan) - przerwa,
+            models.Seans.poczatek < max(p.koniec for p in plan) + przerwa,
+        )
+    ).all()
+    for w in istniejace:
+        przedzialy[w.id_sali].append(Przedzial(*w))
+
+    kolizje: Dict[int, List[Przedzial]] = defaultdict(list)
+    for sala in przedzialy.values():
+        sala.sort(key=lambda p: p.poczatek)
+        # przedziały, które mogą jeszcze nachodzić na kolejne (koniec + przerwa w przyszłości)
+        otwarte: List[Przedzial] = []
+        for p in sala:
+            otwarte = [o for o in otwarte if o.koniec + przerwa > p.poczatek]
+            for o in otwarte:
+                # dwa istniejące seanse nie są sprawą tego planu
+                if p.pozycja is not None:
+                    kolizje[p.pozycja].append(o)
+                if o.pozycja is not None:
+                    kolizje[o.pozycja].append(p)
+            otwarte.append(p)
+    return dict(kolizje)
+
+
+def opis_konfliktu(kolizje: List) -> dict:
+    """Treść błędu 400 z listą kolidujących seansów."""
+    return {
+        "komunikat": (
+            "Seans nakłada się na inne seanse w tej sali "
+            f"(z przerwą techniczną {ustawienia.przerwa_techniczna_min} min)."
+        ),
+        "konflikty": [
+            {
+                "id_seansu": k.id_seansu,
+                "id_filmu": k.id_filmu,
+                "tytul": k.tytul,
+                "data": k.data,
+                "godzina": k.godzina,
+                "koniec": k.koniec.isoformat(),
+            }
+            for k in kolizje
+        ],
+    }
+
+
+def przelicz_konce_filmu(db: Session, id_filmu: int, czas_trwania: int) -> None:
+    """Po zmianie czasu trwania filmu – nowy koniec wszystkich jego seansów."""
+    db.execute(
+        update(models.Seans)
+        .where(models.Seans.id_filmu == id_filmu)
+        .values(
+            koniec=func.strftime(_FORMAT_SQLITE, models.Seans.poczatek, f"+{czas_trwania} minutes")
+        )
+        .execution_options(synchronize_session=False)
+    )
@@ -0,0 +1,79 @@
+# backend/app/listy.py
+"""
+Wspólne narzędzia endpointów zwracających listy.
+
+Stronicowanie po kluczu (keyset): strona to "WHERE klucz > po ORDER BY klucz
+LIMIT limit", więc koszt i pamięć na zapytanie nie rosną z rozmiarem tabeli
+(w odróżnieniu od OFFSET). Jeśli jest następna strona, jej kursor (ostatni
+klucz z bieżącej strony) trafia do nagłówka X-Nastepny-Kursor, a pełny adres
+następnej strony do standardowego nagłówka Link (rel="next").
+
+Bez ?limit lista zwraca najwyżej ustawienia.limit_listy_domyslny elementów –
+klient, który chce całość, idzie za nagłówkiem Link, dopóki ten się pojawia.
+
+Projekcja: z bazy czytamy tylko kolumny, które zwraca schemat wyjściowy
+(np. bez Uzytkownik.haslo).
+"""
+from typing import Dict, List, Optional, Sequence, Tuple, Type
+
+from fastapi import Query, Request, Response
+from pydantic import BaseModel
+
+from .config import ustawienia
+
+NAGLOWEK_KURSORA = "X-Nastepny-Kursor"
+
+
+class Strona:
+    """Dependency z parametrami strony: ?limit=...&po=..."""
+
+    def __init__(
+        self,
+        request: Request,
+        limit: int = Query(
+            ustawienia.limit_listy_domyslny,
+            ge=1,
+            le=ustawienia.limit_listy_maks,
+            description="Maksymalna liczba elementów na stronie.",
+        ),
+        po: Optional[int] = Query(
+            None,
+            description=f"Kursor: wartość nagłówka {NAGLOWEK_KURSORA} z poprzedniej strony.",
+        ),
+    ):
+        self.limit = limit
+        self.po = po
+        self._url = request.url
+
+    def zastosuj(self, zapytanie, klucz):
+        """Dokłada do zapytania (Query albo select) warunek, sortowanie i LIMIT."""
+        if self.po is not None:
+            zapytanie = zapytanie.where(klucz > self.po)
+        # jeden wiersz więcej mówi, czy jest następna strona
+        return zapytanie.order_by(klucz).limit(self.limit + 1)
+
+    def podziel(self, wiersze: Sequence, nazwa_klucza: str) -> Tuple[List, Optional[str]]:
+        """Obcina nadmiarowy wiersz; zwraca (wiersze strony, kursor następnej albo None)."""
+        wiersze = list(wiersze)
+        if len(wiersze) <= self.limit:
+            return wiersze, None
+        wiersze = wiersze[: self.limit]
+        return wiersze, str(getattr(wiersze[-1], nazwa_klucza))
+
+    def naglowki(self, kursor: Optional[str]) -> Dict[str, str]:
+        """Nagłówki następnej strony (puste, jeśli to ostatnia strona)."""
+        if kursor is None:
+            return {}
+        nastepna = self._url.include_query_params(po=kursor, limit=self.limit)
+        return {NAGLOWEK_KURSORA: kursor, "Link": f'<{nastepna}>; rel="next"'}
+
+    def utnij(self, wiersze: Sequence, response: Response, nazwa_klucza: str) -> List:
+        """Jak podziel(), ale kursor od razu trafia do nagłówków odpowiedzi."""
+        wiersze, kursor = self.podziel(wiersze, nazwa_klucza)
+        response.headers.update(self.naglowki(kursor))
+        return wiersze
+
+
+def kolumny_schematu(model, schemat: Type[BaseModel]) -> list:
+    """Kolumny modelu odpowiadające polom schematu wyjściowego."""
+    return [getattr(model, pole) for pole in schemat.model_fields]
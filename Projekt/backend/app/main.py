@@ -1,12 +1,23 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .db import Base, engine
+from .db import Base, engine, engine_odczyt, async_engine, async_engine_odczyt
 from . import models
-from .api import repertuar, seanse, filmy, rezerwacje, sale, uzytkownicy,  raporty, cennik, platnosci
+from .metryki import PosredniczaceMetryki, podlacz_silnik
+from .migracje import migruj
+from .wyszukiwarka import przygotuj_indeks
+from .api import repertuar, seanse, filmy, rezerwacje, sale, uzytkownicy,  raporty, cennik, platnosci, metryki
 import asyncio
 
 
 Base.metadata.create_all(bind=engine)
+migruj(engine)
+przygotuj_indeks(engine)
+
+# Czas każdego zapytania SQL do /metrics (app/metryki.py)
+podlacz_silnik(engine, "zapis")
+podlacz_silnik(engine_odczyt, "odczyt")
+podlacz_silnik(async_engine.sync_engine, "zapis_async")
+podlacz_silnik(async_engine_odczyt.sync_engine, "odczyt_async")
 
 app = FastAPI(title="System rezerwacji kina")
 app.add_middleware(
@@ -15,7 +26,10 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Nastepny-Kursor", "Link"],
 )
+# ostatni dodany = zewnętrzny: mierzy też czas CORS
+app.add_middleware(PosredniczaceMetryki)
 
 
 # Routery API
@@ -28,6 +42,7 @@ app.include_router(uzytkownicy.router)
 app.include_router(raporty.router)   
 app.include_router(cennik.router)    
 app.include_router(platnosci.router)
+app.include_router(metryki.router)
 
 
 @app.get("/")
@@ -35,16 +50,48 @@ def read_root():
     return {"message": "Backend działa poprawnie!"}
 @app.on_event("startup")
 async def auto_cleanup():
+    # Wygasanie rezerwacji: harmonogram w osobnym wątku (app/wygasanie.py)
+    from .wygasanie import harmonogram_wygasania
+    await asyncio.to_thread(harmonogram_wygasania.odbuduj)
+    harmonogram_wygasania.start()
+
+    # Mapa miejsc na żywo – zmiany z wątków trafiają do tej pętli (app/na_zywo.py)
+    from .na_zywo import koncentrator_miejsc
+    koncentrator_miejsc.start(asyncio.get_running_loop())
+
+    # Pula procesów do hashowania haseł (kalibracja rund trwa chwilę)
+    from .hasla import pula_haszujaca
+    await asyncio.to_thread(pula_haszujaca.start)
+
     async def loop():
         while True:
             from .db import SessionLocal
-            from .api.rezerwacje import sprzataj_wygasle_rezerwacje
-            from .api.seanse import sprzataj_wygasle_seanse
-            db = SessionLocal()
-            sprzataj_wygasle_rezerwacje(db)
-            sprzataj_wygasle_seanse(db)
-            db.close()
+            from .sprzatanie import sprzataj_seanse
+
+            def sprzataj():
+                db = SessionLocal()
+                try:
+                    sprzataj_seanse(db)
+                finally:
+                    db.close()
+
+            # synchroniczny SQLAlchemy poza pętlą zdarzeń
+            await asyncio.to_thread(sprzataj)
 
             await asyncio.sleep(60)  # co 60 sekund
 
     asyncio.create_task(loop())
+
+
+@app.on_event("shutdown")
+async def zatrzymaj_harmonogram():
+    from .wygasanie import harmonogram_wygasania
+    from .db import async_engine, async_engine_odczyt
+    from .hasla import pula_haszujaca
+    from .na_zywo import koncentrator_miejsc
+    koncentrator_miejsc.zamknij()
+    harmonogram_wygasania.zatrzymaj()
+    pula_haszujaca.zatrzymaj()
+    # połączenia aiosqlite mają własne wątki – zamykamy je przed wyjściem
+    await async_engine.dispose()
+    await async_engine_odczyt.dispose()
@@ -0,0 +1,277 @@
+# backend/app/metryki.py
+"""
+Metryki aplikacji w formacie tekstowym Prometheusa (GET /metrics).
+
+Co mierzymy:
+- żądania HTTP (PosredniczaceMetryki – czysty middleware ASGI): liczba
+  i histogram czasu na (metoda, szablon ścieżki, status), żądania w toku,
+  histogram liczby zapytań SQL na żądanie,
+- zapytania SQL (podlacz_silnik – zdarzenia silnika SQLAlchemy): liczba
+  i histogram czasu na (silnik, operacja),
+- sprzątanie (zapisz_sprzatanie): czas i liczba wierszy ostatniego
+  przebiegu oraz sumy od startu, osobno dla każdego zadania.
+
+Ścieżka jest szablonem trasy FastAPI ("/seanse/{id_seansu}"), nie
+adresem z żądania – liczba serii nie rośnie z liczbą id. Żądania, które
+nie trafiły w żadną trasę, mają ścieżkę "nieznana".
+
+Na gorącej ścieżce jest tylko perf_counter, bisect po kilkunastu progach
+i zwiększenie liczników pod zamkiem; tekst dla Prometheusa składamy
+dopiero przy odczycie /metrics. Liczba zapytań SQL na żądanie idzie przez
+ContextVar – pula wątków (anyio) i run_sync (greenlet) widzą kontekst
+żądania, które je wywołało.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Progi histogramów czasu (sekundy) i liczby zapytań na żądanie
+PROGI_CZASU_HTTP = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROGI_CZASU_SQL = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+PROGI_ZAPYTAN = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+Etykiety = Tuple[str, ...]
+
+
+def _wartosc(liczba: float) -> str:
+    if liczba == float("inf"):
+        return "+Inf"
+    if float(liczba).is_integer():
+        return str(int(liczba))
+    return repr(float(liczba))
+
+
+def _cytuj(wartosc) -> str:
+    return str(wartosc).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _etykiety(nazwy: Sequence[str], wartosci: Etykiety, dodatkowe: str = "") -> str:
+    pary = [f'{n}="{_cytuj(w)}"' for n, w in zip(nazwy, wartosci)]
+    if dodatkowe:
+        pary.append(dodatkowe)
+    return "{" + ",".join(pary) + "}" if pary else ""
+
+
+class _Metryka:
+    typ = ""
+
+    def __init__(self, nazwa: str, opis: str, etykiety: Sequence[str] = ()):
+        self.nazwa = nazwa
+        self.opis = opis
+        self.etykiety = tuple(etykiety)
+        self._zamek = threading.Lock()
+
+    def _naglowek(self) -> List[str]:
+        return [f"# HELP {self.nazwa} {self.opis}", f"# TYPE {self.nazwa} {self.typ}"]
+
+
+class Licznik(_Metryka):
+    """Counter – tylko rośnie."""
+
+    typ = "counter"
+
+    def __init__(self, nazwa: str, opis: str, etykiety: Sequence[str] = ()):
+        super().__init__(nazwa, opis, etykiety)
+        self._wartosci: Dict[Etykiety, float] = {}
+
+    def zwieksz(self, etykiety: Etykiety = (), o: float = 1) -> None:
+        with self._zamek:
+            self._wartosci[etykiety] = self._wartosci.get(etykiety, 0) + o
+
+    def tekst(self) -> List[str]:
+        with self._zamek:
+            wartosci = list(self._wartosci.items())
+        return self._naglowek() + [
+            f"{self.nazwa}{_etykiety(self.etykiety, e)} {_wartosc(w)}" for e, w in wartosci
+        ]
+
+
+class Miernik(Licznik):
+    """Gauge – dowolna bieżąca wartość."""
+
+    typ = "gauge"
+
+    def ustaw(self, etykiety: Etykiety, wartosc: float) -> None:
+        with self._zamek:
+            self._wartosci[etykiety] = wartosc
+
+
+class Histogram(_Metryka):
+    typ = "histogram"
+
+    def __init__(self, nazwa: str, opis: str, etykiety: Sequence[str], progi: Sequence[float]):
+        super().__init__(nazwa, opis, etykiety)
+        self.progi = tuple(progi)
+        # etykiety -> [liczności kubełków (bez kumulacji, ostatni = +Inf), suma]
+        self._serie: Dict[Etykiety, list] = {}
+
+    def obserwuj(self, etykiety: Etykiety, wartosc: float) -> None:
+        kubelek = bisect_left(self.progi, wartosc)
+        with self._zamek:
+            seria = self._serie.get(etykiety)
+            if seria is None:
+                seria = self._serie[etykiety] = [[0] * (len(self.progi) + 1), 0.0]
+            seria[0][kubelek] += 1
+            seria[1] += wartosc
+
+    def tekst(self) -> List[str]:
+        with self._zamek:
+            serie = [(e, list(kubelki), suma) for e, (kubelki, suma) in self._serie.items()]
+        linie = self._naglowek()
+        for e, kubelki, suma in serie:
+            narastajaco = 0
+            for prog, liczba in zip(self.progi + (float("inf"),), kubelki):
+                narastajaco += liczba
+                le = f'le="{_wartosc(prog)}"'
+                linie.append(f"{self.nazwa}_bucket{_etykiety(self.etykiety, e, le)} {narastajaco}")
+            linie.append(f"{self.nazwa}_sum{_etykiety(self.etykiety, e)} {_wartosc(suma)}")
+            linie.append(f"{self.nazwa}_count{_etykiety(self.etykiety, e)} {narastajaco}")
+        return linie
+
+
+class RejestrMetryk:
+    def __init__(self):
+        self._metryki: List[_Metryka] = []
+
+    def dodaj(self, metryka):
+        self._metryki.append(metryka)
+        return metryka
+
+    def tekst(self) -> str:
+        linie: List[str] = []
+        for metryka in self._metryki:
+            linie.extend(metryka.tekst())
+        return "\n".join(linie) + "\n"
+
+
+# Jeden rejestr metryk na proces aplikacji
+metryki = RejestrMetryk()
+
+http_zadania = metryki.dodaj(Licznik(
+    "kino_http_zadania_total", "Liczba obsłużonych żądań HTTP.", ("metoda", "sciezka", "status")
+))
+http_czas = metryki.dodaj(Histogram(
+    "kino_http_czas_sekundy", "Czas obsługi żądania HTTP (do końca odpowiedzi).",
+    ("metoda", "sciezka"), PROGI_CZASU_HTTP,
+))
+http_w_toku = metryki.dodaj(Miernik(
+    "kino_http_w_toku", "Żądania HTTP w trakcie obsługi (także otwarte strumienie SSE)."
+))
+http_zapytania = metryki.dodaj(Histogram(
+    "kino_http_zapytania_sql", "Liczba zapytań SQL wykonanych w czasie jednego żądania.",
+    ("metoda", "sciezka"), PROGI_ZAPYTAN,
+))
+sql_czas = metryki.dodaj(Histogram(
+    "kino_sql_czas_sekundy", "Czas wykonania polecenia SQL.", ("silnik", "operacja"), PROGI_CZASU_SQL
+))
+sql_bledy = metryki.dodaj(Licznik(
+    "kino_sql_bledy_total", "Polecenia SQL zakończone błędem.", ("silnik", "operacja")
+))
+sprzatanie_czas = metryki.dodaj(Miernik(
+    "kino_sprzatanie_ostatni_czas_sekundy", "Czas ostatniego przebiegu sprzątania.", ("zadanie",)
+))
+sprzatanie_wiersze = metryki.dodaj(Miernik(
+    "kino_sprzatanie_ostatnie_wiersze", "Wiersze zmienione w ostatnim przebiegu sprzątania.", ("zadanie",)
+))
+sprzatanie_kiedy = metryki.dodaj(Miernik(
+    "kino_sprzatanie_ostatni_przebieg_timestamp_sekundy",
+    "Czas uniksowy końca ostatniego przebiegu sprzątania.", ("zadanie",),
+))
+sprzatanie_przebiegi = metryki.dodaj(Licznik(
+    "kino_sprzatanie_przebiegi_total", "Liczba przebiegów sprzątania.", ("zadanie",)
+))
+sprzatanie_wiersze_suma = metryki.dodaj(Licznik(
+    "kino_sprzatanie_wiersze_total", "Wiersze zmienione przez sprzątanie od startu.", ("zadanie",)
+))
+
+http_w_toku.ustaw((), 0)
+
+# Licznik zapytań SQL bieżącego żądania ([n] – lista, żeby wątki mogły ją zmieniać)
+_zapytania_zadania: ContextVar[Optional[List[int]]] = ContextVar("kino_zapytania_zadania", default=None)
+
+
+# ---------- HTTP ----------
+
+class PosredniczaceMetryki:
+    """
+    Czysty middleware ASGI (bez BaseHTTPMiddleware – nie opakowuje
+    odpowiedzi w dodatkowy strumień i nie psuje SSE / WebSocket).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_ze_statusem(wiadomosc):
+            if wiadomosc["type"] == "http.response.start":
+                status[0] = wiadomosc["status"]
+            await send(wiadomosc)
+
+        zapytania = [0]
+        token = _zapytania_zadania.set(zapytania)
+        http_w_toku.zwieksz((), 1)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_ze_statusem)
+        finally:
+            czas = time.perf_counter() - start
+            http_w_toku.zwieksz((), -1)
+            _zapytania_zadania.reset(token)
+            # FastAPI wpisuje dopasowaną trasę do scope (APIRoute.matches)
+            trasa = scope.get("route")
+            sciezka = getattr(trasa, "path", None) or "nieznana"
+            metoda = scope["method"]
+            http_zadania.zwieksz((metoda, sciezka, str(status[0])))
+            http_czas.obserwuj((metoda, sciezka), czas)
+            http_zapytania.obserwuj((metoda, sciezka), zapytania[0])
+
+
+# ---------- SQL ----------
+
+def _operacja(polecenie: str) -> str:
+    slowo = polecenie.lstrip()[:8].split(None, 1)
+    return slowo[0].upper() if slowo else "?"
+
+
+def podlacz_silnik(silnik: Engine, nazwa: str) -> None:
+    """Czas każdego polecenia SQL silnika (dla AsyncEngine: .sync_engine)."""
+
+    @event.listens_for(silnik, "before_cursor_execute")
+    def _przed(conn, kursor, polecenie, parametry, kontekst, wiele):
+        conn.info["kino_start_sql"] = time.perf_counter()
+
+    @event.listens_for(silnik, "after_cursor_execute")
+    def _po(conn, kursor, polecenie, parametry, kontekst, wiele):
+        czas = time.perf_counter() - conn.info.pop("kino_start_sql", time.perf_counter())
+        sql_czas.obserwuj((nazwa, _operacja(polecenie)), czas)
+        zapytania = _zapytania_zadania.get()
+        if zapytania is not None:
+            zapytania[0] += 1
+
+    @event.listens_for(silnik, "handle_error")
+    def _blad(kontekst_wyjatku):
+        conn = kontekst_wyjatku.connection
+        if conn is not None:
+            conn.info.pop("kino_start_sql", None)
+        sql_bledy.zwieksz((nazwa, _operacja(kontekst_wyjatku.statement or "")))
+
+
+# ---------- sprzątanie ----------
+
+def zapisz_sprzatanie(zadanie: str, czas_s: float, wiersze: int) -> None:
+    sprzatanie_czas.ustaw((zadanie,), czas_s)
+    sprzatanie_wiersze.ustaw((zadanie,), wiersze)
+    sprzatanie_kiedy.ustaw((zadanie,), time.time())
+    sprzatanie_przebiegi.zwieksz((zadanie,))
+    sprzatanie_wiersze_suma.zwieksz((zadanie,), wiersze)
@@ -0,0 +1,321 @@
+# backend/app/migracje.py
+"""
+Migracja istniejącej bazy kino.db do aktualnego schematu (w miejscu).
+
+Base.metadata.create_all tworzy tylko brakujące tabele – nie dodaje nowych
+kolumn ani indeksów do tabel, które już istnieją. Ta funkcja uzupełnia:
+1) brakujące kolumny (ALTER TABLE ... ADD COLUMN),
+2) podwójne zajęcia miejsc (przed indeksem unikalnym i przed backfillem),
+3) dane w nowych kolumnach (backfill) – jednorazowo, wersja w PRAGMA user_version,
+4) brakujące indeksy.
+
+Każdy krok jest idempotentny, więc migruj() można wołać przy każdym starcie;
+backfill, który już się wykonał, nie skanuje tabel ponownie.
+"""
+import logging
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session
+
+from .agregaty_sprzedazy import zmien_sprzedaz
+from .config_cennik import CENNIK_BILETOW
+from .db import Base
+
+log = logging.getLogger(__name__)
+
+
+# Seans.godzina "8:00" (dawniej przyjmowana przez API) -> "08:00" dla strftime
+_GODZINA = "CASE WHEN instr(trim(godzina), ':') = 2 THEN '0' || trim(godzina) ELSE trim(godzina) END"
+
+# Wiersze, których backfill nie przeliczy (zostaną z NULL) – tylko do logu.
+# Seans bez poczatek/koniec nie trafi do sprzątania ani sprawdzania kolizji,
+# rezerwacja bez data_wygasniecia nie wygaśnie sama.
+NIEPRZELICZALNE = [
+    (
+        "Seans.poczatek",
+        f"""
+        SELECT id_seansu, data || ' ' || godzina FROM Seans
+        WHERE poczatek IS NULL
+          AND strftime('%s', data || ' ' || {_GODZINA}) IS NULL
+        """,
+    ),
+    (
+        "Rezerwacja.data_wygasniecia",
+        """
+        SELECT id_rezerwacji, data_wygasniecia FROM Rezerwacja
+        WHERE data_wygasniecia IS NOT NULL
+          AND strftime('%s', data_wygasniecia) IS NULL
+        """,
+    ),
+]
+
+
+def _zglos_nieprzeliczalne(conn) -> None:
+    for kolumna, zapytanie in NIEPRZELICZALNE:
+        wiersze = conn.execute(text(zapytanie)).all()
+        if wiersze:
+            log.warning(
+                "%s: %d wierszy w nieznanym formacie zostaje z NULL (id, wartość): %s",
+                kolumna,
+                len(wiersze),
+                [tuple(w) for w in wiersze[:20]],
+            )
+
+
+def _cennik_startowy() -> list:
+    """
+    Regula_Ceny z dawnego cennika w kodzie (app/config_cennik.py) – tylko gdy
+    tabela jest pusta. Pusty CENNIK_BILETOW: nic do zasiania (VALUES () to
+    błąd składni).
+    """
+    if not CENNIK_BILETOW:
+        return []
+    wartosci = ", ".join(
+        "('{}', {})".format(typ.replace("'", "''"), float(cena))
+        for typ, cena in CENNIK_BILETOW.items()
+    )
+    return [
+        f"""
+        INSERT INTO Regula_Ceny (typ_biletu, cena)
+        SELECT column1, column2 FROM (VALUES {wartosci})
+        WHERE NOT EXISTS (SELECT 1 FROM Regula_Ceny)
+        """
+    ]
+
+
+# Jednorazowe uzupełnienia danych po dodaniu kolumn, numerowane jak
+# PRAGMA user_version: krok n (od 1) wykonuje się tylko na bazie z
+# user_version < n, a po nim user_version = n (w tej samej transakcji).
+# Nowe kroki dopisujemy na końcu; kolejność istniejących się nie zmienia.
+# Pozycja to polecenie SQL albo funkcja (conn) -> None.
+UZUPELNIENIA = [
+    # 1. zajęcia miejsc i znaczniki czasu seansów / rezerwacji
+    [
+        _zglos_nieprzeliczalne,
+        # id_seansu w Rezerwacja_Miejsca (unikalne zajęcie miejsca na seans)
+        """
+        UPDATE Rezerwacja_Miejsca
+        SET id_seansu = (
+            SELECT r.id_seansu FROM Rezerwacja r
+            WHERE r.id_rezerwacji = Rezerwacja_Miejsca.id_rezerwacji
+        )
+        WHERE id_seansu IS NULL
+        """,
+        # Seans.poczatek z tekstowych data + godzina (błędny format -> NULL,
+        # zgłoszone wcześniej przez NIEPRZELICZALNE)
+        f"""
+        UPDATE Seans
+        SET poczatek = strftime('%Y-%m-%d %H:%M:%S.000000', data || ' ' || {_GODZINA})
+        WHERE poczatek IS NULL
+        """,
+        # Seans.koniec = poczatek + czas trwania filmu
+        """
+        UPDATE Seans
+        SET koniec = strftime(
+            '%Y-%m-%d %H:%M:%S.000000', poczatek,
+            '+' || (SELECT f.czas_trwania FROM Film f WHERE f.id_filmu = Seans.id_filmu) || ' minutes'
+        )
+        WHERE koniec IS NULL AND poczatek IS NOT NULL
+        """,
+        # Rezerwacja.data_wygasniecia: ISO z 'T' (isoformat) -> format DateTime SQLAlchemy,
+        # żeby porównania tekstowe w indeksie odpowiadały porównaniu dat
+        """
+        UPDATE Rezerwacja
+        SET data_wygasniecia = CASE
+            WHEN strftime('%s', data_wygasniecia) IS NULL THEN NULL
+            WHEN instr(data_wygasniecia, '.') = 0
+                THEN replace(substr(data_wygasniecia, 1, 19), 'T', ' ') || '.000000'
+            ELSE replace(data_wygasniecia, 'T', ' ')
+        END
+        WHERE data_wygasniecia LIKE '%T%' OR length(data_wygasniecia) != 26
+        """,
+        # indeks zastąpiony przez ix_seans_poczatek
+        "DROP INDEX IF EXISTS ix_seans_data_godzina",
+    ],
+    # 2. sprzedaż dzienna
+    [
+        # Sprzedaz_Dzienna z istniejących potwierdzonych rezerwacji – tylko gdy
+        # tabela jest pusta (później utrzymują ją endpointy, pełne przeliczenie:
+        # python -m app.agregaty_sprzedazy)
+        """
+        INSERT INTO Sprzedaz_Dzienna (data, id_filmu, id_sali, typ_biletu, liczba_biletow, przychod)
+        SELECT s.data, s.id_filmu, s.id_sali, coalesce(rm.typ_biletu, ''),
+               count(*), coalesce(sum(rm.cena_biletu), 0)
+        FROM Rezerwacja_Miejsca rm
+        JOIN Rezerwacja r ON r.id_rezerwacji = rm.id_rezerwacji
+        JOIN Seans s ON s.id_seansu = r.id_seansu
+        WHERE r.status_rezerwacji = 'Potwierdzona'
+          AND NOT EXISTS (SELECT 1 FROM Sprzedaz_Dzienna)
+        GROUP BY s.data, s.id_filmu, s.id_sali, coalesce(rm.typ_biletu, '')
+        """,
+    ],
+    # 3. kwota rezerwacji
+    [
+        # Rezerwacja.kwota z cen zapisanych przy miejscach; rezerwacje z miejscami
+        # bez ceny zostają NULL – kwotę policzy cennik przy starcie płatności
+        """
+        UPDATE Rezerwacja
+        SET kwota = (
+            SELECT coalesce(sum(rm.cena_biletu), 0) FROM Rezerwacja_Miejsca rm
+            WHERE rm.id_rezerwacji = Rezerwacja.id_rezerwacji
+        )
+        WHERE kwota IS NULL
+          AND NOT EXISTS (
+            SELECT 1 FROM Rezerwacja_Miejsca rm
+            WHERE rm.id_rezerwacji = Rezerwacja.id_rezerwacji AND rm.cena_biletu IS NULL
+          )
+        """,
+    ],
+    # 4. cennik w bazie
+    [
+        # Wersja_Cennika: jeden wiersz, podbijany przy każdej zmianie Regula_Ceny
+        "INSERT OR IGNORE INTO Wersja_Cennika (id, wersja) VALUES (1, 0)",
+        *[
+            f"""
+            CREATE TRIGGER IF NOT EXISTS tr_regula_ceny_{zdarzenie.lower()}
+            AFTER {zdarzenie} ON Regula_Ceny
+            BEGIN
+                UPDATE Wersja_Cennika SET wersja = wersja + 1 WHERE id = 1;
+            END
+            """
+            for zdarzenie in ("INSERT", "UPDATE", "DELETE")
+        ],
+        *_cennik_startowy(),
+    ],
+]
+
+
+def _dodaj_brakujace_kolumny(engine: Engine) -> None:
+    inspektor = inspect(engine)
+    istniejace_tabele = set(inspektor.get_table_names())
+
+    with engine.begin() as conn:
+        for tabela in Base.metadata.sorted_tables:
+            if tabela.name not in istniejace_tabele:
+                continue
+            kolumny = {k["name"] for k in inspektor.get_columns(tabela.name)}
+            for kolumna in tabela.columns:
+                if kolumna.name in kolumny:
+                    continue
+                typ = kolumna.type.compile(dialect=engine.dialect)
+                conn.execute(
+                    text(f'ALTER TABLE "{tabela.name}" ADD COLUMN "{kolumna.name}" {typ}')
+                )
+                log.info("Dodano kolumnę %s.%s", tabela.name, kolumna.name)
+
+
+def _uzupelnij_dane(engine: Engine) -> None:
+    with engine.connect() as conn:
+        wersja = conn.execute(text("PRAGMA user_version")).scalar() or 0
+    for numer, krok in enumerate(UZUPELNIENIA, start=1):
+        if numer <= wersja:
+            continue
+        with engine.begin() as conn:
+            for polecenie in krok:
+                if callable(polecenie):
+                    polecenie(conn)
+                else:
+                    conn.execute(text(polecenie))
+            conn.execute(text(f"PRAGMA user_version = {numer}"))
+        log.info("Uzupełnianie danych: krok %d wykonany", numer)
+
+
+# Podwójne zajęcia miejsca (wyścig sprzed indeksu unikalnego). Na każde
+# (seans, miejsce) zostaje jedna rezerwacja: opłacona przed nieopłaconą,
+# anulowana na końcu, przy remisie – starsza. id_seansu bierzemy też
+# z Rezerwacja, bo kolumnę w Rezerwacja_Miejsca uzupełniamy dopiero potem.
+_PODWOJNE_ZAJECIA = """
+    SELECT rowid, id_rezerwacji, status_rezerwacji FROM (
+        SELECT rm.rowid AS rowid, rm.id_rezerwacji AS id_rezerwacji,
+               r.status_rezerwacji AS status_rezerwacji,
+               ROW_NUMBER() OVER (
+                   PARTITION BY coalesce(rm.id_seansu, r.id_seansu), rm.id_miejsca
+                   ORDER BY coalesce(r.status_rezerwacji, '') = 'Potwierdzona' DESC,
+                            coalesce(r.status_rezerwacji, '') = 'Anulowana',
+                            rm.id_rezerwacji
+               ) AS nr
+        FROM Rezerwacja_Miejsca rm
+        LEFT JOIN Rezerwacja r ON r.id_rezerwacji = rm.id_rezerwacji
+        WHERE coalesce(rm.id_seansu, r.id_seansu) IS NOT NULL
+    )
+    WHERE nr > 1
+"""
+
+# kwota z cen pozostałych miejsc (brak ceny -> NULL, policzy ją cennik)
+_PRZELICZ_KWOTE = """
+    UPDATE Rezerwacja
+    SET kwota = CASE
+        WHEN EXISTS (
+            SELECT 1 FROM Rezerwacja_Miejsca rm
+            WHERE rm.id_rezerwacji = Rezerwacja.id_rezerwacji AND rm.cena_biletu IS NULL
+        ) THEN NULL
+        ELSE (
+            SELECT coalesce(sum(rm.cena_biletu), 0) FROM Rezerwacja_Miejsca rm
+            WHERE rm.id_rezerwacji = Rezerwacja.id_rezerwacji
+        )
+    END
+    WHERE id_rezerwacji = :id_rezerwacji
+"""
+
+
+def _usun_podwojne_zajecia(engine: Engine) -> None:
+    """
+    Przed uzupełnianiem danych i utworzeniem ux_rezerwacja_miejsca_seans_miejsce.
+    Stare bazy mogą mieć to samo miejsce sprzedane dwa razy – bez usunięcia
+    duplikatów indeks by nie powstał, a warunkowy INSERT nie wykrywałby
+    konfliktów. Rezerwacjom, które straciły miejsca, przeliczamy kwotę
+    i sprzedaż dzienną (w tej samej transakcji).
+    """
+    indeksy = {i["name"] for i in inspect(engine).get_indexes("Rezerwacja_Miejsca")}
+    if "ux_rezerwacja_miejsca_seans_miejsce" in indeksy:
+        return
+    with Session(engine) as db, db.begin():
+        podwojne = db.execute(text(_PODWOJNE_ZAJECIA)).all()
+        if not podwojne:
+            return
+        stracily = sorted({w.id_rezerwacji for w in podwojne})
+        potwierdzone = sorted(
+            {w.id_rezerwacji for w in podwojne if w.status_rezerwacji == "Potwierdzona"}
+        )
+        # pusta Sprzedaz_Dzienna zbuduje się z danych po czyszczeniu (UZUPELNIENIA)
+        sprzedaz = db.scalar(text("SELECT EXISTS (SELECT 1 FROM Sprzedaz_Dzienna)"))
+        if sprzedaz:
+            zmien_sprzedaz(db, potwierdzone, -1)
+        db.execute(
+            text("DELETE FROM Rezerwacja_Miejsca WHERE rowid = :rowid"),
+            [{"rowid": w.rowid} for w in podwojne],
+        )
+        if sprzedaz:
+            zmien_sprzedaz(db, potwierdzone, +1)
+        db.execute(text(_PRZELICZ_KWOTE), [{"id_rezerwacji": i} for i in stracily])
+    log.warning(
+        "Usunięto %d podwójnych zajęć miejsc; rezerwacje, którym odebrano miejsca "
+        "(kwota i sprzedaż przeliczone): %s, w tym potwierdzone: %s",
+        len(podwojne),
+        stracily,
+        potwierdzone,
+    )
+
+
+def _utworz_brakujace_indeksy(engine: Engine) -> None:
+    for tabela in Base.metadata.sorted_tables:
+        for indeks in tabela.indexes:
+            try:
+                indeks.create(bind=engine, checkfirst=True)
+            except (IntegrityError, OperationalError) as e:
+                # bez indeksu unikalnego baza nie pilnuje ograniczenia –
+                # lepiej nie wstać niż sprzedawać miejsca podwójnie
+                if indeks.unique:
+                    raise RuntimeError(
+                        f"Nie udało się utworzyć indeksu unikalnego {indeks.name}: {e}"
+                    ) from e
+                log.warning("Nie udało się utworzyć indeksu %s: %s", indeks.name, e)
+
+
+def migruj(engine: Engine) -> None:
+    _dodaj_brakujace_kolumny(engine)
+    _usun_podwojne_zajecia(engine)
+    _uzupelnij_dane(engine)
+    _utworz_brakujace_indeksy(engine)
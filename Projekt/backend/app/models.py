@@ -5,6 +5,9 @@ from sqlalchemy import (
     Text,
     ForeignKey,
     Float,  
+    Index,
+    DateTime,
+    JSON,
 )
 from sqlalchemy.orm import relationship
 
@@ -78,12 +81,21 @@ class Film(Base):
 # ======================================
 class Seans(Base):
     __tablename__ = "Seans"
+    __table_args__ = (
+        Index("ix_seans_data_film", "data", "id_filmu"),
+        Index("ix_seans_sala_data_godzina", "id_sali", "data", "godzina"),
+        Index("ix_seans_poczatek", "poczatek"),
+        # wykrywanie nakładających się seansów w sali (app/kolizje_seansow.py)
+        Index("ix_seans_sala_koniec", "id_sali", "koniec", "poczatek"),
+    )
 
     id_seansu = Column(Integer, primary_key=True, index=True)
     id_filmu = Column(Integer, ForeignKey("Film.id_filmu", ondelete="CASCADE"), nullable=False)
     id_sali = Column(Integer, ForeignKey("Sala.id_sali", ondelete="CASCADE"), nullable=False)
     data = Column(String, nullable=False)     # TEXT w SQLite
     godzina = Column(String, nullable=False)  # TEXT w SQLite
+    poczatek = Column(DateTime, nullable=True)  # data + godzina jako znacznik czasu
+    koniec = Column(DateTime, nullable=True)    # poczatek + czas trwania filmu
 
     film = relationship("Film", back_populates="seanse")
     sala = relationship("Sala", back_populates="seanse")
@@ -95,6 +107,11 @@ class Seans(Base):
 # ======================================
 class Rezerwacja(Base):
     __tablename__ = "Rezerwacja"
+    __table_args__ = (
+        Index("ix_rezerwacja_status_wygasniecie", "status_rezerwacji", "data_wygasniecia"),
+        Index("ix_rezerwacja_seans_status", "id_seansu", "status_rezerwacji"),
+        Index("ix_rezerwacja_uzytkownik", "id_uzytkownika"),
+    )
 
     id_rezerwacji = Column(Integer, primary_key=True, index=True)
     id_uzytkownika = Column(
@@ -107,7 +124,8 @@ class Rezerwacja(Base):
         Integer, ForeignKey("Seans.id_seansu", ondelete="CASCADE"), nullable=False
     )
     status_rezerwacji = Column(String, nullable=True, default="Oczekująca")
-    data_wygasniecia = Column(String, nullable=True)
+    data_wygasniecia = Column(DateTime, nullable=True)
+    kwota = Column(Float, nullable=True)  # suma cen biletów, liczona przy rezerwacji
 
     uzytkownik = relationship("Uzytkownik", back_populates="rezerwacje")
     sala = relationship("Sala", back_populates="rezerwacje")
@@ -122,6 +140,11 @@ class Rezerwacja(Base):
 # ======================================
 class RezerwacjaMiejsca(Base):
     __tablename__ = "Rezerwacja_Miejsca"
+    __table_args__ = (
+        # Wiersze istnieją tylko dla aktywnych rezerwacji (anulowanie i wygaśnięcie
+        # je usuwają), więc to ograniczenie = jedno aktywne zajęcie miejsca na seans.
+        Index("ux_rezerwacja_miejsca_seans_miejsce", "id_seansu", "id_miejsca", unique=True),
+    )
 
     id_rezerwacji = Column(
         Integer, ForeignKey("Rezerwacja.id_rezerwacji", ondelete="CASCADE"), primary_key=True
@@ -129,9 +152,121 @@ class RezerwacjaMiejsca(Base):
     id_miejsca = Column(
         Integer, ForeignKey("Miejsce.id_miejsca", ondelete="CASCADE"), primary_key=True
     )
+    id_seansu = Column(
+        Integer, ForeignKey("Seans.id_seansu", ondelete="CASCADE"), nullable=True
+    )
     typ_biletu = Column(String, nullable=True)
     cena_biletu = Column(Float, nullable=True)  # <--- NOWA KOLUMNA W ORM
 
     rezerwacja = relationship("Rezerwacja", back_populates="miejsca")
     miejsce = relationship("Miejsce", back_populates="rezerwacje_miejsca")
 
+
+
+# ======================================
+#        TABELA: SPRZEDAZ_DZIENNA
+# ======================================
+class SprzedazDzienna(Base):
+    """
+    Zagregowana sprzedaż (UC-DB7): liczba biletów i przychód na
+    (dzień seansu, film, sala, typ biletu). Aktualizowana w tej samej
+    transakcji co zmiana statusu rezerwacji (app/agregaty_sprzedazy.py).
+
+    Bez kluczy obcych – historia sprzedaży zostaje po usunięciu
+    minionych seansów przez sprzątanie.
+    """
+    __tablename__ = "Sprzedaz_Dzienna"
+
+    data = Column(String, primary_key=True)          # Seans.data (YYYY-MM-DD)
+    id_filmu = Column(Integer, primary_key=True)
+    id_sali = Column(Integer, primary_key=True)
+    typ_biletu = Column(String, primary_key=True)    # '' gdy brak typu
+    liczba_biletow = Column(Integer, nullable=False, default=0)
+    przychod = Column(Float, nullable=False, default=0.0)
+
+
+# ======================================
+#          TABELA: SZABLON_SALI
+# ======================================
+class SzablonSali(Base):
+    """
+    Nazwany układ miejsc do wielokrotnego użycia: liczba miejsc w każdym
+    rzędzie, np. [10, 12, 12, 14] (app/uklad_sali.py).
+    """
+    __tablename__ = "Szablon_Sali"
+
+    id_szablonu = Column(Integer, primary_key=True, index=True)
+    nazwa = Column(String, nullable=False, unique=True)
+    miejsca_w_rzedach = Column(JSON, nullable=False)
+
+
+# ======================================
+#          TABELA: REGULA_CENY
+# ======================================
+class RegulaCeny(Base):
+    """
+    Reguła cennika (app/silnik_cen.py). Puste kryterium = dowolna wartość;
+    z reguł pasujących do seansu wygrywa ta z największą liczbą kryteriów.
+    """
+    __tablename__ = "Regula_Ceny"
+
+    id_reguly = Column(Integer, primary_key=True, index=True)
+    typ_biletu = Column(String, nullable=False)
+    dni_tygodnia = Column(String, nullable=True)   # np. "12345" (1 = pon. ... 7 = niedz.)
+    godzina_od = Column(String, nullable=True)     # "HH:MM" włącznie
+    godzina_do = Column(String, nullable=True)     # "HH:MM" wyłącznie (od > do: przez północ)
+    id_sali = Column(Integer, ForeignKey("Sala.id_sali", ondelete="CASCADE"), nullable=True)
+    format_filmu = Column(String, nullable=True)   # Film.typ, np. "3D"
+    cena = Column(Float, nullable=False)
+
+
+# ======================================
+#          TABELA: WERSJA_CENNIKA
+# ======================================
+class WersjaCennika(Base):
+    """
+    Jeden wiersz (id = 1) z licznikiem zmian Regula_Ceny – podbijany przez
+    wyzwalacze (app/migracje.py), także przy zmianach wprost w SQL.
+    """
+    __tablename__ = "Wersja_Cennika"
+
+    id = Column(Integer, primary_key=True)
+    wersja = Column(Integer, nullable=False, default=0)
+
+
+# ======================================
+#          TABELA: PLATNOSC
+# ======================================
+class Platnosc(Base):
+    """
+    Sesja płatności z POST /platnosci/start. Kwota jest kopią
+    Rezerwacja.kwota z chwili startu; potwierdzenie sprawdza id płatności
+    i kwotę bez ponownego liczenia cen. Bez klucza obcego – historia
+    płatności zostaje po sprzątaniu rezerwacji.
+    """
+    __tablename__ = "Platnosc"
+
+    id_platnosci = Column(String, primary_key=True)   # payment_id (uuid4)
+    id_rezerwacji = Column(Integer, nullable=False, index=True)
+    kwota = Column(Float, nullable=False)
+    status = Column(String, nullable=False, default="Rozpoczęta")  # Rozpoczęta / Zakończona
+    data_utworzenia = Column(DateTime, nullable=False)
+    data_zakonczenia = Column(DateTime, nullable=True)
+
+
+# ======================================
+#          TABELA: LOG_PLATNOSCI
+# ======================================
+class LogPlatnosci(Base):
+    """
+    Przetworzone zdarzenia płatności (POST /platnosci/confirm/paczka) po
+    kluczu idempotencji – powtórzone zdarzenie dostaje zapisany wynik
+    zamiast ponownego przetwarzania.
+    """
+    __tablename__ = "Log_Platnosci"
+
+    klucz_idempotencji = Column(String, primary_key=True)
+    id_rezerwacji = Column(Integer, nullable=False, index=True)
+    wynik = Column(String, nullable=False)         # np. "potwierdzona", "wygasla"
+    szczegoly = Column(String, nullable=True)
+    data_przetworzenia = Column(DateTime, nullable=False)
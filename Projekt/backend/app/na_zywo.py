@@ -0,0 +1,159 @@
+# backend/app/na_zywo.py
+"""
+Mapa miejsc na żywo (UC-DB2): subskrypcje zmian statusu miejsc seansu.
+
+Klient (WebSocket /seanse/{id}/miejsca/ws albo Server-Sent Events
+/seanse/{id}/miejsca/strumien) dostaje najpierw całą mapę, a potem
+tylko zmiany:
+
+    {"typ": "mapa",    "id_seansu": 7, "miejsca": [...]}        – jak GET /seanse/7/miejsca
+    {"typ": "zmiana",  "id_seansu": 7, "status": "Zarezerwowane", "miejsca": [12, 13]}
+    {"typ": "odswiez", "id_seansu": 7}                          – pobierz mapę od nowa
+
+Źródłem zmian jest app/stan_miejsc.py (słuchacz rejestru), więc baza nie
+jest odpytywana – ani cyklicznie, ani przy rozsyłaniu. Zmiany przychodzą
+z różnych wątków (pula wątków endpointów, harmonogram wygasania) i są
+przekazywane do pętli zdarzeń przez call_soon_threadsafe. Zdarzenie jest
+serializowane raz i wkładane do kolejek wszystkich subskrybentów seansu.
+
+Zdarzenie "mapa" jest budowane raz na wersję stanu seansu (licznik
+zmian z stan_miejsc) i współdzielone przez wszystkich nowych
+subskrybentów – tysiąc klientów otwierających tę samą mapę to jedna
+serializacja, nie tysiąc.
+
+Kolejka subskrybenta ma ograniczony rozmiar; jeśli klient nie nadąża,
+zamiast gubić zmiany czyścimy jego kolejkę i wysyłamy "odswiez".
+"""
+import asyncio
+import json
+import logging
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from .config import ustawienia
+from .db import AsyncSessionOdczyt
+from .stan_miejsc import NAZWY_STATUSOW, stan_miejsc
+
+log = logging.getLogger(__name__)
+
+
+class ZaDuzoSubskrypcji(Exception):
+    """Osiągnięto limit na_zywo_maks_subskrypcji."""
+
+
+def _odswiez(id_seansu: int) -> str:
+    return json.dumps({"typ": "odswiez", "id_seansu": id_seansu})
+
+
+async def mapa_seansu(id_seansu: int) -> Optional[List[dict]]:
+    """Mapa miejsc z pamięci, a przy zimnym starcie – z bazy (krótka sesja)."""
+    mapa = stan_miejsc.mapa_z_pamieci(id_seansu)
+    if mapa is None:
+        async with AsyncSessionOdczyt() as db:
+            mapa = await db.run_sync(stan_miejsc.mapa_miejsc, id_seansu)
+    return mapa
+
+
+class KoncentratorMiejsc:
+    def __init__(self):
+        self._petla: Optional[asyncio.AbstractEventLoop] = None
+        # id_seansu -> kolejki subskrybentów (używane tylko w wątku pętli)
+        self._subskrybenci: Dict[int, Set[asyncio.Queue]] = {}
+        self._liczba = 0
+        # id_seansu -> (licznik zmian stanu, treść zdarzenia "mapa")
+        self._mapy: Dict[int, Tuple[Tuple[int, int], str]] = {}
+
+    @property
+    def liczba_subskrypcji(self) -> int:
+        return self._liczba
+
+    def start(self, petla: asyncio.AbstractEventLoop) -> None:
+        if self._petla is None:
+            stan_miejsc.dodaj_sluchacza(self._zmiana)
+        self._petla = petla
+
+    def zamknij(self) -> None:
+        """Kończy wszystkie subskrypcje (None w kolejce = koniec strumienia)."""
+        for kolejki in self._subskrybenci.values():
+            for kolejka in kolejki:
+                self._wloz(kolejka, None)
+
+    async def zdarzenie_mapy(self, id_seansu: int) -> Optional[str]:
+        """Treść zdarzenia "mapa" (None – seans nie istnieje); wołać w pętli zdarzeń."""
+        licznik = stan_miejsc.licznik(id_seansu)
+        wpis = self._mapy.get(id_seansu)
+        if wpis is not None and wpis[0] == licznik:
+            return wpis[1]
+        mapa = await mapa_seansu(id_seansu)
+        if mapa is None:
+            return None
+        tresc = json.dumps(
+            {"typ": "mapa", "id_seansu": id_seansu, "miejsca": mapa}, ensure_ascii=False
+        )
+        # licznik sprzed odczytu: zmiana w trakcie odczytu unieważni wpis
+        self._mapy[id_seansu] = (licznik, tresc)
+        return tresc
+
+    @contextmanager
+    def subskrypcja(self, id_seansu: int) -> Iterator[asyncio.Queue]:
+        """Kolejka z treściami zdarzeń (str) seansu; wołać w pętli zdarzeń."""
+        if self._liczba >= ustawienia.na_zywo_maks_subskrypcji:
+            raise ZaDuzoSubskrypcji()
+        kolejka: asyncio.Queue = asyncio.Queue(maxsize=ustawienia.na_zywo_kolejka)
+        self._subskrybenci.setdefault(id_seansu, set()).add(kolejka)
+        self._liczba += 1
+        try:
+            yield kolejka
+        finally:
+            kolejki = self._subskrybenci.get(id_seansu)
+            if kolejki is not None:
+                kolejki.discard(kolejka)
+                if not kolejki:
+                    del self._subskrybenci[id_seansu]
+                    self._mapy.pop(id_seansu, None)
+            self._liczba -= 1
+
+    # ---------- rozsyłanie ----------
+
+    def _zmiana(self, id_seansu: int, id_miejsc: List[int], status: Optional[int]) -> None:
+        """Słuchacz stan_miejsc – dowolny wątek."""
+        petla = self._petla
+        # odczyt bez zamka: w najgorszym razie zdarzenie trafi do pętli
+        # i tam okaże się, że nikt go nie słucha
+        if petla is None or id_seansu not in self._subskrybenci:
+            return
+        if status is None:
+            tresc = _odswiez(id_seansu)
+        else:
+            tresc = json.dumps(
+                {
+                    "typ": "zmiana",
+                    "id_seansu": id_seansu,
+                    "status": NAZWY_STATUSOW[status],
+                    "miejsca": id_miejsc,
+                },
+                ensure_ascii=False,
+            )
+        try:
+            petla.call_soon_threadsafe(self._rozeslij, id_seansu, tresc)
+        except RuntimeError:
+            # pętla już zamknięta (wyłączanie aplikacji)
+            pass
+
+    def _rozeslij(self, id_seansu: int, tresc: str) -> None:
+        for kolejka in self._subskrybenci.get(id_seansu, ()):
+            self._wloz(kolejka, tresc, id_seansu)
+
+    @staticmethod
+    def _wloz(kolejka: asyncio.Queue, tresc: Optional[str], id_seansu: int = 0) -> None:
+        try:
+            kolejka.put_nowait(tresc)
+        except asyncio.QueueFull:
+            # klient nie nadąża – zaległe zmiany zastępuje jedno "odswiez"
+            while not kolejka.empty():
+                kolejka.get_nowait()
+            kolejka.put_nowait(_odswiez(id_seansu) if tresc is not None else None)
+
+
+# Jeden koncentrator na proces aplikacji
+koncentrator_miejsc = KoncentratorMiejsc()
@@ -1,5 +1,6 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from typing import Optional, List
+from datetime import datetime
 
 # ---------- FILM ----------
 class FilmOut(BaseModel):
@@ -41,6 +42,18 @@ class SeansCreate(BaseModel):
     godzina: str # np. "18:30"
 
 
+class ImportSeansow(BaseModel):
+    """Plan seansów do dodania jednym żądaniem (np. repertuar na tydzień)."""
+    seanse: List[SeansCreate] = Field(..., min_length=1, max_length=5000)
+
+
+class BladPozycjiImportu(BaseModel):
+    pozycja: int                       # indeks w liście seanse
+    powod: str
+    kolizje_z_seansami: List[int] = []    # id istniejących seansów
+    kolizje_z_pozycjami: List[int] = []   # inne pozycje tego samego planu
+
+
 class SeansOut(BaseModel):
     """Dane zwracane po utworzeniu seansu."""
     id_seansu: int
@@ -48,6 +61,7 @@ class SeansOut(BaseModel):
     id_sali: int
     data: str
     godzina: str
+    koniec: Optional[datetime] = None
 
     class Config:
         from_attributes = True
@@ -63,12 +77,51 @@ class FilmCreate(BaseModel):
 # Rezerwacja (UC-DB5)
 # --------------------------
 
+def _typ_dla_kazdego_miejsca(miejsca: List[int], typ_biletu: List[str]) -> None:
+    # miejsca i typy łączymy parami – bez typu miejsce nie trafiłoby do bazy
+    if len(typ_biletu) != len(miejsca):
+        raise ValueError("Liczba typów biletów musi być równa liczbie miejsc.")
+
+
 class RezerwacjaCreate(BaseModel):
     id_uzytkownika: int
     id_seansu: int
     miejsca: List[int]  # lista id_miejsca
     typ_biletu: List[str] #lista typow_biletu
 
+    @model_validator(mode="after")
+    def sprawdz_typy_biletow(self):
+        _typ_dla_kazdego_miejsca(self.miejsca, self.typ_biletu)
+        return self
+
+
+class PozycjaPakietu(BaseModel):
+    id_seansu: int
+    miejsca: List[int] = Field(..., min_length=1)  # lista id_miejsca
+    typ_biletu: List[str]                          # lista typow_biletu
+
+    @model_validator(mode="after")
+    def sprawdz_typy_biletow(self):
+        _typ_dla_kazdego_miejsca(self.miejsca, self.typ_biletu)
+        return self
+
+
+class RezerwacjaPakietCreate(BaseModel):
+    """Rezerwacja kilku seansów naraz – wszystko albo nic."""
+    id_uzytkownika: int
+    pozycje: List[PozycjaPakietu] = Field(..., min_length=1, max_length=100)
+
+
+class RezerwacjaGrupowaCreate(BaseModel):
+    """Rezerwacja N miejsc obok siebie – miejsca wybiera serwer."""
+    id_uzytkownika: int
+    id_seansu: int
+    liczba_miejsc: int = Field(..., ge=1)
+    rzad_od: Optional[int] = None   # zakres rzędów (włącznie), opcjonalny
+    rzad_do: Optional[int] = None
+    srodek: bool = True             # False – pierwszy wolny blok od przodu sali
+    typ_biletu: str = "normalny"    # jeden typ dla całej grupy
+
 
 class RezerwacjaOut(BaseModel):
     id_rezerwacji: int
@@ -76,10 +129,21 @@ class RezerwacjaOut(BaseModel):
     id_seansu: int
     status_rezerwacji: str
     miejsca: List[int]
+    kwota: Optional[float] = None
 
     class Config:
         from_attributes = True
 
+class RezerwacjaPakietOut(BaseModel):
+    rezerwacje: List[RezerwacjaOut]
+    kwota: float
+
+
+class WynikImportuSeansow(BaseModel):
+    dodane: List[SeansOut]
+    bledy: List[BladPozycjiImportu]
+
+
 class SalaCreate(BaseModel):
     numer_sali: int = Field(..., gt=0, description="Numer sali (np. 1, 2, 3)")
 
@@ -91,6 +155,36 @@ class SalaOut(BaseModel):
     class Config:
         from_attributes = True
 
+
+class SzablonSaliCreate(BaseModel):
+    nazwa: str = Field(..., min_length=1)
+    miejsca_w_rzedach: List[int] = Field(
+        ..., min_length=1, description="Liczba miejsc w kolejnych rzędach, np. [10, 12, 14]"
+    )
+
+
+class SzablonSaliOut(BaseModel):
+    id_szablonu: int
+    nazwa: str
+    miejsca_w_rzedach: List[int]
+
+    class Config:
+        from_attributes = True
+
+
+class MultipleksCreate(BaseModel):
+    numery_sal: List[int] = Field(..., min_length=1, description="Numery nowych sal")
+    szablon: Optional[str] = Field(None, description="Nazwa szablonu układu miejsc")
+    miejsca_w_rzedach: Optional[List[int]] = Field(
+        None, min_length=1, description="Układ podany wprost (zamiast szablonu)"
+    )
+
+
+class SalaZMiejscamiOut(BaseModel):
+    id_sali: int
+    numer_sali: int
+    liczba_miejsc: int
+
 # --------------------------
 # Użytkownik
 # --------------------------
@@ -141,6 +235,17 @@ class RaportSprzedazyDzienny(BaseModel):
     przychod: float
 
 
+class RaportSprzedazyWiersz(BaseModel):
+    # wymiary spoza ?grupuj=... są None
+    data: str | None = None
+    id_filmu: int | None = None
+    tytul: str | None = None
+    id_sali: int | None = None
+    typ_biletu: str | None = None
+    liczba_biletow: int
+    przychod: float
+
+
 class MiejsceRezerwacjiOut(BaseModel):
     id_miejsca: int
     typ_biletu: str | None = None
@@ -150,7 +255,7 @@ class MiejsceRezerwacjiOut(BaseModel):
 class RezerwacjaUzytkownikaOut(BaseModel):
     id_rezerwacji: int
     status_rezerwacji: str
-    data_wygasniecia: str | None
+    data_wygasniecia: datetime | None
     seans: SeansOut
     miejsca: List[MiejsceRezerwacjiOut]
 
@@ -169,8 +274,61 @@ class PlatnoscStartOut(BaseModel):
 
 class PlatnoscConfirmIn(BaseModel):
     id_rezerwacji: int
+    payment_id: Optional[str] = None  # z /platnosci/start
 
 
 class PlatnoscConfirmOut(BaseModel):
     detail: str
-    id_rezerwacji: int
\ No newline at end of file
+    id_rezerwacji: int
+
+class RegulaCenyCreate(BaseModel):
+    typ_biletu: str = Field(..., min_length=1)
+    cena: float = Field(..., ge=0)
+    dni_tygodnia: Optional[str] = Field(
+        None, pattern=r"^[1-7]{1,7}$", description='Dni tygodnia, np. "67" (1 = poniedziałek)'
+    )
+    godzina_od: Optional[str] = Field(None, pattern=r"^([01]\d|2[0-3]):[0-5]\d$", description="HH:MM, włącznie")
+    godzina_do: Optional[str] = Field(None, pattern=r"^([01]\d|2[0-3]):[0-5]\d$", description="HH:MM, wyłącznie")
+    id_sali: Optional[int] = None
+    format_filmu: Optional[str] = Field(None, description="Film.typ, np. 3D")
+
+
+class RegulaCenyUpdate(BaseModel):
+    """Zmiana reguły – podane pola; jawne null czyści kryterium."""
+    typ_biletu: Optional[str] = Field(None, min_length=1)
+    cena: Optional[float] = Field(None, ge=0)
+    dni_tygodnia: Optional[str] = Field(None, pattern=r"^[1-7]{1,7}$")
+    godzina_od: Optional[str] = Field(None, pattern=r"^([01]\d|2[0-3]):[0-5]\d$")
+    godzina_do: Optional[str] = Field(None, pattern=r"^([01]\d|2[0-3]):[0-5]\d$")
+    id_sali: Optional[int] = None
+    format_filmu: Optional[str] = None
+
+
+class RegulaCenyOut(RegulaCenyCreate):
+    id_reguly: int
+
+    class Config:
+        from_attributes = True
+
+
+class ZdarzeniePlatnosci(BaseModel):
+    klucz_idempotencji: str = Field(..., min_length=1, max_length=200)
+    id_rezerwacji: int
+
+
+class PaczkaPlatnosciIn(BaseModel):
+    zdarzenia: List[ZdarzeniePlatnosci] = Field(..., min_length=1, max_length=5000)
+
+
+class WynikZdarzeniaPlatnosci(BaseModel):
+    klucz_idempotencji: str
+    id_rezerwacji: int
+    # potwierdzona / juz_potwierdzona / nie_znaleziono / zly_status / wygasla / konflikt_klucza
+    wynik: str
+    detail: str
+    powtorzenie: bool = False   # wynik z Log_Platnosci (zdarzenie już przetworzone)
+
+
+class PaczkaPlatnosciOut(BaseModel):
+    potwierdzone: int
+    wyniki: List[WynikZdarzeniaPlatnosci]
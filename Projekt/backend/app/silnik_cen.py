@@ -0,0 +1,228 @@
+# backend/app/silnik_cen.py
+"""
+Cennik z reguł w bazie (tabela Regula_Ceny) skompilowany do tablicy w pamięci.
+
+Reguła podaje cenę typu biletu, opcjonalnie zawężoną do dni tygodnia,
+pasma godzin, sali i formatu filmu (Film.typ). Dla seansu wygrywa
+najbardziej szczegółowa pasująca reguła (najwięcej kryteriów, przy
+remisie – nowsza).
+
+Kompilacja:
+- granice wszystkich pasm godzin dzielą dobę na odcinki, w których
+  pasują te same reguły (bisect po kilku progach),
+- sale i formaty, o których nie mówi żadna reguła, są nierozróżnialne
+  (klucz None),
+- dla klucza (dzień, odcinek, sala, format) ceny wszystkich typów biletów
+  liczymy raz i zapamiętujemy – potem cena miejsca to dwa odczyty z dict.
+
+Wersja_Cennika.wersja jest podbijana wyzwalaczami przy każdej zmianie
+Regula_Ceny. Bufor sprawdza ją najwyżej co ustawienia.cennik_sprawdzanie_s
+i kompiluje cennik od nowa tylko po zmianie wersji – zmiana ceny działa bez
+restartu, także gdy zrobił ją inny proces albo ręczny SQL.
+"""
+import threading
+import time
+from bisect import bisect_right
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from . import models
+from .config import ustawienia
+
+DOBA_MIN = 24 * 60
+
+
+def minuty(godzina: Optional[str]) -> Optional[int]:
+    """"HH:MM" -> minuta doby."""
+    if godzina is None:
+        return None
+    hh, mm = godzina.split(":")[:2]
+    return int(hh) * 60 + int(mm)
+
+
+class Regula:
+    """Reguła z Regula_Ceny w postaci gotowej do dopasowania."""
+
+    __slots__ = ("id_reguly", "typ_biletu", "dni", "od", "do", "id_sali", "format_filmu", "cena", "waga")
+
+    def __init__(self, r: models.RegulaCeny):
+        self.id_reguly = r.id_reguly
+        self.typ_biletu = r.typ_biletu
+        self.dni = frozenset(int(d) for d in r.dni_tygodnia) if r.dni_tygodnia else None
+        self.od = minuty(r.godzina_od)
+        self.do = minuty(r.godzina_do)
+        self.id_sali = r.id_sali
+        self.format_filmu = r.format_filmu
+        self.cena = float(r.cena)
+        kryteria = (
+            self.dni is not None,
+            self.od is not None or self.do is not None,
+            self.id_sali is not None,
+            self.format_filmu is not None,
+        )
+        self.waga = (sum(kryteria), self.id_reguly)
+
+    def w_pasmie(self, minuta: int) -> bool:
+        od = 0 if self.od is None else self.od
+        do = DOBA_MIN if self.do is None else self.do
+        if od <= do:
+            return od <= minuta < do
+        # pasmo przez północ, np. 22:00-02:00
+        return minuta >= od or minuta < do
+
+    def pasuje(
+        self,
+        dzien: Optional[int],
+        minuta: Optional[int],
+        id_sali: Optional[int],
+        format_filmu: Optional[str],
+    ) -> bool:
+        if self.dni is not None and dzien not in self.dni:
+            return False
+        if self.od is not None or self.do is not None:
+            if minuta is None or not self.w_pasmie(minuta):
+                return False
+        if self.id_sali is not None and self.id_sali != id_sali:
+            return False
+        if self.format_filmu is not None and self.format_filmu != format_filmu:
+            return False
+        return True
+
+
+class Cennik:
+    """Skompilowany, niezmienny cennik jednej wersji reguł."""
+
+    def __init__(self, wersja: int, reguly: Iterable[models.RegulaCeny]):
+        self.wersja = wersja
+        # od najbardziej szczegółowej – pierwsza pasująca wygrywa
+        self._reguly: List[Regula] = sorted(
+            (Regula(r) for r in reguly), key=lambda r: r.waga, reverse=True
+        )
+        # typy biletów w kolejności dodania (kolejność kluczy w odpowiedziach)
+        self._typy = list(dict.fromkeys(r.typ_biletu for r in sorted(self._reguly, key=lambda r: r.id_reguly)))
+        progi = {0}
+        for r in self._reguly:
+            progi.update(m for m in (r.od, r.do) if m is not None and m < DOBA_MIN)
+        self._progi: List[int] = sorted(progi)
+        self._sale = {r.id_sali for r in self._reguly if r.id_sali is not None}
+        self._formaty = {r.format_filmu for r in self._reguly if r.format_filmu is not None}
+        self._tabela: Dict[Tuple, Dict[str, float]] = {}
+        # ceny bez żadnych kryteriów – GET /cennik
+        self.podstawowy: Dict[str, float] = self._policz(None, None, None, None, tylko_ogolne=True)
+
+    @property
+    def zalezy_od_formatu(self) -> bool:
+        """Czy do wyceny potrzebny jest Film.typ (jeśli nie – bez zapytania o film)."""
+        return bool(self._formaty)
+
+    def _policz(
+        self,
+        dzien: Optional[int],
+        minuta: Optional[int],
+        id_sali: Optional[int],
+        format_filmu: Optional[str],
+        tylko_ogolne: bool = False,
+    ) -> Dict[str, float]:
+        ceny: Dict[str, float] = {}
+        for r in self._reguly:
+            if r.typ_biletu in ceny:
+                continue
+            if tylko_ogolne and r.waga[0]:
+                continue
+            if r.pasuje(dzien, minuta, id_sali, format_filmu):
+                ceny[r.typ_biletu] = r.cena
+        return {typ: ceny[typ] for typ in self._typy if typ in ceny}
+
+    def ceny(
+        self,
+        poczatek: Optional[datetime],
+        id_sali: Optional[int],
+        format_filmu: Optional[str],
+    ) -> Dict[str, float]:
+        """
+        Ceny wszystkich typów biletów (typ -> cena) dla seansu. Bez
+        Seans.poczatek pasują tylko reguły bez dni i godzin.
+        """
+        if poczatek is None:
+            dzien = odcinek = minuta = None
+        else:
+            dzien = poczatek.isoweekday()
+            odcinek = bisect_right(self._progi, poczatek.hour * 60 + poczatek.minute) - 1
+            # wszystkie minuty odcinka pasują do tych samych reguł
+            minuta = self._progi[odcinek]
+        if id_sali not in self._sale:
+            id_sali = None
+        if format_filmu not in self._formaty:
+            format_filmu = None
+        klucz = (dzien, odcinek, id_sali, format_filmu)
+        ceny = self._tabela.get(klucz)
+        if ceny is None:
+            ceny = self._tabela.setdefault(klucz, self._policz(dzien, minuta, id_sali, format_filmu))
+        return ceny
+
+
+class BuforCennika:
+    def __init__(self):
+        self._zamek = threading.Lock()
+        self._cennik: Optional[Cennik] = None
+        self._sprawdzono = 0.0
+
+    def z_pamieci(self) -> Optional[Cennik]:
+        """Cennik bez dotykania bazy; None, jeśli trzeba sprawdzić wersję."""
+        cennik = self._cennik
+        if cennik is None or time.monotonic() - self._sprawdzono > ustawienia.cennik_sprawdzanie_s:
+            return None
+        return cennik
+
+    def aktualny(self, db: Session) -> Cennik:
+        """Cennik po sprawdzeniu wersji w bazie (kompilacja tylko po zmianie)."""
+        cennik = self.z_pamieci()
+        if cennik is not None:
+            return cennik
+        wersja = db.scalar(
+            select(models.WersjaCennika.wersja).where(models.WersjaCennika.id == 1)
+        ) or 0
+        cennik = self._cennik
+        if cennik is None or cennik.wersja != wersja:
+            cennik = Cennik(wersja, db.scalars(select(models.RegulaCeny)).all())
+        with self._zamek:
+            if self._cennik is None or cennik.wersja >= self._cennik.wersja:
+                self._cennik = cennik
+                self._sprawdzono = time.monotonic()
+        return cennik
+
+    def uniewaznij(self) -> None:
+        """Po zmianie reguł w tym procesie – następny odczyt sprawdzi wersję."""
+        self._sprawdzono = 0.0
+
+
+def ceny_seansu(db: Session, id_seansu: int) -> Optional[Dict[str, float]]:
+    """Ceny typów biletów dla seansu; None, jeśli seans nie istnieje."""
+    cennik = bufor_cennika.aktualny(db)
+    wiersz = db.execute(
+        select(models.Seans.poczatek, models.Seans.id_sali, models.Film.typ)
+        .join(models.Film, models.Film.id_filmu == models.Seans.id_filmu, isouter=True)
+        .where(models.Seans.id_seansu == id_seansu)
+    ).first()
+    if wiersz is None:
+        return None
+    return cennik.ceny(wiersz.poczatek, wiersz.id_sali, wiersz.typ)
+
+
+async def ceny_seansu_async(db: AsyncSession, seans: models.Seans) -> Dict[str, float]:
+    """Ceny dla wczytanego seansu; z bazy tylko wersja cennika i ewentualnie Film.typ."""
+    cennik = bufor_cennika.z_pamieci() or await db.run_sync(bufor_cennika.aktualny)
+    format_filmu = None
+    if cennik.zalezy_od_formatu:
+        format_filmu = await db.scalar(
+            select(models.Film.typ).where(models.Film.id_filmu == seans.id_filmu)
+        )
+    return cennik.ceny(seans.poczatek, seans.id_sali, format_filmu)
+
+
+# Jeden bufor cennika na proces aplikacji
+bufor_cennika = BuforCennika()
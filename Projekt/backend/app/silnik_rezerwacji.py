@@ -0,0 +1,166 @@
+# backend/app/silnik_rezerwacji.py
+"""
+Zajmowanie miejsc na seans bez wyścigów (UC-DB3).
+
+Zamiast "SELECT czy wolne -> INSERT" robimy warunkowy INSERT:
+    INSERT ... ON CONFLICT DO NOTHING RETURNING id_miejsca
+Unikalny indeks (id_seansu, id_miejsca) w Rezerwacja_Miejsca rozstrzyga,
+kto pierwszy zajął miejsce. Miejsca, których INSERT nie zwrócił, są zajęte.
+Wszystko dzieje się w transakcji wołającego – commit robi endpoint.
+
+Rezerwacja kilku seansów naraz (zajmij_miejsca_wielu_async) to jeden
+taki INSERT dla wszystkich miejsc wszystkich seansów – albo wszystkie
+miejsca są nasze, albo wołający robi rollback.
+"""
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from . import models
+
+
+class KonfliktMiejsc(Exception):
+    """Część miejsc jest już zajęta przez inną aktywną rezerwację."""
+
+    def __init__(self, zajete: Sequence[int], w_seansach: Optional[Dict[int, List[int]]] = None):
+        self.zajete = sorted(zajete)
+        # id_seansu -> zajęte miejsca (rezerwacja kilku seansów)
+        self.w_seansach = w_seansach or {}
+        super().__init__(f"Miejsca zajęte: {self.zajete}")
+
+
+def _wiersze_rezerwacji(
+    rezerwacja: models.Rezerwacja,
+    miejsca: Sequence[int],
+    typy_biletow: Sequence[str],
+    ceny: Dict[str, float],
+) -> List[dict]:
+    return [
+        {
+            "id_rezerwacji": rezerwacja.id_rezerwacji,
+            "id_seansu": rezerwacja.id_seansu,
+            "id_miejsca": id_miejsca,
+            "typ_biletu": typ,
+            "cena_biletu": ceny.get(typ, 0.0),
+        }
+        for id_miejsca, typ in zip(miejsca, typy_biletow)
+    ]
+
+
+def kwota_rezerwacji(
+    miejsca: Sequence[int],
+    typy_biletow: Sequence[str],
+    ceny: Dict[str, float],
+) -> float:
+    """Suma cen biletów – te same pary (miejsce, typ) co w _wiersze_rezerwacji."""
+    return float(sum(ceny.get(typ, 0.0) for _, typ in zip(miejsca, typy_biletow)))
+
+
+_ZAJMIJ = (
+    sqlite_insert(models.RezerwacjaMiejsca)
+    .on_conflict_do_nothing()
+    .returning(models.RezerwacjaMiejsca.id_miejsca)
+)
+
+
+def _sprawdz_konflikt(wiersze: List[dict], zajete_przez_nas: List[int]) -> None:
+    if len(zajete_przez_nas) != len(wiersze):
+        raise KonfliktMiejsc(set(w["id_miejsca"] for w in wiersze) - set(zajete_przez_nas))
+
+
+def zajmij_miejsca(
+    db: Session,
+    rezerwacja: models.Rezerwacja,
+    miejsca: Sequence[int],
+    typy_biletow: Sequence[str],
+    ceny: Dict[str, float],
+) -> List[int]:
+    """
+    Dopisuje miejsca do rezerwacji (rezerwacja musi mieć już id – db.flush()).
+    Rzuca KonfliktMiejsc z dokładną listą zajętych miejsc; wtedy wołający
+    powinien zrobić db.rollback().
+    """
+    wiersze = _wiersze_rezerwacji(rezerwacja, miejsca, typy_biletow, ceny)
+    if not wiersze:
+        return []
+    zajete_przez_nas: List[int] = list(db.execute(_ZAJMIJ, wiersze).scalars())
+    _sprawdz_konflikt(wiersze, zajete_przez_nas)
+    return zajete_przez_nas
+
+
+async def zajmij_miejsca_async(
+    db: AsyncSession,
+    rezerwacja: models.Rezerwacja,
+    miejsca: Sequence[int],
+    typy_biletow: Sequence[str],
+    ceny: Dict[str, float],
+) -> List[int]:
+    """To samo co zajmij_miejsca, dla sesji async (await db.flush() wcześniej)."""
+    wiersze = _wiersze_rezerwacji(rezerwacja, miejsca, typy_biletow, ceny)
+    if not wiersze:
+        return []
+    zajete_przez_nas: List[int] = list((await db.execute(_ZAJMIJ, wiersze)).scalars())
+    _sprawdz_konflikt(wiersze, zajete_przez_nas)
+    return zajete_przez_nas
+
+
+_ZAJMIJ_WIELE = (
+    sqlite_insert(models.RezerwacjaMiejsca)
+    .on_conflict_do_nothing()
+    .returning(models.RezerwacjaMiejsca.id_seansu, models.RezerwacjaMiejsca.id_miejsca)
+)
+
+
+async def zajmij_miejsca_wielu_async(
+    db: AsyncSession,
+    pozycje: Sequence[Tuple[models.Rezerwacja, Sequence[int], Sequence[str], Dict[str, float]]],
+) -> Dict[int, List[int]]:
+    """
+    Zajmuje miejsca kilku rezerwacji (różne seanse) jednym INSERT.
+    pozycje: (rezerwacja, miejsca, typy biletów, ceny). Zwraca id_seansu ->
+    zajęte miejsca. KonfliktMiejsc.w_seansach mówi, które miejsca w których
+    seansach były zajęte.
+    """
+    wiersze = [
+        w
+        for rezerwacja, miejsca, typy_biletow, ceny in pozycje
+        for w in _wiersze_rezerwacji(rezerwacja, miejsca, typy_biletow, ceny)
+    ]
+    if not wiersze:
+        return {}
+    wynik = await db.execute(_ZAJMIJ_WIELE, wiersze)
+    zajete_przez_nas = set(map(tuple, wynik.all()))
+    if len(zajete_przez_nas) == len(wiersze):
+        zajete: Dict[int, List[int]] = {}
+        for id_seansu, id_miejsca in zajete_przez_nas:
+            zajete.setdefault(id_seansu, []).append(id_miejsca)
+        return zajete
+    w_seansach: Dict[int, List[int]] = {}
+    for w in wiersze:
+        if (w["id_seansu"], w["id_miejsca"]) not in zajete_przez_nas:
+            w_seansach.setdefault(w["id_seansu"], []).append(w["id_miejsca"])
+    raise KonfliktMiejsc(
+        [m for miejsca in w_seansach.values() for m in miejsca],
+        {id_seansu: sorted(miejsca) for id_seansu, miejsca in w_seansach.items()},
+    )
+
+
+async def sale_miejsc_async(db: AsyncSession, id_miejsc: Iterable[int]) -> Dict[int, int]:
+    """
+    id_miejsca -> id_sali tylko dla podanych miejsc (jedno zapytanie po
+    kluczu głównym, zamiast czytać wszystkie miejsca sali). Miejsc, których
+    nie ma w bazie, nie ma w wyniku.
+    """
+    ids = list(set(id_miejsc))
+    if not ids:
+        return {}
+    wynik = await db.execute(
+        select(models.Miejsce.id_miejsca, models.Miejsce.id_sali).where(
+            models.Miejsce.id_miejsca.in_(ids)
+        )
+    )
+    return dict(wynik.all())
@@ -0,0 +1,120 @@
+# backend/app/sprzatanie.py
+"""
+Zbiorcze (set-based) sprzątanie wygasłych rezerwacji i minionych seansów.
+
+Zamiast ładować wszystkie obiekty ORM i usuwać je po jednym, wybieramy
+w bazie po indeksie partię id (LIMIT rozmiar_partii) i usuwamy / zmieniamy
+ją kilkoma poleceniami DELETE/UPDATE ... WHERE id IN (...).
+Każda partia to osobna, krótka transakcja, więc sprzątanie nie trzyma
+blokady zapisu przez cały czas działania.
+"""
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+
+from . import models
+from .config import ustawienia
+from .bufor_repertuaru import bufor_repertuaru
+from .metryki import zapisz_sprzatanie
+from .stan_miejsc import stan_miejsc
+from .wygasanie import zwolnij_rezerwacje
+
+
+def sprzataj_rezerwacje(db: Session, rozmiar_partii: Optional[int] = None) -> dict:
+    """
+    UC-DB8: rezerwacje 'Oczekująca' z data_wygasniecia < teraz -> 'Expired'.
+    """
+    rozmiar_partii = rozmiar_partii or ustawienia.rozmiar_partii_sprzatania
+    start = time.perf_counter()
+    teraz = datetime.now()
+
+    wygasle_ids: List[int] = []
+    partie = 0
+    while True:
+        kandydaci = [
+            r[0]
+            for r in db.query(models.Rezerwacja.id_rezerwacji)
+            .filter(
+                models.Rezerwacja.status_rezerwacji == "Oczekująca",
+                models.Rezerwacja.data_wygasniecia < teraz,
+            )
+            .limit(rozmiar_partii)
+        ]
+        if not kandydaci:
+            break
+        wygasle_ids.extend(zwolnij_rezerwacje(db, kandydaci))
+        partie += 1
+        if len(kandydaci) < rozmiar_partii:
+            break
+
+    # Dawniej: data_wygasniecia, której nie dało się odczytać. Migracja
+    # (app/migracje.py) zamienia takie wartości na NULL, więc to rezerwacje
+    # oczekujące bez terminu – same nie wygasną (indeks status + termin).
+    bledne_formaty = [
+        r[0]
+        for r in db.query(models.Rezerwacja.id_rezerwacji).filter(
+            models.Rezerwacja.status_rezerwacji == "Oczekująca",
+            models.Rezerwacja.data_wygasniecia.is_(None),
+        )
+    ]
+
+    czas = time.perf_counter() - start
+    zapisz_sprzatanie("rezerwacje", czas, len(wygasle_ids))
+    return {
+        "liczba_wygaslcych": len(wygasle_ids),
+        "id_wygaslcych": wygasle_ids,
+        "bledny_format_data_wygasniecia": bledne_formaty,
+        "liczba_partii": partie,
+        "czas_ms": round(czas * 1000, 2),
+    }
+
+
+def sprzataj_seanse(db: Session, rozmiar_partii: Optional[int] = None) -> dict:
+    """
+    Usuwa seanse, których data i godzina są wcześniejsze niż aktualny czas,
+    razem z ich rezerwacjami i miejscami rezerwacji.
+    """
+    rozmiar_partii = rozmiar_partii or ustawienia.rozmiar_partii_sprzatania
+    start = time.perf_counter()
+    warunek_minionych = models.Seans.poczatek < datetime.now()
+
+    usuniete_seanse = usuniete_rezerwacje = usuniete_miejsca = 0
+    while True:
+        ids = [
+            r[0]
+            for r in db.query(models.Seans.id_seansu)
+            .filter(warunek_minionych)
+            .limit(rozmiar_partii)
+        ]
+        if not ids:
+            break
+
+        usuniete_miejsca += db.query(models.RezerwacjaMiejsca).filter(
+            models.RezerwacjaMiejsca.id_seansu.in_(ids)
+        ).delete(synchronize_session=False)
+        usuniete_rezerwacje += db.query(models.Rezerwacja).filter(
+            models.Rezerwacja.id_seansu.in_(ids)
+        ).delete(synchronize_session=False)
+        usuniete_seanse += db.query(models.Seans).filter(
+            models.Seans.id_seansu.in_(ids)
+        ).delete(synchronize_session=False)
+        db.commit()
+
+        for id_seansu in ids:
+            stan_miejsc.zapomnij_seans(id_seansu)
+        bufor_repertuaru.uniewaznij()
+
+        if len(ids) < rozmiar_partii:
+            break
+
+    czas = time.perf_counter() - start
+    zapisz_sprzatanie("seanse", czas, usuniete_seanse + usuniete_rezerwacje + usuniete_miejsca)
+    return {
+        "detail": "Sprzątanie wygasłych seansów zakończone",
+        "usuniete_seanse": usuniete_seanse,
+        "usuniete_rezerwacje": usuniete_rezerwacje,
+        "usuniete_miejsca_rezerwacji": usuniete_miejsca,
+        "czas_ms": round(czas * 1000, 2),
+    }
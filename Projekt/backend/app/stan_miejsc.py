@@ -0,0 +1,399 @@
+# backend/app/stan_miejsc.py
+"""
+Stan zajętości miejsc dla seansów trzymany w pamięci (UC-DB2).
+
+Dla każdego seansu trzymamy tablicę 2 bity / miejsce:
+    0 - Wolne, 1 - Zarezerwowane, 2 - Opłacone
+
+Układ sali (id_miejsca, rząd, numer) jest wspólny dla wszystkich seansów
+w danej sali, więc trzymamy go raz na salę.
+
+Stan seansu jest budowany z bazy przy pierwszym odczycie (zimny start),
+a potem aktualizowany w miejscu przez endpointy rezerwacji / płatności
+i przez sprzątanie wygasłych rezerwacji.
+
+Każdą zmianę dostają też słuchacze (dodaj_sluchacza) – np. app/na_zywo.py
+rozsyła je subskrybentom mapy miejsc.
+
+Dla rezerwacji grupowych (najlepsze miejsca obok siebie) stan seansu
+trzyma też indeks wolnych odcinków w każdym rzędzie: ustaw() oznacza rząd
+jako nieaktualny, a odcinki liczymy od nowa dopiero przy wyszukiwaniu,
+tylko dla zmienionych rzędów.
+
+Rejestr jest jeden na proces: przy kilku workerach uvicorna każdy ma własną
+kopię i nie widzi zmian pozostałych, więc stan w pamięci może być
+nieaktualny. Rozstrzyga zawsze baza (warunkowy INSERT miejsc w
+app/silnik_rezerwacji.py) – po konflikcie wołający wyrzuca seans
+(zapomnij_seans) i przy następnym odczycie stan budowany jest z bazy od nowa.
+"""
+import logging
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from . import models
+
+log = logging.getLogger(__name__)
+
+WOLNE = 0
+ZAREZERWOWANE = 1
+OPLACONE = 2
+
+NAZWY_STATUSOW = ("Wolne", "Zarezerwowane", "Opłacone")
+
+
+# (id_seansu, id_miejsc, nowy status) – status None: stan seansu trzeba
+# pobrać od nowa (zmiana seansu albo układu sali)
+Sluchacz = Callable[[int, List[int], Optional[int]], None]
+
+
+def status_miejsca_dla_rezerwacji(status_rezerwacji: str) -> Optional[int]:
+    """
+    Zamienia status rezerwacji (z tabeli Rezerwacja.status_rezerwacji)
+    na status miejsca zgodny z UC-DB2.
+    """
+    if status_rezerwacji == "Oczekująca":
+        return ZAREZERWOWANE
+    if status_rezerwacji == "Potwierdzona":
+        return OPLACONE
+    return None
+
+
+class UkladSali:
+    """Niezmienny układ miejsc w sali (kolejność jak w tabeli Miejsce)."""
+
+    __slots__ = ("id_sali", "miejsca", "pozycje", "rzedy", "numery_rzedow", "rzad_pozycji")
+
+    def __init__(self, id_sali: int, miejsca: List[Tuple[int, int, int]]):
+        self.id_sali = id_sali
+        # krotki (id_miejsca, rzad, numer)
+        self.miejsca = miejsca
+        self.pozycje: Dict[int, int] = {m[0]: i for i, m in enumerate(miejsca)}
+
+        # rzędy od pierwszego: pozycje miejsc posortowane po numerze
+        po_rzedach: Dict[int, List[int]] = {}
+        for i, (_, rzad, _) in enumerate(miejsca):
+            po_rzedach.setdefault(rzad, []).append(i)
+        self.numery_rzedow: List[int] = sorted(po_rzedach)
+        self.rzedy: List[List[int]] = [
+            sorted(po_rzedach[rzad], key=lambda i: miejsca[i][2]) for rzad in self.numery_rzedow
+        ]
+        # pozycja -> indeks rzędu w self.rzedy
+        self.rzad_pozycji: List[int] = [0] * len(miejsca)
+        for i_rzedu, rzad in enumerate(self.rzedy):
+            for pozycja in rzad:
+                self.rzad_pozycji[pozycja] = i_rzedu
+
+
+class StanSeansu:
+    """Tablica 2 bity / miejsce dla jednego seansu."""
+
+    __slots__ = ("id_seansu", "uklad", "bity", "biegi")
+
+    def __init__(self, id_seansu: int, uklad: UkladSali):
+        self.id_seansu = id_seansu
+        self.uklad = uklad
+        self.bity = bytearray((len(uklad.miejsca) + 3) // 4)
+        # indeks rzędu -> wolne odcinki (początek w rzędzie, długość);
+        # None – rząd zmieniony, odcinki do przeliczenia
+        self.biegi: List[Optional[List[Tuple[int, int]]]] = [None] * len(uklad.rzedy)
+
+    def pobierz(self, pozycja: int) -> int:
+        return (self.bity[pozycja >> 2] >> ((pozycja & 3) << 1)) & 3
+
+    def ustaw(self, pozycja: int, wartosc: int) -> None:
+        przesuniecie = (pozycja & 3) << 1
+        bajt = self.bity[pozycja >> 2] & ~(3 << przesuniecie)
+        self.bity[pozycja >> 2] = bajt | (wartosc << przesuniecie)
+        self.biegi[self.uklad.rzad_pozycji[pozycja]] = None
+
+    def wolne_biegi(self, i_rzedu: int) -> List[Tuple[int, int]]:
+        """
+        Wolne odcinki rzędu jako (początek, długość) w indeksach
+        uklad.rzedy[i_rzedu]. Miejsca sąsiadują, gdy ich numery różnią się
+        o 1 – dziura w numeracji (przejście) przerywa odcinek.
+        """
+        biegi = self.biegi[i_rzedu]
+        if biegi is not None:
+            return biegi
+        biegi = []
+        miejsca = self.uklad.miejsca
+        poczatek = None
+        poprzedni_numer = None
+        for j, pozycja in enumerate(self.uklad.rzedy[i_rzedu]):
+            numer = miejsca[pozycja][2]
+            if self.pobierz(pozycja) != WOLNE:
+                if poczatek is not None:
+                    biegi.append((poczatek, j - poczatek))
+                    poczatek = None
+            elif poczatek is None:
+                poczatek = j
+            elif numer != poprzedni_numer + 1:
+                biegi.append((poczatek, j - poczatek))
+                poczatek = j
+            poprzedni_numer = numer
+        if poczatek is not None:
+            biegi.append((poczatek, len(self.uklad.rzedy[i_rzedu]) - poczatek))
+        self.biegi[i_rzedu] = biegi
+        return biegi
+
+    def najlepszy_blok(
+        self,
+        liczba: int,
+        rzad_od: Optional[int] = None,
+        rzad_do: Optional[int] = None,
+        srodek: bool = True,
+    ) -> Optional[List[int]]:
+        """
+        Pozycje najlepszych `liczba` wolnych miejsc obok siebie w jednym
+        rzędzie z zakresu [rzad_od, rzad_do] (numery rzędów, włącznie).
+
+        srodek=True: najbliżej środka sali – kara to odległość rzędu od
+        środkowego rzędu plus odległość środka bloku od środka rzędu (jeden
+        rząd dalej waży tyle, co jedno miejsce w bok). srodek=False: pierwszy
+        pasujący blok od przodu sali, od lewej. None – brak takiego bloku.
+        """
+        uklad = self.uklad
+        najlepszy = None
+        najlepsza_kara = None
+        srodkowy_rzad = (len(uklad.rzedy) - 1) / 2
+        for i_rzedu, rzad in enumerate(uklad.rzedy):
+            numer_rzedu = uklad.numery_rzedow[i_rzedu]
+            if rzad_od is not None and numer_rzedu < rzad_od:
+                continue
+            if rzad_do is not None and numer_rzedu > rzad_do:
+                break
+            kara_rzedu = abs(i_rzedu - srodkowy_rzad)
+            if najlepsza_kara is not None and kara_rzedu >= najlepsza_kara:
+                continue
+            # idealny początek bloku: środek bloku na środku rzędu
+            idealny = round((len(rzad) - 1) / 2 - (liczba - 1) / 2)
+            for poczatek, dlugosc in self.wolne_biegi(i_rzedu):
+                if dlugosc < liczba:
+                    continue
+                if not srodek:
+                    return rzad[poczatek:poczatek + liczba]
+                start = min(max(idealny, poczatek), poczatek + dlugosc - liczba)
+                kara = kara_rzedu + abs(start - idealny)
+                if najlepsza_kara is None or kara < najlepsza_kara:
+                    najlepsza_kara = kara
+                    najlepszy = (i_rzedu, start)
+        if najlepszy is None:
+            return None
+        i_rzedu, start = najlepszy
+        return uklad.rzedy[i_rzedu][start:start + liczba]
+
+    def mapa(self) -> List[dict]:
+        return [
+            {
+                "id_miejsca": id_miejsca,
+                "rzad": rzad,
+                "numer": numer,
+                "status": NAZWY_STATUSOW[self.pobierz(i)],
+            }
+            for i, (id_miejsca, rzad, numer) in enumerate(self.uklad.miejsca)
+        ]
+
+
+class RejestrStanuMiejsc:
+    """
+    Rejestr stanów wszystkich załadowanych seansów.
+
+    Zamek trzymamy tylko na czas operacji w pamięci – nigdy w trakcie
+    zapytania do bazy (endpointy async czytają przez run_sync w wątku pętli
+    zdarzeń, więc zamek trzymany przez I/O blokowałby całą pętlę).
+
+    Żeby zmiana zatwierdzona w trakcie zimnego ładowania nie zginęła, każda
+    aktualizacja seansu podbija jego licznik zmian. Ładowanie zapamiętuje
+    licznik przed odczytem z bazy i instaluje stan tylko, jeśli licznik się
+    nie zmienił – w przeciwnym razie czyta jeszcze raz.
+    """
+
+    PROBY_LADOWANIA = 3
+
+    def __init__(self):
+        self._zamek = threading.Lock()
+        self._seanse: Dict[int, StanSeansu] = {}
+        self._sale: Dict[int, UkladSali] = {}
+        self._zmiany: Dict[int, int] = {}
+        self._zmiany_sal: Dict[int, int] = {}
+        # podbijana przy zmianie układu dowolnej sali (unieważnia trwające ładowania)
+        self._epoka = 0
+        self._sluchacze: List[Sluchacz] = []
+
+    def dodaj_sluchacza(self, sluchacz: Sluchacz) -> None:
+        self._sluchacze.append(sluchacz)
+
+    def _powiadom(self, id_seansu: int, id_miejsc: List[int], status: Optional[int]) -> None:
+        # poza zamkiem – słuchacz nie może blokować aktualizacji stanu
+        for sluchacz in self._sluchacze:
+            try:
+                sluchacz(id_seansu, id_miejsc, status)
+            except Exception:
+                log.exception("Błąd słuchacza stanu miejsc")
+
+    # ---------- odczyt ----------
+
+    def mapa_z_pamieci(self, id_seansu: int) -> Optional[List[dict]]:
+        """Mapa miejsc bez dotykania bazy; None, jeśli seans nie jest załadowany."""
+        with self._zamek:
+            stan = self._seanse.get(id_seansu)
+            return stan.mapa() if stan is not None else None
+
+    def licznik(self, id_seansu: int) -> Tuple[int, int]:
+        """Zmienia się przy każdej zmianie stanu seansu (do buforowania odczytów)."""
+        with self._zamek:
+            return self._zmiany.get(id_seansu, 0), self._epoka
+
+    def mapa_miejsc(self, db: Session, id_seansu: int) -> Optional[List[dict]]:
+        """
+        Zwraca mapę miejsc seansu albo None, jeśli seans nie istnieje.
+        """
+        mapa = self.mapa_z_pamieci(id_seansu)
+        if mapa is not None:
+            return mapa
+
+        for _ in range(self.PROBY_LADOWANIA):
+            with self._zamek:
+                licznik = (self._zmiany.get(id_seansu, 0), self._epoka)
+            stan = self._zaladuj(db, id_seansu)
+            if stan is None:
+                return None
+            with self._zamek:
+                if (self._zmiany.get(id_seansu, 0), self._epoka) == licznik:
+                    self._seanse[id_seansu] = stan
+                    return stan.mapa()
+        # seans zmienia się bez przerwy – oddajemy świeży odczyt bez zapamiętywania
+        return stan.mapa()
+
+    # ---------- aktualizacje ----------
+
+    def oznacz(self, id_seansu: int, id_miejsc: Iterable[int], status: int) -> None:
+        """
+        Ustawia status podanych miejsc. Jeśli seans nie jest załadowany,
+        nic nie robimy – stan zostanie zbudowany z bazy przy odczycie.
+        """
+        id_miejsc = list(id_miejsc)
+        with self._zamek:
+            self._zmiany[id_seansu] = self._zmiany.get(id_seansu, 0) + 1
+            stan = self._seanse.get(id_seansu)
+            if stan is not None:
+                pozycje = stan.uklad.pozycje
+                for id_miejsca in id_miejsc:
+                    pozycja = pozycje.get(id_miejsca)
+                    if pozycja is not None:
+                        stan.ustaw(pozycja, status)
+        self._powiadom(id_seansu, id_miejsc, status)
+
+    def najlepsze_miejsca(
+        self,
+        id_seansu: int,
+        liczba: int,
+        rzad_od: Optional[int] = None,
+        rzad_do: Optional[int] = None,
+        srodek: bool = True,
+    ) -> Optional[List[int]]:
+        """
+        Wyszukuje najlepszy blok `liczba` wolnych miejsc obok siebie
+        (StanSeansu.najlepszy_blok). Niczego nie oznacza – wołający zapisuje
+        rezerwację w bazie i dopiero po commicie woła oznacz(); dwie grupy,
+        które dostaną ten sam blok, rozstrzyga warunkowy INSERT w bazie.
+
+        Zwraca id_miejsca bloku, [] – brak wolnego bloku, None – seans nie
+        jest załadowany (najpierw mapa_miejsc).
+        """
+        with self._zamek:
+            stan = self._seanse.get(id_seansu)
+            if stan is None:
+                return None
+            pozycje = stan.najlepszy_blok(liczba, rzad_od, rzad_do, srodek)
+            if pozycje is None:
+                return []
+            return [stan.uklad.miejsca[p][0] for p in pozycje]
+
+    def zapomnij_seans(self, id_seansu: int) -> None:
+        with self._zamek:
+            self._zmiany[id_seansu] = self._zmiany.get(id_seansu, 0) + 1
+            self._seanse.pop(id_seansu, None)
+        self._powiadom(id_seansu, [], None)
+
+    def zapomnij_sale(self, id_sali: int) -> None:
+        """Po zmianie układu sali wyrzucamy układ i wszystkie jej seanse."""
+        with self._zamek:
+            self._zmiany_sal[id_sali] = self._zmiany_sal.get(id_sali, 0) + 1
+            self._epoka += 1
+            self._sale.pop(id_sali, None)
+            seanse_sali = [
+                s.id_seansu for s in self._seanse.values() if s.uklad.id_sali == id_sali
+            ]
+            for id_seansu in seanse_sali:
+                self._zmiany[id_seansu] = self._zmiany.get(id_seansu, 0) + 1
+                del self._seanse[id_seansu]
+        for id_seansu in seanse_sali:
+            self._powiadom(id_seansu, [], None)
+
+    def wyczysc(self) -> None:
+        with self._zamek:
+            self._epoka += 1
+            self._seanse.clear()
+            self._sale.clear()
+
+    # ---------- zimny start ----------
+
+    def _uklad_sali(self, db: Session, id_sali: int) -> UkladSali:
+        with self._zamek:
+            uklad = self._sale.get(id_sali)
+            licznik = self._zmiany_sal.get(id_sali, 0)
+        if uklad is None:
+            miejsca = (
+                db.query(models.Miejsce.id_miejsca, models.Miejsce.rzad, models.Miejsce.numer)
+                .filter(models.Miejsce.id_sali == id_sali)
+                .order_by(models.Miejsce.id_miejsca)
+                .all()
+            )
+            uklad = UkladSali(id_sali, [tuple(m) for m in miejsca])
+            with self._zamek:
+                if self._zmiany_sal.get(id_sali, 0) == licznik:
+                    self._sale[id_sali] = uklad
+        return uklad
+
+    def _zaladuj(self, db: Session, id_seansu: int) -> Optional[StanSeansu]:
+        id_sali = (
+            db.query(models.Seans.id_sali)
+            .filter(models.Seans.id_seansu == id_seansu)
+            .scalar()
+        )
+        if id_sali is None:
+            return None
+
+        stan = StanSeansu(id_seansu, self._uklad_sali(db, id_sali))
+
+        rezerwacje_miejsca = (
+            db.query(
+                models.RezerwacjaMiejsca.id_miejsca,
+                models.Rezerwacja.status_rezerwacji,
+            )
+            .join(
+                models.Rezerwacja,
+                models.RezerwacjaMiejsca.id_rezerwacji == models.Rezerwacja.id_rezerwacji,
+            )
+            .filter(models.Rezerwacja.id_seansu == id_seansu)
+            .all()
+        )
+
+        pozycje = stan.uklad.pozycje
+        for id_miejsca, status_rezerwacji in rezerwacje_miejsca:
+            status = status_miejsca_dla_rezerwacji(status_rezerwacji)
+            pozycja = pozycje.get(id_miejsca)
+            if status is None or pozycja is None:
+                continue
+            # "Opłacone" ma pierwszeństwo przed "Zarezerwowane"
+            if status > stan.pobierz(pozycja):
+                stan.ustaw(pozycja, status)
+
+        return stan
+
+
+# Jeden rejestr na proces aplikacji
+stan_miejsc = RejestrStanuMiejsc()
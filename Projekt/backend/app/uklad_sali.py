@@ -0,0 +1,62 @@
+# backend/app/uklad_sali.py
+"""
+Generowanie miejsc w salach.
+
+Układ sali to lista liczby miejsc w kolejnych rzędach: [10, 12, 14] to
+rząd 1 z miejscami 1..10, rząd 2 z 1..12 itd. Układy do wielokrotnego
+użycia są zapisane pod nazwą w tabeli Szablon_Sali.
+
+Miejsca wstawiamy jednym INSERT wykonanym przez executemany (bez obiektów
+ORM). Usunięcie starych miejsc i wstawienie nowych idą w jednej
+transakcji – commit robi wołający, więc błąd w trakcie nie zostawia
+pustej sali.
+"""
+from typing import Iterable, List, Optional
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+from . import models
+
+
+class NiepoprawnyUklad(Exception):
+    """Układ miejsc pusty albo z rzędem bez miejsc."""
+
+
+def sprawdz_uklad(uklad: List[int]) -> List[int]:
+    if not uklad:
+        raise NiepoprawnyUklad("Układ sali musi mieć co najmniej jeden rząd.")
+    zle = [nr for nr, liczba in enumerate(uklad, start=1) if liczba <= 0]
+    if zle:
+        raise NiepoprawnyUklad(f"Rzędy bez miejsc (liczba miejsc <= 0): {zle}")
+    return list(uklad)
+
+
+def uklad_prostokatny(rzedy: int, na_rzad: int) -> List[int]:
+    return [na_rzad] * rzedy
+
+
+def uklad_szablonu(db: Session, nazwa: str) -> Optional[List[int]]:
+    return db.scalar(
+        select(models.SzablonSali.miejsca_w_rzedach).where(models.SzablonSali.nazwa == nazwa)
+    )
+
+
+def usun_miejsca(db: Session, id_sali: int) -> None:
+    db.execute(delete(models.Miejsce).where(models.Miejsce.id_sali == id_sali))
+
+
+def wstaw_miejsca(db: Session, id_sal: Iterable[int], uklad: List[int]) -> int:
+    """
+    Wstawia ten sam układ miejsc do każdej z podanych sal (jeden
+    executemany). Zwraca liczbę wstawionych miejsc.
+    """
+    wiersze = [
+        {"id_sali": id_sali, "rzad": rzad, "numer": numer, "status": "Wolne"}
+        for id_sali in id_sal
+        for rzad, w_rzedzie in enumerate(uklad, start=1)
+        for numer in range(1, w_rzedzie + 1)
+    ]
+    if wiersze:
+        db.execute(insert(models.Miejsce), wiersze)
+    return len(wiersze)
@@ -0,0 +1,175 @@
+# backend/app/wygasanie.py
+"""
+Harmonogram wygasania rezerwacji (UC-DB8).
+
+Zamiast co 60 s przeglądać wszystkie rezerwacje 'Oczekująca', trzymamy
+kopiec (heap) par (data_wygasniecia, id_rezerwacji). Osobny wątek śpi
+do najbliższego terminu, zdejmuje z kopca tylko to, co już wygasło,
+i zwalnia te rezerwacje w jednej transakcji. Pętla zdarzeń FastAPI
+nie jest przy tym blokowana.
+
+Rezerwacje potwierdzone/anulowane zostają w kopcu do swojego terminu –
+UPDATE z warunkiem status_rezerwacji = 'Oczekująca' po prostu je pominie.
+"""
+import heapq
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from . import models
+from .db import SessionLocal
+from .metryki import zapisz_sprzatanie
+from .stan_miejsc import stan_miejsc, WOLNE
+
+log = logging.getLogger(__name__)
+
+
+def zwolnij_rezerwacje(db: Session, id_rezerwacji: Sequence[int]) -> List[int]:
+    """
+    Oznacza podane rezerwacje jako 'Expired' (tylko te, które nadal są
+    'Oczekująca'), usuwa ich miejsca i aktualizuje stan miejsc w pamięci.
+    Zwraca listę faktycznie zwolnionych rezerwacji.
+    """
+    if not id_rezerwacji:
+        return []
+
+    # Najpierw UPDATE (otwiera transakcję zapisu), żeby równoległe
+    # potwierdzenie nie wcisnęło się między sprawdzenie statusu a zmianę.
+    wygasle = list(
+        db.execute(
+            update(models.Rezerwacja)
+            .where(
+                models.Rezerwacja.id_rezerwacji.in_(id_rezerwacji),
+                models.Rezerwacja.status_rezerwacji == "Oczekująca",
+            )
+            .values(status_rezerwacji="Expired")
+            .returning(models.Rezerwacja.id_rezerwacji)
+        ).scalars()
+    )
+    if not wygasle:
+        db.commit()
+        return []
+
+    miejsca_seansow: Dict[int, List[int]] = defaultdict(list)
+    for id_seansu, id_miejsca in db.query(
+        models.Rezerwacja.id_seansu, models.RezerwacjaMiejsca.id_miejsca
+    ).join(
+        models.RezerwacjaMiejsca,
+        models.RezerwacjaMiejsca.id_rezerwacji == models.Rezerwacja.id_rezerwacji,
+    ).filter(models.Rezerwacja.id_rezerwacji.in_(wygasle)):
+        miejsca_seansow[id_seansu].append(id_miejsca)
+
+    db.query(models.RezerwacjaMiejsca).filter(
+        models.RezerwacjaMiejsca.id_rezerwacji.in_(wygasle)
+    ).delete(synchronize_session=False)
+
+    db.commit()
+
+    for id_seansu, id_miejsc in miejsca_seansow.items():
+        stan_miejsc.oznacz(id_seansu, id_miejsc, WOLNE)
+
+    return wygasle
+
+
+class HarmonogramWygasania:
+    def __init__(self, fabryka_sesji: Callable[[], Session] = SessionLocal):
+        self._fabryka_sesji = fabryka_sesji
+        self._kopiec: List[Tuple[datetime, int]] = []
+        self._warunek = threading.Condition()
+        self._watek: threading.Thread | None = None
+        self._dziala = False
+
+    def dodaj(self, id_rezerwacji: int, data_wygasniecia: datetime) -> None:
+        with self._warunek:
+            heapq.heappush(self._kopiec, (data_wygasniecia, id_rezerwacji))
+            # budzimy wątek tylko, gdy nowy termin jest najbliższy
+            if self._kopiec[0][1] == id_rezerwacji:
+                self._warunek.notify()
+
+    def odbuduj(self) -> int:
+        """Wczytuje z bazy wszystkie oczekujące rezerwacje (start aplikacji)."""
+        db = self._fabryka_sesji()
+        try:
+            wiersze = (
+                db.query(models.Rezerwacja.id_rezerwacji, models.Rezerwacja.data_wygasniecia)
+                .filter(
+                    models.Rezerwacja.status_rezerwacji == "Oczekująca",
+                    models.Rezerwacja.data_wygasniecia.isnot(None),
+                )
+                .all()
+            )
+        finally:
+            db.close()
+
+        kopiec: List[Tuple[datetime, int]] = [
+            (data_wygasniecia, id_rezerwacji) for id_rezerwacji, data_wygasniecia in wiersze
+        ]
+        heapq.heapify(kopiec)
+
+        with self._warunek:
+            self._kopiec = kopiec
+            self._warunek.notify()
+        return len(kopiec)
+
+    def start(self) -> None:
+        if self._watek is not None:
+            return
+        self._dziala = True
+        self._watek = threading.Thread(
+            target=self._petla, name="harmonogram-wygasania", daemon=True
+        )
+        self._watek.start()
+
+    def zatrzymaj(self) -> None:
+        with self._warunek:
+            self._dziala = False
+            self._warunek.notify()
+        if self._watek is not None:
+            self._watek.join(timeout=5)
+            self._watek = None
+
+    def _zdejmij_wygasle(self) -> List[int]:
+        """Czeka na najbliższy termin i zdejmuje z kopca wszystko, co wygasło."""
+        with self._warunek:
+            while self._dziala:
+                teraz = datetime.now()
+                if self._kopiec and self._kopiec[0][0] <= teraz:
+                    wygasle = []
+                    while self._kopiec and self._kopiec[0][0] <= teraz:
+                        wygasle.append(heapq.heappop(self._kopiec)[1])
+                    return wygasle
+                timeout = (
+                    (self._kopiec[0][0] - teraz).total_seconds() if self._kopiec else None
+                )
+                self._warunek.wait(timeout)
+            return []
+
+    def _petla(self) -> None:
+        while self._dziala:
+            wygasle = self._zdejmij_wygasle()
+            if not wygasle:
+                continue
+            db = self._fabryka_sesji()
+            start = time.perf_counter()
+            try:
+                zwolnione = zwolnij_rezerwacje(db, wygasle)
+                zapisz_sprzatanie("wygasanie", time.perf_counter() - start, len(zwolnione))
+            except Exception:
+                db.rollback()
+                log.exception("Błąd przy zwalnianiu wygasłych rezerwacji")
+                # spróbujemy ponownie za chwilę
+                ponownie = datetime.now() + timedelta(seconds=5)
+                for id_rezerwacji in wygasle:
+                    self.dodaj(id_rezerwacji, ponownie)
+            finally:
+                db.close()
+
+
+# Jeden harmonogram na proces aplikacji
+harmonogram_wygasania = HarmonogramWygasania()
@@ -0,0 +1,132 @@
+# backend/app/wyszukiwarka.py
+"""
+Wyszukiwanie filmów po tytule – indeks pełnotekstowy SQLite FTS5.
+
+Tabela Film_fts (rowid = id_filmu) trzyma tytuł "złożony":
+małe litery, bez polskich znaków (ż -> z, ł -> l, ...). To samo złożenie
+robimy z zapytaniem, więc "zolw", "Żółw" i "ZÓŁW" znajdują ten sam film.
+
+Każde słowo zapytania jest traktowane jako prefiks ("zol" znajdzie
+"Żółw"), słowa łączymy przez AND, wyniki sortujemy po trafności (bm25).
+
+Indeks aktualizują endpointy filmów w tej samej transakcji co zmiana
+w tabeli Film; przy starcie aplikacji przygotuj_indeks() tworzy tabelę
+i odbudowuje ją, jeśli rozjechała się z tabelą Film.
+Gdy SQLite nie ma FTS5, wyszukiwanie wraca do tytul ILIKE '%q%'.
+"""
+import logging
+import re
+import unicodedata
+from typing import Optional
+
+from sqlalchemy import Column, Float, Integer, MetaData, String, Table, func, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from . import models
+
+log = logging.getLogger(__name__)
+
+# Litery, których NFKD nie rozkłada na literę + znak diakrytyczny
+_ZNAKI_SPECJALNE = str.maketrans({"ł": "l", "đ": "d", "ø": "o", "ß": "ss", "æ": "ae", "œ": "oe"})
+_SLOWO = re.compile(r"\w+")
+
+# Tabela wirtualna poza Base.metadata – create_all jej nie dotyka
+film_fts = Table(
+    "Film_fts",
+    MetaData(),
+    Column("rowid", Integer, primary_key=True),
+    Column("tytul", String),
+    Column("rank", Float),
+)
+
+_fts_dostepne = True
+
+
+def zloz_tekst(tekst: str) -> str:
+    """Małe litery bez znaków diakrytycznych: 'Żółw' -> 'zolw'."""
+    tekst = unicodedata.normalize("NFKD", tekst.casefold())
+    tekst = "".join(z for z in tekst if not unicodedata.combining(z))
+    return tekst.translate(_ZNAKI_SPECJALNE)
+
+
+def zapytanie_fts(q: str) -> Optional[str]:
+    """
+    'Żółw nin' -> '"zolw"* AND "nin"*'. None, jeśli w zapytaniu nie ma słów.
+    Cudzysłowy chronią przed składnią FTS5 (OR, NEAR, '-' itd.) z wejścia.
+    """
+    slowa = _SLOWO.findall(zloz_tekst(q))
+    if not slowa:
+        return None
+    return " AND ".join(f'"{s}"*' for s in slowa)
+
+
+def fts_dostepne() -> bool:
+    return _fts_dostepne
+
+
+# ---------- utrzymanie indeksu ----------
+
+def indeksuj_film(db: Session, film: models.Film) -> None:
+    """Dodaje / podmienia tytuł filmu w indeksie (film musi mieć id – db.flush())."""
+    if not _fts_dostepne:
+        return
+    db.execute(film_fts.delete().where(film_fts.c.rowid == film.id_filmu))
+    db.execute(film_fts.insert().values(rowid=film.id_filmu, tytul=zloz_tekst(film.tytul)))
+
+
+def usun_z_indeksu(db: Session, id_filmu: int) -> None:
+    if not _fts_dostepne:
+        return
+    db.execute(film_fts.delete().where(film_fts.c.rowid == id_filmu))
+
+
+def przygotuj_indeks(engine: Engine) -> None:
+    """
+    Tworzy Film_fts, jeśli jej nie ma, i odbudowuje ją, gdy liczba wpisów
+    nie zgadza się z tabelą Film (np. pierwsza migracja starej bazy).
+    """
+    global _fts_dostepne
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(
+                'CREATE VIRTUAL TABLE IF NOT EXISTS "Film_fts" '
+                "USING fts5(tytul, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            ))
+    except OperationalError as e:
+        _fts_dostepne = False
+        log.warning("FTS5 niedostępne, wyszukiwanie tytułów przez LIKE: %s", e)
+        return
+
+    with engine.begin() as conn:
+        w_indeksie = conn.scalar(select(func.count()).select_from(film_fts))
+        w_tabeli = conn.scalar(select(func.count()).select_from(models.Film))
+        if w_indeksie == w_tabeli:
+            return
+
+        conn.execute(film_fts.delete())
+        filmy = conn.execute(select(models.Film.id_filmu, models.Film.tytul)).all()
+        if filmy:
+            conn.execute(
+                film_fts.insert(),
+                [{"rowid": id_filmu, "tytul": zloz_tekst(tytul)} for id_filmu, tytul in filmy],
+            )
+        log.info("Odbudowano indeks tytułów (%d filmów)", len(filmy))
+
+
+# ---------- zapytania ----------
+
+def trafienia(q: str):
+    """
+    Podzapytanie (rowid, rank) filmów pasujących do q, do złączenia
+    z Film / Seans. None, gdy q nie zawiera żadnego słowa.
+    """
+    dopasowanie = zapytanie_fts(q)
+    if dopasowanie is None:
+        return None
+    return (
+        select(film_fts.c.rowid.label("id_filmu"), film_fts.c.rank.label("trafnosc"))
+        .where(text('"Film_fts" MATCH :dopasowanie').bindparams(dopasowanie=dopasowanie))
+        .subquery("trafienia")
+    )
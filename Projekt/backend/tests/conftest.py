@@ -0,0 +1,24 @@
+# backend/tests/conftest.py
+"""
+Testy na osobnej bazie SQLite w katalogu tymczasowym. Adres bazy ustawiamy
+przed pierwszym importem app (silniki powstają przy imporcie app.db).
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+_KATALOG_BAZY = tempfile.mkdtemp(prefix="kino_testy_")
+os.environ["KINO_DATABASE_URL"] = f"sqlite:///{_KATALOG_BAZY}/kino.db"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def klient():
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    with TestClient(app) as c:
+        yield c
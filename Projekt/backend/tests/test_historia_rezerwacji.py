@@ -0,0 +1,86 @@
+# backend/tests/test_historia_rezerwacji.py
+"""GET /uzytkownicy/{id}/rezerwacje – liczba zapytań nie zależy od długości historii."""
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from app.db import async_engine_odczyt
+
+DLUGA_HISTORIA = 50
+
+
+@contextmanager
+def licz_zapytania(silnik):
+    polecenia = []
+
+    def _przed(conn, kursor, polecenie, parametry, kontekst, wiele):
+        polecenia.append(polecenie)
+
+    event.listen(silnik, "before_cursor_execute", _przed)
+    try:
+        yield polecenia
+    finally:
+        event.remove(silnik, "before_cursor_execute", _przed)
+
+
+def _uzytkownik(klient, email):
+    r = klient.post(
+        "/uzytkownicy/",
+        json={"email": email, "haslo": "tajne", "imie": "Jan", "nazwisko": "Test"},
+    )
+    assert r.status_code in (200, 201), r.text
+    return r.json()["id_uzytkownika"]
+
+
+def _rezerwuj(klient, id_uzytkownika, id_seansu, id_miejsca):
+    r = klient.post(
+        "/rezerwacje/",
+        json={
+            "id_uzytkownika": id_uzytkownika,
+            "id_seansu": id_seansu,
+            "miejsca": [id_miejsca],
+            "typ_biletu": ["normalny"],
+        },
+    )
+    assert r.status_code == 201, r.text
+
+
+def _historia(klient, id_uzytkownika):
+    with licz_zapytania(async_engine_odczyt.sync_engine) as polecenia:
+        r = klient.get(f"/uzytkownicy/{id_uzytkownika}/rezerwacje")
+    assert r.status_code == 200, r.text
+    return r.json(), len(polecenia)
+
+
+def test_liczba_zapytan_nie_rosnie_z_historia(klient):
+    # --- 1. Sala, film, seans ---
+    id_sali = klient.post("/sale/", json={"numer_sali": 901}).json()["id_sali"]
+    r = klient.post(f"/sale/{id_sali}/generuj_miejsca?rzedy=6&na_rzad=10")
+    assert r.status_code in (200, 201), r.text
+    id_filmu = klient.post(
+        "/filmy/", json={"tytul": "Historia", "czas_trwania": 100, "typ": "2D"}
+    ).json()["id_filmu"]
+    id_seansu = klient.post(
+        "/seanse/",
+        json={"id_filmu": id_filmu, "id_sali": id_sali, "data": "2099-01-03", "godzina": "18:00"},
+    ).json()["id_seansu"]
+    miejsca = [m["id_miejsca"] for m in klient.get(f"/seanse/{id_seansu}/miejsca").json()]
+
+    # --- 2. Krótka i długa historia ---
+    krotka = _uzytkownik(klient, "krotka@historia.pl")
+    dluga = _uzytkownik(klient, "dluga@historia.pl")
+    _rezerwuj(klient, krotka, id_seansu, miejsca[0])
+    for id_miejsca in miejsca[1:DLUGA_HISTORIA + 1]:
+        _rezerwuj(klient, dluga, id_seansu, id_miejsca)
+
+    # pierwsze połączenie z puli odczytu może wykonać zapytania dialektu
+    _historia(klient, krotka)
+
+    # --- 3. Ta sama liczba zapytań ---
+    wynik_krotki, zapytania_krotka = _historia(klient, krotka)
+    wynik_dlugi, zapytania_dluga = _historia(klient, dluga)
+
+    assert len(wynik_krotki) == 1
+    assert len(wynik_dlugi) == DLUGA_HISTORIA
+    # użytkownik, rezerwacje z seansem (JOIN), miejsca wszystkich rezerwacji (IN)
+    assert zapytania_krotka == zapytania_dluga == 3
@@ -5,6 +5,19 @@ function getUser() {
 function setUser(user) {
     localStorage.setItem("uzytkownik", JSON.stringify(user));
 }
+// Listy z backendu są stronicowane – kursor następnej strony jest w nagłówku
+// X-Nastepny-Kursor. Ta funkcja pobiera po kolei wszystkie strony.
+async function pobierzWszystko(url) {
+    const wynik = [];
+    let kursor = null;
+    do {
+        const adres = kursor === null ? url : `${url}${url.includes("?") ? "&" : "?"}po=${kursor}`;
+        const res = await fetch(adres);
+        wynik.push(...await res.json());
+        kursor = res.headers.get("X-Nastepny-Kursor");
+    } while (kursor);
+    return wynik;
+}
 const user = getUser();
 if (user.typ === 2) {
   document.getElementById("admin").style.display = "block";
@@ -1,5 +1,4 @@
-fetch(`${API_BASE}/filmy`)
-    .then(res => res.json())
+pobierzWszystko(`${API_BASE}/filmy/`)
     .then(data => {
         const ul = document.getElementById("lista-filmow");
         ul.innerHTML = "";
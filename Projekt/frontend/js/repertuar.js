@@ -1,5 +1,4 @@
-fetch("http://localhost:8000/repertuar/")
-  .then(res => res.json())
+pobierzWszystko("http://localhost:8000/repertuar/")
   .then(seanse => wyswietlSeanse(seanse))
   .catch(err => console.error("Błąd pobierania repertuaru:", err));
 document.getElementById("btnSzukaj").onclick = () => {
@@ -1,13 +1,43 @@
 const idSeansu = localStorage.getItem("id_seansu");
 const idSali = localStorage.getItem("id_sali");
-fetch(`http://localhost:8000/seanse/${idSeansu}/miejsca`)
-  .then(res => res.json())
-  .then(miejsca => {
-    renderujMiejsca(miejsca);
-  })
-  .catch(err => {
-    console.error("Błąd pobierania miejsc:", err);
-  });
+// Mapa miejsc na żywo: najpierw cała mapa, potem zmiany statusów
+// (backend: /seanse/{id}/miejsca/strumien, app/na_zywo.py)
+const strumienMiejsc = new EventSource(`http://localhost:8000/seanse/${idSeansu}/miejsca/strumien`);
+strumienMiejsc.onmessage = e => {
+  const zdarzenie = JSON.parse(e.data);
+  if (zdarzenie.typ === "mapa") {
+    renderujMiejsca(zdarzenie.miejsca);
+  } else if (zdarzenie.typ === "zmiana") {
+    zdarzenie.miejsca.forEach(id => ustawStatusMiejsca(id, zdarzenie.status));
+  } else if (zdarzenie.typ === "odswiez") {
+    fetch(`http://localhost:8000/seanse/${idSeansu}/miejsca`)
+      .then(res => res.json())
+      .then(miejsca => renderujMiejsca(miejsca))
+      .catch(err => console.error("Błąd pobierania miejsc:", err));
+  }
+};
+strumienMiejsc.onerror = err => {
+  // EventSource sam wznawia połączenie i dostaje wtedy całą mapę od nowa
+  console.error("Błąd strumienia miejsc:", err);
+};
+function ustawStatusMiejsca(id, status) {
+  const btn = document.querySelector(`#sala button[data-id="${id}"]`);
+  if (!btn) return;
+  if (status !== "Wolne") {
+    // ktoś inny zajął miejsce – zdejmujemy je z naszego wyboru
+    if (wybraneMiejsca.find(m => m.id === id)) {
+      wybraneMiejsca = wybraneMiejsca.filter(m => m.id !== id);
+      renderujPanelBiletow();
+    }
+    btn.style.background = "red";
+    btn.disabled = true;
+    btn.onclick = null;
+  } else {
+    btn.style.background = "lightgreen";
+    btn.disabled = false;
+    btn.onclick = () => wybierzMiejsce(btn);
+  }
+}
 function renderujMiejsca(miejsca) {
   const sala = document.getElementById("sala");
   sala.innerHTML = "";
@@ -15,7 +15,12 @@ function dodajSeans() {
   })
   .then(r => r.json())
   .then(d => {
-    if (d.detail) alert(d.detail);
+    if (d.detail && d.detail.konflikty) {
+      alert(d.detail.komunikat + "\n" + d.detail.konflikty
+        .map(k => `#${k.id_seansu} ${k.tytul}: ${k.data} ${k.godzina}`)
+        .join("\n"));
+    }
+    else if (d.detail) alert(d.detail);
     else alert("Dodano seans ID=" + d.id_seansu);
   });
 }
\ No newline at end of file